@@ -1,11 +1,14 @@
 # Source: https://github.com/OpenZeppelin/cairo-contracts/blob/main/contracts/Account.cairo
 # Version: 259d2854a5c1e7d62878f0fb03d0772777c7c348
 # License: MIT
+# Modified: execute takes several calls (a multicall) under one signature,
+# and rejects a nonce other than the current one.
 
 %lang starknet
 %builtins pedersen range_check ecdsa
 
-from starkware.cairo.common.registers import get_fp_and_pc
+from starkware.cairo.common.alloc import alloc
+from starkware.cairo.common.memcpy import memcpy
 from starkware.cairo.common.signature import verify_ecdsa_signature
 from starkware.cairo.common.cairo_builtins import HashBuiltin, SignatureBuiltin
 from starkware.starknet.common.syscalls import call_contract, get_caller_address, get_tx_signature
@@ -17,13 +20,20 @@ from starkware.cairo.common.hash_state import (
 # Structs
 #
 
-struct Message:
-    member sender: felt
+struct Call:
     member to: felt
     member selector: felt
+    member calldata_len: felt
     member calldata: felt*
-    member calldata_size: felt
-    member nonce: felt
+end
+
+# A call as passed to execute: its calldata is the slice
+# [data_offset, data_offset + data_len) of the shared calldata array.
+struct CallArray:
+    member to: felt
+    member selector: felt
+    member data_offset: felt
+    member data_len: felt
 end
 
 #
@@ -187,6 +197,8 @@ func is_valid_signature{
     return ()
 end
 
+# Executes several calls under one signature and nonce. The responses
+# of the calls are concatenated.
 @external
 func execute{
         syscall_ptr : felt*,
@@ -194,69 +206,102 @@ func execute{
         range_check_ptr,
         ecdsa_ptr: SignatureBuiltin*
     }(
-        to: felt,
-        selector: felt,
+        call_array_len: felt,
+        call_array: CallArray*,
         calldata_len: felt,
         calldata: felt*,
         nonce: felt
-    ) -> (response : felt):
+    ) -> (response_len: felt, response: felt*):
     alloc_locals
     assert_initialized()
 
-    let (__fp__, _) = get_fp_and_pc()
     let (_address) = address.read()
     let (_current_nonce) = current_nonce.read()
-
-    local syscall_ptr : felt* = syscall_ptr
-    local range_check_ptr = range_check_ptr
-    local _current_nonce = _current_nonce
-
-    local message: Message = Message(
-        _address,
-        to,
-        selector,
-        calldata,
-        calldata_size=calldata_len,
-        _current_nonce
-    )
+    # A transaction signed for another nonce is rejected outright.
+    assert _current_nonce = nonce
 
     # validate transaction
-    let (hash) = hash_message(&message)
+    let (hash) = hash_multicall(_address, call_array_len, call_array,
+        calldata_len, calldata, nonce)
     let (signature_len, signature) = get_tx_signature()
     is_valid_signature(hash, signature_len, signature)
 
     # bump nonce
     current_nonce.write(_current_nonce + 1)
 
-    # execute call
-    let response = call_contract(
-        contract_address=message.to,
-        function_selector=message.selector,
-        calldata_size=message.calldata_size,
-        calldata=message.calldata
-    )
+    # execute calls
+    let (local calls : Call*) = alloc()
+    from_call_array(call_array_len, call_array, calldata, calls)
+    let (local response : felt*) = alloc()
+    let (response_len) = execute_calls(call_array_len, calls, response)
+    return (response_len=response_len, response=response)
+end
+
+func from_call_array(
+        call_array_len: felt,
+        call_array: CallArray*,
+        calldata: felt*,
+        calls: Call*
+    ):
+    if call_array_len == 0:
+        return ()
+    end
+    assert [calls] = Call(
+        to=[call_array].to,
+        selector=[call_array].selector,
+        calldata_len=[call_array].data_len,
+        calldata=calldata + [call_array].data_offset)
+    from_call_array(call_array_len - 1, call_array + CallArray.SIZE,
+        calldata, calls + Call.SIZE)
+    return ()
+end
 
-    return (response=response.retdata_size)
+func execute_calls{syscall_ptr : felt*}(
+        calls_len: felt,
+        calls: Call*,
+        response: felt*
+    ) -> (response_len: felt):
+    alloc_locals
+    if calls_len == 0:
+        return (0)
+    end
+    let this_call : Call = [calls]
+    let res = call_contract(
+        contract_address=this_call.to,
+        function_selector=this_call.selector,
+        calldata_size=this_call.calldata_len,
+        calldata=this_call.calldata
+    )
+    memcpy(response, res.retdata, res.retdata_size)
+    let (rest_len) = execute_calls(calls_len - 1, calls + Call.SIZE,
+        response + res.retdata_size)
+    return (response_len=res.retdata_size + rest_len)
 end
 
-func hash_message{pedersen_ptr : HashBuiltin*}(message: Message*) -> (res: felt):
+# The signed hash of a transaction:
+# H(sender, H(call_array), H(calldata), nonce), each H a pedersen hash
+# chain finalized with its length.
+func hash_multicall{pedersen_ptr : HashBuiltin*}(
+        sender: felt,
+        call_array_len: felt,
+        call_array: CallArray*,
+        calldata_len: felt,
+        calldata: felt*,
+        nonce: felt
+    ) -> (res: felt):
     alloc_locals
-    # we need to make `res_calldata` local
-    # to prevent the reference from being revoked
-    let (local res_calldata) = hash_calldata(message.calldata, message.calldata_size)
+    let (local calls_hash) = hash_calldata(cast(call_array, felt*),
+        call_array_len * CallArray.SIZE)
+    let (local data_hash) = hash_calldata(calldata, calldata_len)
     let hash_ptr = pedersen_ptr
     with hash_ptr:
         let (hash_state_ptr) = hash_init()
-        # first three iterations are 'sender', 'to', and 'selector'
-        let (hash_state_ptr) = hash_update(
-            hash_state_ptr,
-            message,
-            3
-        )
+        let (hash_state_ptr) = hash_update_single(hash_state_ptr, sender)
         let (hash_state_ptr) = hash_update_single(
-            hash_state_ptr, res_calldata)
+            hash_state_ptr, calls_hash)
         let (hash_state_ptr) = hash_update_single(
-            hash_state_ptr, message.nonce)
+            hash_state_ptr, data_hash)
+        let (hash_state_ptr) = hash_update_single(hash_state_ptr, nonce)
         let (res) = hash_finalize(hash_state_ptr)
         let pedersen_ptr = hash_ptr
     return (res=res)
@@ -279,4 +324,4 @@ func hash_calldata{pedersen_ptr: HashBuiltin*}(
         let pedersen_ptr = hash_ptr
         return (res=res)
     end
-end
\ No newline at end of file
+end
@@ -9,16 +9,21 @@ from starkware.cairo.common.hash_state import (hash_init,
     hash_update, HashState)
 from starkware.cairo.common.math import (unsigned_div_rem, assert_nn,
     assert_not_zero, assert_nn_le, assert_le, assert_not_equal,
-    split_int)
+    assert_in_range, split_int)
+from starkware.cairo.common.math_cmp import is_le, is_in_range
 from starkware.cairo.common.pow import pow
 from starkware.starknet.common.syscalls import (call_contract,
     get_caller_address)
 
 
-from contracts.utils.hash_game import hash_game
-from contracts.utils.packing import pack_cols, append_cols
-from contracts.utils.life_rules import (evaluate_rounds,
-    apply_rules, get_adjacent)
+from contracts.utils.hash_game import hash_game, hash_generation
+from contracts.utils.paging import has_field, page_length, MAX_PAGE_SIZE
+from contracts.utils.life_rules import (evaluate_rounds_dirty,
+    changed_rows_mask, ALL_ROWS_CHANGED)
+from contracts.utils.packing import (pack_generation, unpack_generation,
+    remask_generation,
+    unpack_last_slot, assert_valid_rows, DIM, SLOTS_PER_GEN, ROW_SHIFT,
+    MASK_SHIFT)
 
 ##### Description #####
 #
@@ -26,23 +31,50 @@ from contracts.utils.life_rules import (evaluate_rounds,
 # starting point for the game. A player may participate only
 # once they have contributed to other games to evolve them.
 #
+# Every new game and generation is emitted as an event, so that
+# history can be rebuilt off-chain (see gol2/indexer.py). With a
+# history_interval of 0 only the genesis and the current board of
+# each game are kept in storage and the events are the history.
+# With a history_interval of n > 1, every n-th generation of a game
+# is stored as a checkpoint and the others are recomputed on view.
+#
 #######################
 
 ##### Constants #####
-# Width of the simulation grid.
-const DIM = 32
 const CREDIT_REQUIREMENT = 10
+# Most generations a single contribution may evolve (and credit).
+const MAX_GENERATIONS_PER_TURN = 10
+# Most games (with repeats) a single contribute_to_games may evolve.
+const MAX_GAMES_PER_CONTRIBUTION = 20
+# Storage generation key of the current board when history is not stored.
+const CURRENT_KEY = -1
+# Longest gap between checkpoints (bounds the replay cost of a view).
+const MAX_HISTORY_INTERVAL = 50
+# Field mask bits of get_recently_created and
+# get_recent_generations_of_game.
+const FIELD_BOARDS = 1
+const FIELD_OWNERS = 2
+const FIELD_GENERATIONS = 4
+const FIELD_GENESIS = 8
 
 ##### Storage #####
 # Game index is predominantly used. Game id is to ensure uniqueness.
 
+# 1 stores every generation, 0 stores only the current board,
+# n > 1 stores a checkpoint every n generations.
+@storage_var
+func history_interval() -> (interval : felt):
+end
+
 # Stores n=dim rows of cell status as a binary representation.
-# For a given game at a given state.
+# For a given game at a given state. Rows are packed ROWS_PER_SLOT
+# to a slot (see utils/packing.cairo). Without stored history the
+# current board of a game is under gen=CURRENT_KEY.
 @storage_var
-func stored_row(
+func stored_slot(
         game_index : felt,
         gen : felt,
-        row : felt
+        slot : felt
     ) -> (
         val : felt
     ):
@@ -120,14 +152,72 @@ func game_index_from_inventory(
 end
 
 
+# The first stored generation of a game holding a board, by state hash
+# (see utils/hash_game.cairo). Kept as generation + 1, 0 is unseen.
+@storage_var
+func state_seen_at(
+        game_index : felt,
+        state_hash : felt
+    ) -> (
+        generation_plus_one : felt
+    ):
+end
+
+# Once a board of a game repeats, the board at a generation >= start is
+# the one at start + (generation - start) % period. 0 if no cycle.
+@storage_var
+func game_cycle_start(
+        game_index : felt
+    ) -> (
+        generation : felt
+    ):
+end
+
+@storage_var
+func game_cycle_period(
+        game_index : felt
+    ) -> (
+        period : felt
+    ):
+end
+
+
+##### Events #####
+
+# A new game, with its genesis board packed as in storage.
+@event
+func game_created(
+        user_id : felt,
+        game_index : felt,
+        game_id : felt,
+        packed_rows_len : felt,
+        packed_rows : felt*
+    ):
+end
+
+# A new generation of a game, credited to the contributor.
+@event
+func game_evolved(
+        user_id : felt,
+        game_index : felt,
+        generation : felt,
+        packed_rows_len : felt,
+        packed_rows : felt*
+    ):
+end
+
 ##################
 @constructor
 func constructor{
         syscall_ptr : felt*,
         pedersen_ptr : HashBuiltin*,
         range_check_ptr
-    }():
+    }(
+        interval : felt
+    ):
     alloc_locals
+    assert_nn_le(interval, MAX_HISTORY_INTERVAL)
+    history_interval.write(interval)
     let (acorn : felt*) = alloc()
     # Skipped the first 11 rows for hashing.
     assert acorn[0] = 32
@@ -137,9 +227,23 @@ func constructor{
     let (game_id) = hash_game(acorn, 3)
 
     # Acorn. Has no owner.
-    stored_row.write(game_index=0, gen=0, row=12, value=32)
-    stored_row.write(game_index=0, gen=0, row=13, value=8)
-    stored_row.write(game_index=0, gen=0, row=14, value=103)
+    # Rows 12 and 13 are the top of slot 1, row 14 starts slot 2.
+    let (local acorn_slots : felt*) = alloc()
+    assert acorn_slots[0] = 0
+    assert acorn_slots[1] = 32 * ROW_SHIFT ** 5 + 8 * ROW_SHIFT ** 6
+    assert acorn_slots[2] = 103
+    assert acorn_slots[3] = 0
+    # Every row of a new board counts as changed. The acorn has 7 cells.
+    local acorn_summary = ALL_ROWS_CHANGED + 7 * ROW_SHIFT
+    assert acorn_slots[4] = acorn_summary * MASK_SHIFT
+    # The genesis is always kept. It is also the current board.
+    save_slots(game_index=0, generation=0, slots=acorn_slots,
+        slot=SLOTS_PER_GEN)
+    let (separate_head) = has_separate_head()
+    save_slots(game_index=0, generation=CURRENT_KEY, slots=acorn_slots,
+        slot=SLOTS_PER_GEN * separate_head)
+    let (acorn_hash) = hash_generation(acorn_slots, acorn_summary)
+    state_seen_at.write(0, acorn_hash, 1)
 
     # Ensure that spawn is only called once. All other games need
     # credits to begin.
@@ -215,6 +319,9 @@ func create{
     # Inside the function, the first element of the list is addressed
     # by index=1,  function accepts the list
 
+    # Rows wider than the board would spill into their slot neighbours.
+    assert_valid_rows(genesis_state, DIM)
+
     let (local caller) = get_caller_address()
     assert_not_zero(caller)
     # Check that the caller has enough credits, subtract some.
@@ -236,39 +343,18 @@ func create{
     local syscall_ptr : felt* = syscall_ptr
     let (current_index) = latest_game_index.read()
     let idx = current_index + 1
-    # Store the game
-    stored_row.write(game_index=idx, gen=0, row=0, value=row_0)
-    stored_row.write(game_index=idx, gen=0, row=1, value=row_1)
-    stored_row.write(game_index=idx, gen=0, row=2, value=row_2)
-    stored_row.write(game_index=idx, gen=0, row=3, value=row_3)
-    stored_row.write(game_index=idx, gen=0, row=4, value=row_4)
-    stored_row.write(game_index=idx, gen=0, row=5, value=row_5)
-    stored_row.write(game_index=idx, gen=0, row=6, value=row_6)
-    stored_row.write(game_index=idx, gen=0, row=7, value=row_7)
-    stored_row.write(game_index=idx, gen=0, row=8, value=row_8)
-    stored_row.write(game_index=idx, gen=0, row=9, value=row_9)
-    stored_row.write(game_index=idx, gen=0, row=10, value=row_10)
-    stored_row.write(game_index=idx, gen=0, row=11, value=row_11)
-    stored_row.write(game_index=idx, gen=0, row=12, value=row_12)
-    stored_row.write(game_index=idx, gen=0, row=13, value=row_13)
-    stored_row.write(game_index=idx, gen=0, row=14, value=row_14)
-    stored_row.write(game_index=idx, gen=0, row=15, value=row_15)
-    stored_row.write(game_index=idx, gen=0, row=16, value=row_16)
-    stored_row.write(game_index=idx, gen=0, row=17, value=row_17)
-    stored_row.write(game_index=idx, gen=0, row=18, value=row_18)
-    stored_row.write(game_index=idx, gen=0, row=19, value=row_19)
-    stored_row.write(game_index=idx, gen=0, row=20, value=row_20)
-    stored_row.write(game_index=idx, gen=0, row=21, value=row_21)
-    stored_row.write(game_index=idx, gen=0, row=22, value=row_22)
-    stored_row.write(game_index=idx, gen=0, row=23, value=row_23)
-    stored_row.write(game_index=idx, gen=0, row=24, value=row_24)
-    stored_row.write(game_index=idx, gen=0, row=25, value=row_25)
-    stored_row.write(game_index=idx, gen=0, row=26, value=row_26)
-    stored_row.write(game_index=idx, gen=0, row=27, value=row_27)
-    stored_row.write(game_index=idx, gen=0, row=28, value=row_28)
-    stored_row.write(game_index=idx, gen=0, row=29, value=row_29)
-    stored_row.write(game_index=idx, gen=0, row=30, value=row_30)
-    stored_row.write(game_index=idx, gen=0, row=31, value=row_31)
+    # Store the game. The genesis is always kept.
+    let (local slots : felt*) = alloc()
+    let (local summary) = pack_generation(genesis_state, ALL_ROWS_CHANGED,
+        slots)
+    save_slots(game_index=idx, generation=0, slots=slots,
+        slot=SLOTS_PER_GEN)
+    let (separate_head) = has_separate_head()
+    save_slots(game_index=idx, generation=CURRENT_KEY, slots=slots,
+        slot=SLOTS_PER_GEN * separate_head)
+    let (genesis_hash) = hash_generation(slots, summary)
+    state_seen_at.write(idx, genesis_hash, 1)
+    game_created.emit(caller, idx, game_id, SLOTS_PER_GEN, slots)
 
     # Update trackers.
     owner_of_game.write(idx, caller)
@@ -295,33 +381,49 @@ func contribute{
     }(
         game_index : felt
     ):
+    contribute_and_credit(game_index, 1)
+    return ()
+end
+
+# Progresses the game by several generations in one transaction.
+# Every generation is stored and earns the caller a credit.
+@external
+func contribute_generations{
+        syscall_ptr : felt*,
+        bitwise_ptr : BitwiseBuiltin*,
+        pedersen_ptr : HashBuiltin*,
+        range_check_ptr
+    }(
+        game_index : felt,
+        generations : felt
+    ):
+    # 1 <= generations <= MAX_GENERATIONS_PER_TURN.
+    assert_in_range(generations, 1, MAX_GENERATIONS_PER_TURN + 1)
+    contribute_and_credit(game_index, generations)
+    return ()
+end
+
+# Progresses each game in a list by one generation, a game listed n
+# times is progressed n generations. Earns one credit per generation.
+@external
+func contribute_to_games{
+        syscall_ptr : felt*,
+        bitwise_ptr : BitwiseBuiltin*,
+        pedersen_ptr : HashBuiltin*,
+        range_check_ptr
+    }(
+        game_indices_len : felt,
+        game_indices : felt*
+    ):
     alloc_locals
-    let (local prev_generation) = latest_game_generation.read(
-        game_index)
-    # Unpack the stored game.
-    # Iterates over rows, then cols to get an array of all cells.
-    # Cell_states array is DIM**2 long: One cell per index (no packing).
-    let (local cell_states_init : felt*) = alloc()
-    unpack_rows(game_index=game_index, generation=prev_generation,
-        cell_states=cell_states_init,row=DIM)
-
-    # Evolve the game by one generation.
-    let (local cell_states : felt*) = evaluate_rounds(1,
-        cell_states_init)
-    # Pack the game for compact storage.
-
-    save_rows(game_index=game_index, generation=prev_generation + 1,
-        cell_states=cell_states, row=DIM)
-
-    # Save the user data.
-    let (user) = get_caller_address()
+    # 1 <= game_indices_len <= MAX_GAMES_PER_CONTRIBUTION.
+    assert_in_range(game_indices_len, 1, MAX_GAMES_PER_CONTRIBUTION + 1)
+    let (local user) = get_caller_address()
     assert_not_zero(user)
-    # Give a credit for advancing this particular game.
+    advance_games(user, game_indices_len, game_indices)
+    # Credits are written once for the whole list.
     let (credits) = has_credits.read(user)
-    has_credits.write(user, credits + 1)
-
-    # Save the current generation for easy retrieval.
-    latest_game_generation.write(game_index, prev_generation + 1)
+    has_credits.write(user, credits + game_indices_len)
     return ()
 end
 
@@ -398,9 +500,11 @@ end
 
 
 # Returns a list of rows for the specified generation.
+# Between checkpoints the generation is recomputed from the last one.
 @view
 func view_game{
         syscall_ptr : felt*,
+        bitwise_ptr : BitwiseBuiltin*,
         pedersen_ptr : HashBuiltin*,
         range_check_ptr
     }(
@@ -417,83 +521,55 @@ func view_game{
         row_28 : felt, row_29 : felt, row_30 : felt, row_31 : felt
     ):
 
-    let (row_0) = stored_row.read(game_index, gen, 0)
-    let (row_1) = stored_row.read(game_index, gen, 1)
-    let (row_2) = stored_row.read(game_index, gen, 2)
-    let (row_3) = stored_row.read(game_index, gen, 3)
-    let (row_4) = stored_row.read(game_index, gen, 4)
-    let (row_5) = stored_row.read(game_index, gen, 5)
-    let (row_6) = stored_row.read(game_index, gen, 6)
-    let (row_7) = stored_row.read(game_index, gen, 7)
-    let (row_8) = stored_row.read(game_index, gen, 8)
-    let (row_9) = stored_row.read(game_index, gen, 9)
-    let (row_10) = stored_row.read(game_index, gen, 10)
-    let (row_11) = stored_row.read(game_index, gen, 11)
-    let (row_12) = stored_row.read(game_index, gen, 12)
-    let (row_13) = stored_row.read(game_index, gen, 13)
-    let (row_14) = stored_row.read(game_index, gen, 14)
-    let (row_15) = stored_row.read(game_index, gen, 15)
-    let (row_16) = stored_row.read(game_index, gen, 16)
-    let (row_17) = stored_row.read(game_index, gen, 17)
-    let (row_18) = stored_row.read(game_index, gen, 18)
-    let (row_19) = stored_row.read(game_index, gen, 19)
-    let (row_20) = stored_row.read(game_index, gen, 20)
-    let (row_21) = stored_row.read(game_index, gen, 21)
-    let (row_22) = stored_row.read(game_index, gen, 22)
-    let (row_23) = stored_row.read(game_index, gen, 23)
-    let (row_24) = stored_row.read(game_index, gen, 24)
-    let (row_25) = stored_row.read(game_index, gen, 25)
-    let (row_26) = stored_row.read(game_index, gen, 26)
-    let (row_27) = stored_row.read(game_index, gen, 27)
-    let (row_28) = stored_row.read(game_index, gen, 28)
-    let (row_29) = stored_row.read(game_index, gen, 29)
-    let (row_30) = stored_row.read(game_index, gen, 30)
-    let (row_31) = stored_row.read(game_index, gen, 31)
-
-    return (row_0, row_1, row_2, row_3, row_4, row_5,
-        row_6, row_7, row_8, row_9, row_10, row_11,
-        row_12, row_13, row_14, row_15, row_16, row_17,
-        row_18, row_19, row_20, row_21, row_22, row_23,
-        row_24, row_25, row_26, row_27, row_28, row_29,
-        row_30, row_31)
+    alloc_locals
+    let (key, local rounds) = board_source(game_index, gen)
+    let (local slots : felt*) = alloc()
+    read_slots(game_index=game_index, generation=key, slots=slots,
+        slot=SLOTS_PER_GEN)
+    let (local stored_rows : felt*) = alloc()
+    let (mask) = unpack_generation(slots, stored_rows)
+    let (rows, _) = evaluate_rounds_dirty(rounds, stored_rows, mask)
+
+    return (rows[0], rows[1], rows[2], rows[3], rows[4], rows[5],
+        rows[6], rows[7], rows[8], rows[9], rows[10], rows[11],
+        rows[12], rows[13], rows[14], rows[15], rows[16], rows[17],
+        rows[18], rows[19], rows[20], rows[21], rows[22], rows[23],
+        rows[24], rows[25], rows[26], rows[27], rows[28], rows[29],
+        rows[30], rows[31])
 end
 
-# Get a collection of recently created (or specified) games.
+# Get a page of recently created (or specified) games. Only the fields
+# set in the field mask are fetched (FIELD_GENERATIONS, FIELD_OWNERS,
+# FIELD_BOARDS for the current board of each game). A page holds up to
+# page_size games, counting back from the given game index (0 for the
+# latest). Pass the returned next_cursor (0 if nothing is left) to get
+# the next page.
 @view
 func get_recently_created{
         syscall_ptr : felt*,
+        bitwise_ptr : BitwiseBuiltin*,
         pedersen_ptr : HashBuiltin*,
         range_check_ptr
     }(
-        enter_zero_or_specific_game_index : felt
-    ) -> (game_index,
-        a_gen, b_gen, c_gen, d_gen, e_gen,
-        a_owner, b_owner, c_owner, d_owner, e_owner,
-        a0, a1, a2, a3, a4, a5, a6, a7, a8, a9,
-        a10, a11, a12, a13, a14, a15, a16, a17, a18, a19,
-        a20, a21, a22, a23, a24, a25, a26, a27, a28, a29,
-        a30, a31,
-        b0, b1, b2, b3, b4, b5, b6, b7, b8, b9,
-        b10, b11, b12, b13, b14, b15, b16, b17, b18, b19,
-        b20, b21, b22, b23, b24, b25, b26, b27, b28, b29,
-        b30, b31,
-        c0, c1, c2, c3, c4, c5, c6, c7, c8, c9,
-        c10, c11, c12, c13, c14, c15, c16, c17, c18, c19,
-        c20, c21, c22, c23, c24, c25, c26, c27, c28, c29,
-        c30, c31,
-        d0, d1, d2, d3, d4, d5, d6, d7, d8, d9,
-        d10, d11, d12, d13, d14, d15, d16, d17, d18, d19,
-        d20, d21, d22, d23, d24, d25, d26, d27, d28, d29,
-        d30, d31,
-        e0, e1, e2, e3, e4, e5, e6, e7, e8, e9,
-        e10, e11, e12, e13, e14, e15, e16, e17, e18, e19,
-        e20, e21, e22, e23, e24, e25, e26, e27, e28, e29,
-        e30, e31
+        enter_zero_or_specific_game_index : felt,
+        fields : felt,
+        cursor : felt,
+        page_size : felt
+    ) -> (
+        game_index : felt,
+        next_cursor : felt,
+        game_indices_len : felt,
+        game_indices : felt*,
+        generations_len : felt,
+        generations : felt*,
+        owners_len : felt,
+        owners : felt*,
+        boards_len : felt,
+        boards : felt*
     ):
-    # Can return the games for indices n, n-1, n-2, n-3, n-4, where
-    # n is the the specified index. If the index specified is 0,
-    # the n is set to the latest game.
     alloc_locals
+    assert_nn(cursor)
+    assert_in_range(page_size, 1, MAX_PAGE_SIZE + 1)
     # If the caller used '0', use the latest ID, otherwise use specified.
     let (index) = latest_game_index.read()
     local game_index : felt
@@ -503,109 +579,166 @@ func get_recently_created{
         assert game_index = index
     end
 
-    # Fetch images for the latest games
-    let (local a_gen) = latest_game_generation.read(game_index)
-    let (a0, a1, a2, a3, a4, a5, a6, a7, a8, a9,
-        a10, a11, a12, a13, a14, a15, a16, a17, a18, a19,
-        a20, a21, a22, a23, a24, a25, a26, a27, a28, a29,
-        a30, a31) = view_game(game_index, a_gen)
-
-    let (local b_gen) = latest_game_generation.read(game_index - 1)
-    let (b0, b1, b2, b3, b4, b5, b6, b7, b8, b9,
-        b10, b11, b12, b13, b14, b15, b16, b17, b18, b19,
-        b20, b21, b22, b23, b24, b25, b26, b27, b28, b29,
-        b30, b31) = view_game(game_index - 1, b_gen)
+    let (local want_gens) = has_field(fields, FIELD_GENERATIONS)
+    let (local want_owners) = has_field(fields, FIELD_OWNERS)
+    let (local want_boards) = has_field(fields, FIELD_BOARDS)
+
+    # Game indices start at 0 (the acorn).
+    let (local n_games) = page_length(game_index + 1, cursor, page_size)
+    let (local game_indices : felt*) = alloc()
+    build_array(game_index - cursor, n_games, game_indices)
+
+    # The latest generation of each game is needed for its board.
+    let (local generations : felt*) = alloc()
+    let (local need_gens) = has_field(fields,
+        FIELD_GENERATIONS + FIELD_BOARDS)
+    append_game_generations(n_games * need_gens, game_indices,
+        generations)
+
+    let (local owners : felt*) = alloc()
+    local n_owners = n_games * want_owners
+    append_game_owners(n_owners, game_indices, owners)
+
+    let (local boards : felt*) = alloc()
+    local n_boards = n_games * want_boards
+    append_game_boards(n_boards, game_indices, generations, boards)
+
+    let (more) = is_le(cursor + page_size + 1, game_index + 1)
+    local next_cursor : felt
+    if more == 0:
+        assert next_cursor = 0
+    else:
+        assert next_cursor = cursor + page_size
+    end
 
-    let (local c_gen) = latest_game_generation.read(game_index - 2)
-    let (c0, c1, c2, c3, c4, c5, c6, c7, c8, c9,
-        c10, c11, c12, c13, c14, c15, c16, c17, c18, c19,
-        c20, c21, c22, c23, c24, c25, c26, c27, c28, c29,
-        c30, c31) = view_game(game_index - 2, c_gen)
+    return (
+        game_index,
+        next_cursor,
+        n_games,
+        game_indices,
+        n_games * want_gens,
+        generations,
+        n_owners,
+        owners,
+        n_boards * 32,
+        boards)
+end
 
-    let (local d_gen) = latest_game_generation.read(game_index - 3)
-    let (d0, d1, d2, d3, d4, d5, d6, d7, d8, d9,
-        d10, d11, d12, d13, d14, d15, d16, d17, d18, d19,
-        d20, d21, d22, d23, d24, d25, d26, d27, d28, d29,
-        d30, d31) = view_game(game_index - 3, d_gen)
 
-    let (local e_gen) = latest_game_generation.read(game_index - 4)
-    let (e0, e1, e2, e3, e4, e5, e6, e7, e8, e9,
-        e10, e11, e12, e13, e14, e15, e16, e17, e18, e19,
-        e20, e21, e22, e23, e24, e25, e26, e27, e28, e29,
-        e30, e31) = view_game(game_index - 4, e_gen)
+# Get a page of the recent generations of a game (0 for the latest
+# game). A page holds up to page_size boards (FIELD_BOARDS), counting
+# back from the current generation. The owner of the game
+# (FIELD_OWNERS) and its genesis board (FIELD_GENESIS) are fetched if
+# set in the field mask. Pass the returned next_cursor (0 if nothing is
+# left) to get the next page.
+@view
+func get_recent_generations_of_game{
+        syscall_ptr : felt*,
+        bitwise_ptr : BitwiseBuiltin*,
+        pedersen_ptr : HashBuiltin*,
+        range_check_ptr
+    }(
+        enter_zero_or_specific_game_index : felt,
+        fields : felt,
+        cursor : felt,
+        page_size : felt
+    ) -> (
+        game_index : felt,
+        owner : felt,
+        generation : felt,
+        next_cursor : felt,
+        generations_len : felt,
+        generations : felt*,
+        boards_len : felt,
+        boards : felt*,
+        genesis_len : felt,
+        genesis : felt*
+    ):
+    alloc_locals
+    assert_nn(cursor)
+    assert_in_range(page_size, 1, MAX_PAGE_SIZE + 1)
+    # If the caller used '0', use the latest ID, otherwise use specified.
+    let (index) = latest_game_index.read()
+    local game_index : felt
+    if enter_zero_or_specific_game_index != 0:
+        assert game_index = enter_zero_or_specific_game_index
+    else:
+        assert game_index = index
+    end
 
-    let (a_owner) = owner_of_game.read(game_index)
-    let (b_owner) = owner_of_game.read(game_index - 1)
-    let (c_owner) = owner_of_game.read(game_index - 2)
-    let (d_owner) = owner_of_game.read(game_index - 3)
-    let (e_owner) = owner_of_game.read(game_index - 4)
+    let (local gen) = latest_game_generation.read(game_index)
+    let (local want_boards) = has_field(fields, FIELD_BOARDS)
+    let (local want_owner) = has_field(fields, FIELD_OWNERS)
+    let (local want_genesis) = has_field(fields, FIELD_GENESIS)
+
+    # Generations start at 0 (the genesis).
+    let (n_gens) = page_length(gen + 1, cursor, page_size)
+    local n_boards = n_gens * want_boards
+    let (local generations : felt*) = alloc()
+    build_array(gen - cursor, n_boards, generations)
+    let (local boards : felt*) = alloc()
+    append_states(game_index, n_boards, generations, boards, 0)
+
+    let (local genesis_gen : felt*) = alloc()
+    assert genesis_gen[0] = 0
+    let (local genesis : felt*) = alloc()
+    append_states(game_index, want_genesis, genesis_gen, genesis, 0)
+
+    let (stored_owner) = owner_of_game.read(game_index)
+    let owner = stored_owner * want_owner
+
+    let (more) = is_le(cursor + page_size + 1, gen + 1)
+    local next_cursor : felt
+    if more * want_boards == 0:
+        assert next_cursor = 0
+    else:
+        assert next_cursor = cursor + page_size
+    end
 
-    return (game_index,
-        a_gen, b_gen, c_gen, d_gen, e_gen,
-        a_owner, b_owner, c_owner, d_owner, e_owner,
-        a0, a1, a2, a3, a4, a5, a6, a7, a8, a9,
-        a10, a11, a12, a13, a14, a15, a16, a17, a18, a19,
-        a20, a21, a22, a23, a24, a25, a26, a27, a28, a29,
-        a30, a31,
-        b0, b1, b2, b3, b4, b5, b6, b7, b8, b9,
-        b10, b11, b12, b13, b14, b15, b16, b17, b18, b19,
-        b20, b21, b22, b23, b24, b25, b26, b27, b28, b29,
-        b30, b31,
-        c0, c1, c2, c3, c4, c5, c6, c7, c8, c9,
-        c10, c11, c12, c13, c14, c15, c16, c17, c18, c19,
-        c20, c21, c22, c23, c24, c25, c26, c27, c28, c29,
-        c30, c31,
-        d0, d1, d2, d3, d4, d5, d6, d7, d8, d9,
-        d10, d11, d12, d13, d14, d15, d16, d17, d18, d19,
-        d20, d21, d22, d23, d24, d25, d26, d27, d28, d29,
-        d30, d31,
-        e0, e1, e2, e3, e4, e5, e6, e7, e8, e9,
-        e10, e11, e12, e13, e14, e15, e16, e17, e18, e19,
-        e20, e21, e22, e23, e24, e25, e26, e27, e28, e29,
-        e30, e31)
+    return (
+        game_index,
+        owner,
+        gen,
+        next_cursor,
+        n_boards,
+        generations,
+        n_boards * 32,
+        boards,
+        want_genesis * 32,
+        genesis)
 end
 
-
-# Get a collection of recently created (or specified) games.
+# Get the summaries of a page of recently created (or specified) games:
+# the current generation of each game, with its population (number of
+# live cells) and changed-row mask. A page holds up to page_size games,
+# counting back from the given game index (0 for the latest). Each
+# summary is one storage read. Pass the returned next_cursor (0 if
+# nothing is left) to get the next page.
 @view
-func get_recent_generations_of_game{
+func get_game_summaries{
         syscall_ptr : felt*,
+        bitwise_ptr : BitwiseBuiltin*,
         pedersen_ptr : HashBuiltin*,
         range_check_ptr
     }(
-        enter_zero_or_specific_game_index : felt
+        enter_zero_or_specific_game_index : felt,
+        cursor : felt,
+        page_size : felt
     ) -> (
-        owner,
-        a0, a1, a2, a3, a4, a5, a6, a7, a8, a9,
-        a10, a11, a12, a13, a14, a15, a16, a17, a18, a19,
-        a20, a21, a22, a23, a24, a25, a26, a27, a28, a29,
-        a30, a31,
-        b0, b1, b2, b3, b4, b5, b6, b7, b8, b9,
-        b10, b11, b12, b13, b14, b15, b16, b17, b18, b19,
-        b20, b21, b22, b23, b24, b25, b26, b27, b28, b29,
-        b30, b31,
-        c0, c1, c2, c3, c4, c5, c6, c7, c8, c9,
-        c10, c11, c12, c13, c14, c15, c16, c17, c18, c19,
-        c20, c21, c22, c23, c24, c25, c26, c27, c28, c29,
-        c30, c31,
-        d0, d1, d2, d3, d4, d5, d6, d7, d8, d9,
-        d10, d11, d12, d13, d14, d15, d16, d17, d18, d19,
-        d20, d21, d22, d23, d24, d25, d26, d27, d28, d29,
-        d30, d31,
-        e0, e1, e2, e3, e4, e5, e6, e7, e8, e9,
-        e10, e11, e12, e13, e14, e15, e16, e17, e18, e19,
-        e20, e21, e22, e23, e24, e25, e26, e27, e28, e29,
-        e30, e31,
-        z0, z1, z2, z3, z4, z5, z6, z7, z8, z9,
-        z10, z11, z12, z13, z14, z15, z16, z17, z18, z19,
-        z20, z21, z22, z23, z24, z25, z26, z27, z28, z29,
-        z30, z31
+        game_index : felt,
+        next_cursor : felt,
+        game_indices_len : felt,
+        game_indices : felt*,
+        generations_len : felt,
+        generations : felt*,
+        populations_len : felt,
+        populations : felt*,
+        masks_len : felt,
+        masks : felt*
     ):
-    # Can return the states of a single game
-    # for indices n, n-1, n-2, n-3, n-4, where
-    # n is the the specified index. If the index specified is 0,
-    # the n is set to the latest game.
     alloc_locals
+    assert_nn(cursor)
+    assert_in_range(page_size, 1, MAX_PAGE_SIZE + 1)
     # If the caller used '0', use the latest ID, otherwise use specified.
     let (index) = latest_game_index.read()
     local game_index : felt
@@ -615,73 +748,156 @@ func get_recent_generations_of_game{
         assert game_index = index
     end
 
-    let (local gen) = latest_game_generation.read(game_index)
+    # Game indices start at 0 (the acorn).
+    let (local n_games) = page_length(game_index + 1, cursor, page_size)
+    let (local game_indices : felt*) = alloc()
+    build_array(game_index - cursor, n_games, game_indices)
+    let (local generations : felt*) = alloc()
+    append_game_generations(n_games, game_indices, generations)
+    let (local populations : felt*) = alloc()
+    let (local masks : felt*) = alloc()
+    append_game_summaries(n_games, game_indices, generations, populations,
+        masks)
+
+    let (more) = is_le(cursor + page_size + 1, game_index + 1)
+    local next_cursor : felt
+    if more == 0:
+        assert next_cursor = 0
+    else:
+        assert next_cursor = cursor + page_size
+    end
 
-    # Fetch images for the latest generations
-    let (a0, a1, a2, a3, a4, a5, a6, a7, a8, a9,
-        a10, a11, a12, a13, a14, a15, a16, a17, a18, a19,
-        a20, a21, a22, a23, a24, a25, a26, a27, a28, a29,
-        a30, a31) = view_game(game_index, gen)
+    return (
+        game_index,
+        next_cursor,
+        n_games,
+        game_indices,
+        n_games,
+        generations,
+        n_games,
+        populations,
+        n_games,
+        masks)
+end
 
-    let (b0, b1, b2, b3, b4, b5, b6, b7, b8, b9,
-        b10, b11, b12, b13, b14, b15, b16, b17, b18, b19,
-        b20, b21, b22, b23, b24, b25, b26, b27, b28, b29,
-        b30, b31) = view_game(game_index, gen - 1)
 
-    let (c0, c1, c2, c3, c4, c5, c6, c7, c8, c9,
-        c10, c11, c12, c13, c14, c15, c16, c17, c18, c19,
-        c20, c21, c22, c23, c24, c25, c26, c27, c28, c29,
-        c30, c31) = view_game(game_index, gen - 2)
+# Get the summaries of a page of the recent generations of a game (0 for
+# the latest game): the population and changed-row mask of each. A page
+# holds up to page_size generations, counting back from the current
+# generation. Pass the returned next_cursor (0 if nothing is left) to
+# get the next page.
+@view
+func get_generation_summaries{
+        syscall_ptr : felt*,
+        bitwise_ptr : BitwiseBuiltin*,
+        pedersen_ptr : HashBuiltin*,
+        range_check_ptr
+    }(
+        enter_zero_or_specific_game_index : felt,
+        cursor : felt,
+        page_size : felt
+    ) -> (
+        game_index : felt,
+        generation : felt,
+        next_cursor : felt,
+        generations_len : felt,
+        generations : felt*,
+        populations_len : felt,
+        populations : felt*,
+        masks_len : felt,
+        masks : felt*
+    ):
+    alloc_locals
+    assert_nn(cursor)
+    assert_in_range(page_size, 1, MAX_PAGE_SIZE + 1)
+    # If the caller used '0', use the latest ID, otherwise use specified.
+    let (index) = latest_game_index.read()
+    local game_index : felt
+    if enter_zero_or_specific_game_index != 0:
+        assert game_index = enter_zero_or_specific_game_index
+    else:
+        assert game_index = index
+    end
 
-    let (d0, d1, d2, d3, d4, d5, d6, d7, d8, d9,
-        d10, d11, d12, d13, d14, d15, d16, d17, d18, d19,
-        d20, d21, d22, d23, d24, d25, d26, d27, d28, d29,
-        d30, d31) = view_game(game_index, gen - 3)
+    let (local gen) = latest_game_generation.read(game_index)
+    # Generations start at 0 (the genesis).
+    let (local n_gens) = page_length(gen + 1, cursor, page_size)
+    let (local generations : felt*) = alloc()
+    build_array(gen - cursor, n_gens, generations)
+    # Every entry is the same game.
+    let (local game_indices : felt*) = alloc()
+    fill_array(game_index, n_gens, game_indices)
+    let (local populations : felt*) = alloc()
+    let (local masks : felt*) = alloc()
+    append_game_summaries(n_gens, game_indices, generations, populations,
+        masks)
+
+    let (more) = is_le(cursor + page_size + 1, gen + 1)
+    local next_cursor : felt
+    if more == 0:
+        assert next_cursor = 0
+    else:
+        assert next_cursor = cursor + page_size
+    end
 
-    let (e0, e1, e2, e3, e4, e5, e6, e7, e8, e9,
-        e10, e11, e12, e13, e14, e15, e16, e17, e18, e19,
-        e20, e21, e22, e23, e24, e25, e26, e27, e28, e29,
-        e30, e31) = view_game(game_index, gen - 4)
+    return (
+        game_index,
+        gen,
+        next_cursor,
+        n_gens,
+        generations,
+        n_gens,
+        populations,
+        n_gens,
+        masks)
+end
 
-    # Also get the image from when the game was created.
-    let (z0, z1, z2, z3, z4, z5, z6, z7, z8, z9,
-        z10, z11, z12, z13, z14, z15, z16, z17, z18, z19,
-        z20, z21, z22, z23, z24, z25, z26, z27, z28, z29,
-        z30, z31) = view_game(game_index, 0)
+# Returns the cycle a game is in, period=0 if none is known.
+@view
+func get_cycle{
+        syscall_ptr : felt*,
+        pedersen_ptr : HashBuiltin*,
+        range_check_ptr
+    }(
+        game_index : felt
+    ) -> (
+        cycle_start : felt,
+        cycle_period : felt
+    ):
+    let (start) = game_cycle_start.read(game_index)
+    let (period) = game_cycle_period.read(game_index)
+    return (start, period)
+end
 
-    let (owner) = owner_of_game.read(game_index)
 
-    return (owner,
-        a0, a1, a2, a3, a4, a5, a6, a7, a8, a9,
-        a10, a11, a12, a13, a14, a15, a16, a17, a18, a19,
-        a20, a21, a22, a23, a24, a25, a26, a27, a28, a29,
-        a30, a31,
-        b0, b1, b2, b3, b4, b5, b6, b7, b8, b9,
-        b10, b11, b12, b13, b14, b15, b16, b17, b18, b19,
-        b20, b21, b22, b23, b24, b25, b26, b27, b28, b29,
-        b30, b31,
-        c0, c1, c2, c3, c4, c5, c6, c7, c8, c9,
-        c10, c11, c12, c13, c14, c15, c16, c17, c18, c19,
-        c20, c21, c22, c23, c24, c25, c26, c27, c28, c29,
-        c30, c31,
-        d0, d1, d2, d3, d4, d5, d6, d7, d8, d9,
-        d10, d11, d12, d13, d14, d15, d16, d17, d18, d19,
-        d20, d21, d22, d23, d24, d25, d26, d27, d28, d29,
-        d30, d31,
-        e0, e1, e2, e3, e4, e5, e6, e7, e8, e9,
-        e10, e11, e12, e13, e14, e15, e16, e17, e18, e19,
-        e20, e21, e22, e23, e24, e25, e26, e27, e28, e29,
-        e30, e31,
-        z0, z1, z2, z3, z4, z5, z6, z7, z8, z9,
-        z10, z11, z12, z13, z14, z15, z16, z17, z18, z19,
-        z20, z21, z22, z23, z24, z25, z26, z27, z28, z29,
-        z30, z31)
+# Returns the first stored generation of a game with a given state
+# hash (the pedersen chain of the slots of the board without the mask).
+# found=0 if the board has not been stored.
+@view
+func generation_of_state_hash{
+        syscall_ptr : felt*,
+        pedersen_ptr : HashBuiltin*,
+        range_check_ptr
+    }(
+        game_index : felt,
+        state_hash : felt
+    ) -> (
+        found : felt,
+        generation : felt
+    ):
+    let (seen) = state_seen_at.read(game_index, state_hash)
+    if seen == 0:
+        return (0, 0)
+    end
+    return (1, seen - 1)
 end
 
+
 # View games and tokens of a particular user.
 @view
 func get_user_data{
         syscall_ptr : felt*,
+        bitwise_ptr : BitwiseBuiltin*,
         pedersen_ptr : HashBuiltin*,
         range_check_ptr
     }(
@@ -843,6 +1059,257 @@ end
 ##### Private functions #####
 #############################
 
+# Evolves a game, saving each new generation and crediting the caller.
+func contribute_and_credit{
+        syscall_ptr : felt*,
+        bitwise_ptr : BitwiseBuiltin*,
+        pedersen_ptr : HashBuiltin*,
+        range_check_ptr
+    }(
+        game_index : felt,
+        generations : felt
+    ):
+    alloc_locals
+    # The per-transaction checks and reads are paid once.
+    let (local user) = get_caller_address()
+    assert_not_zero(user)
+    advance_game(user, game_index, generations)
+
+    # Give a credit for every generation of this particular game.
+    let (credits) = has_credits.read(user)
+    has_credits.write(user, credits + generations)
+    return ()
+end
+
+# Evolves the games of a list in order. Runs of the same game index are
+# evolved together.
+func advance_games{
+        syscall_ptr : felt*,
+        bitwise_ptr : BitwiseBuiltin*,
+        pedersen_ptr : HashBuiltin*,
+        range_check_ptr
+    }(
+        user : felt,
+        game_indices_len : felt,
+        game_indices : felt*
+    ):
+    alloc_locals
+    if game_indices_len == 0:
+        return ()
+    end
+    let (local run) = run_length(game_indices[0], game_indices_len,
+        game_indices)
+    advance_game(user, game_indices[0], run)
+    advance_games(user, game_indices_len - run, game_indices + run)
+    return ()
+end
+
+# Returns how many of the first len entries of an array equal value
+# before a different entry.
+func run_length(
+        value : felt,
+        len : felt,
+        array : felt*
+    ) -> (
+        run : felt
+    ):
+    if len == 0:
+        return (0)
+    end
+    if array[0] != value:
+        return (0)
+    end
+    let (run) = run_length(value, len - 1, array + 1)
+    return (run + 1)
+end
+
+# Evolves a game by some generations, saving each new generation.
+func advance_game{
+        syscall_ptr : felt*,
+        bitwise_ptr : BitwiseBuiltin*,
+        pedersen_ptr : HashBuiltin*,
+        range_check_ptr
+    }(
+        user : felt,
+        game_index : felt,
+        generations : felt
+    ):
+    alloc_locals
+    let (local prev_generation) = latest_game_generation.read(
+        game_index)
+    # Read the stored game.
+    # Rows array is DIM long: One packed row per index.
+    let (key, _) = board_source(game_index, prev_generation)
+    let (local slots_init : felt*) = alloc()
+    read_slots(game_index=game_index, generation=key, slots=slots_init,
+        slot=SLOTS_PER_GEN)
+    let (local rows_init : felt*) = alloc()
+    let (local mask_init) = unpack_generation(slots_init, rows_init)
+    let (start, period) = replayable_cycle(game_index)
+
+    # Evolve the game, saving the generations history keeps.
+    let (final_slots) = save_generations(user=user,
+        game_index=game_index, rows=rows_init, mask=mask_init,
+        slots=slots_init, generation=prev_generation + 1,
+        generations=generations, start=start, period=period)
+    # Unless every generation is stored, the final board is the head.
+    let (separate_head) = has_separate_head()
+    save_slots(game_index=game_index, generation=CURRENT_KEY,
+        slots=final_slots, slot=SLOTS_PER_GEN * separate_head)
+
+    # Save the current generation for easy retrieval.
+    latest_game_generation.write(game_index,
+        prev_generation + generations)
+    return ()
+end
+
+# Evolves one generation at a time, emitting each.
+# Returns the packed slots of the last generation.
+func save_generations{
+        syscall_ptr : felt*,
+        bitwise_ptr : BitwiseBuiltin*,
+        pedersen_ptr : HashBuiltin*,
+        range_check_ptr
+    }(
+        user : felt,
+        game_index : felt,
+        rows : felt*,
+        mask : felt,
+        slots : felt*,
+        generation : felt,
+        generations : felt,
+        start : felt,
+        period : felt
+    ) -> (
+        slots : felt*
+    ):
+    alloc_locals
+    if generations == 0:
+        return (slots)
+    end
+
+    let (local new_rows : felt*, local new_mask, local new_slots : felt*,
+        local summary) = next_board(game_index, rows, mask, generation, start,
+        period)
+    # Save the slots to storage (no slots are written if store=0).
+    let (local store) = is_checkpoint(generation)
+    save_slots(game_index=game_index, generation=generation,
+        slots=new_slots, slot=SLOTS_PER_GEN * store)
+    let (local next_start, local next_period) = track_cycle(game_index,
+        new_slots, summary, generation, store, start, period)
+    game_evolved.emit(user, game_index, generation, SLOTS_PER_GEN,
+        new_slots)
+
+    let (last_slots) = save_generations(user=user,
+        game_index=game_index, rows=new_rows, mask=new_mask,
+        slots=new_slots, generation=generation + 1,
+        generations=generations - 1, start=next_start,
+        period=next_period)
+    return (last_slots)
+end
+
+# Returns the board after rows, its mask, its slots and their summary.
+# Inside a known cycle it is read back from storage, otherwise rows next
+# to a row changed in the last generation are evolved.
+func next_board{
+        syscall_ptr : felt*,
+        bitwise_ptr : BitwiseBuiltin*,
+        pedersen_ptr : HashBuiltin*,
+        range_check_ptr
+    }(
+        game_index : felt,
+        rows : felt*,
+        mask : felt,
+        generation : felt,
+        start : felt,
+        period : felt
+    ) -> (
+        rows : felt*,
+        mask : felt,
+        slots : felt*,
+        summary : felt
+    ):
+    alloc_locals
+    let (local new_slots : felt*) = alloc()
+    if period == 0:
+        let (local new_rows : felt*, local new_mask) = evaluate_rounds_dirty(
+            1, rows, mask)
+        let (summary) = pack_generation(new_rows, new_mask, new_slots)
+        return (new_rows, new_mask, new_slots, summary)
+    end
+    let (_, offset) = unsigned_div_rem(generation - start, period)
+    let (local slots : felt*) = alloc()
+    read_slots(game_index=game_index, generation=start + offset,
+        slots=slots, slot=SLOTS_PER_GEN)
+    let (local new_rows : felt*) = alloc()
+    let (local stored_mask) = unpack_generation(slots, new_rows)
+    # The stored mask is against the board before start + offset,
+    # which is not always this board. The population is read back.
+    let (local new_mask, _) = changed_rows_mask(DIM, rows, new_rows)
+    let (summary) = remask_generation(slots, stored_mask, new_rows, new_mask,
+        new_slots)
+    return (new_rows, new_mask, new_slots, summary)
+end
+
+# Returns the known cycle of a game if boards can be read back from it,
+# which needs every generation to be stored. Otherwise returns (0, 0).
+func replayable_cycle{
+        syscall_ptr : felt*,
+        pedersen_ptr : HashBuiltin*,
+        range_check_ptr
+    }(
+        game_index : felt
+    ) -> (
+        start : felt,
+        period : felt
+    ):
+    let (interval) = history_interval.read()
+    if interval != 1:
+        return (0, 0)
+    end
+    let (start) = game_cycle_start.read(game_index)
+    let (period) = game_cycle_period.read(game_index)
+    return (start, period)
+end
+
+# Indexes the state hash of a newly stored board. If the board was seen
+# before, the game is in a cycle, which is saved and returned. Boards
+# read back from a cycle are not indexed.
+func track_cycle{
+        syscall_ptr : felt*,
+        pedersen_ptr : HashBuiltin*,
+        range_check_ptr
+    }(
+        game_index : felt,
+        slots : felt*,
+        summary : felt,
+        generation : felt,
+        store : felt,
+        start : felt,
+        period : felt
+    ) -> (
+        start : felt,
+        period : felt
+    ):
+    alloc_locals
+    if period != 0:
+        return (start, period)
+    end
+    if store == 0:
+        return (0, 0)
+    end
+    let (local state_hash) = hash_generation(slots, summary)
+    let (seen) = state_seen_at.read(game_index, state_hash)
+    if seen == 0:
+        state_seen_at.write(game_index, state_hash, generation + 1)
+        return (0, 0)
+    end
+    game_cycle_start.write(game_index, seen - 1)
+    game_cycle_period.write(game_index, generation + 1 - seen)
+    let (replay_start, replay_period) = replayable_cycle(game_index)
+    return (replay_start, replay_period)
+end
+
 # Gets m games with n states. 1D array representing a 2D state array.
 func append_recent_user_games{
         syscall_ptr : felt*,
@@ -881,6 +1348,163 @@ func append_recent_user_games{
 end
 
 
+# For an array of game indices, creates an array of their latest
+# generations.
+func append_game_generations{
+        syscall_ptr : felt*,
+        pedersen_ptr : HashBuiltin*,
+        range_check_ptr
+    }(
+        len : felt,
+        game_indices : felt*,
+        generations : felt*
+    ):
+    if len == 0:
+        return ()
+    end
+    # Loop with recursion.
+    append_game_generations(len - 1, game_indices, generations)
+    # On first entry here, len=1.
+    let index = len - 1
+    let (gen) = latest_game_generation.read(game_indices[index])
+    assert generations[index] = gen
+    return ()
+end
+
+
+# For an array of game indices, creates an array of their owners.
+func append_game_owners{
+        syscall_ptr : felt*,
+        pedersen_ptr : HashBuiltin*,
+        range_check_ptr
+    }(
+        len : felt,
+        game_indices : felt*,
+        owners : felt*
+    ):
+    if len == 0:
+        return ()
+    end
+    # Loop with recursion.
+    append_game_owners(len - 1, game_indices, owners)
+    # On first entry here, len=1.
+    let index = len - 1
+    let (owner) = owner_of_game.read(game_indices[index])
+    assert owners[index] = owner
+    return ()
+end
+
+
+# For arrays of game indices and generations, creates arrays of the
+# population and changed-row mask of each game at that generation.
+func append_game_summaries{
+        syscall_ptr : felt*,
+        bitwise_ptr : BitwiseBuiltin*,
+        pedersen_ptr : HashBuiltin*,
+        range_check_ptr
+    }(
+        len : felt,
+        game_indices : felt*,
+        generations : felt*,
+        populations : felt*,
+        masks : felt*
+    ):
+    if len == 0:
+        return ()
+    end
+    # Loop with recursion.
+    append_game_summaries(len - 1, game_indices, generations, populations,
+        masks)
+    # On first entry here, len=1.
+    let index = len - 1
+    let (mask, population) = generation_summary(game_indices[index],
+        generations[index])
+    assert populations[index] = population
+    assert masks[index] = mask
+    return ()
+end
+
+
+# Returns the changed-row mask and population of a generation of a game.
+# A stored generation costs one storage read, others are replayed from
+# their checkpoint.
+func generation_summary{
+        syscall_ptr : felt*,
+        bitwise_ptr : BitwiseBuiltin*,
+        pedersen_ptr : HashBuiltin*,
+        range_check_ptr
+    }(
+        game_index : felt,
+        generation : felt
+    ) -> (
+        mask : felt,
+        population : felt
+    ):
+    alloc_locals
+    let (local key, local rounds) = board_source(game_index, generation)
+    if rounds == 0:
+        let (last_slot) = stored_slot.read(game_index=game_index, gen=key,
+            slot=SLOTS_PER_GEN - 1)
+        let (local last_rows : felt*) = alloc()
+        let (mask, population) = unpack_last_slot(last_slot, last_rows)
+        return (mask, population)
+    end
+    let (local slots : felt*) = alloc()
+    read_slots(game_index=game_index, generation=key, slots=slots,
+        slot=SLOTS_PER_GEN)
+    let (local stored_rows : felt*) = alloc()
+    let (stored_mask) = unpack_generation(slots, stored_rows)
+    let (rows, local mask) = evaluate_rounds_dirty(rounds, stored_rows,
+        stored_mask)
+    let (local new_slots : felt*) = alloc()
+    let (summary) = pack_generation(rows, mask, new_slots)
+    # The summary is mask + population * 2**32.
+    return (mask, (summary - mask) / ROW_SHIFT)
+end
+
+
+# Creates an array of n copies of x.
+func fill_array(
+        x : felt,
+        n : felt,
+        array : felt*
+    ):
+    if n == 0:
+        return ()
+    end
+    fill_array(x, n - 1, array)
+    # n=1 upon first entry here.
+    assert array[n - 1] = x
+    return ()
+end
+
+
+# For arrays of game indices and generations, adds the board of each
+# game at that generation to a state array.
+func append_game_boards{
+        syscall_ptr : felt*,
+        bitwise_ptr : BitwiseBuiltin*,
+        pedersen_ptr : HashBuiltin*,
+        range_check_ptr
+    }(
+        len : felt,
+        game_indices : felt*,
+        generations : felt*,
+        states : felt*
+    ):
+    if len == 0:
+        return ()
+    end
+    # Loop with recursion.
+    append_game_boards(len - 1, game_indices, generations, states)
+    # On first entry here, len=1.
+    let index = len - 1
+    append_states(game_indices[index], 1, generations + index, states,
+        index * 32)
+    return ()
+end
+
+
 # Creates an array of n numbers starting from x: [x, x-1, x-2, x-n-1].
 func build_array{
         syscall_ptr : felt*,
@@ -921,11 +1545,13 @@ func append_states{
     # The offset is where to start appending this particular
     # set of states (there may be preceeding games in the array).
     # states for a frontend to quickly get game data.
+    alloc_locals
     if len == 0:
         return ()
     end
     # Loop with recursion.
     append_states(game_index, len - 1, gen_id_array, states, offset)
+    local bitwise_ptr : BitwiseBuiltin* = bitwise_ptr
     let index = len - 1
     # Get rows for the n-th requested generation.
     let (r0, r1, r2, r3, r4, r5, r6, r7, r8, r9,
@@ -970,76 +1596,132 @@ func append_states{
 end
 
 
-# Pre-sim. Walk rows then columns to build state.
-func unpack_rows{
+# Returns the storage generation key holding a board of a game and
+# the rounds to evolve it by to reach the generation.
+func board_source{
         syscall_ptr : felt*,
-        bitwise_ptr : BitwiseBuiltin*,
         pedersen_ptr : HashBuiltin*,
         range_check_ptr
     }(
         game_index : felt,
-        generation : felt,
-        cell_states : felt*,
-        row : felt
+        generation : felt
+    ) -> (
+        key : felt,
+        rounds : felt
     ):
     alloc_locals
-    if row == 0:
+    let (local interval) = history_interval.read()
+    if interval == 1:
+        return (generation, 0)
+    end
+    let (local current_gen) = latest_game_generation.read(game_index)
+    if generation == current_gen:
+        return (CURRENT_KEY, 0)
+    end
+    if interval == 0:
+        return (generation, 0)
+    end
+    # Unknown generations read as empty storage.
+    let (known) = is_in_range(generation, 0, current_gen)
+    if known == 0:
+        return (generation, 0)
+    end
+    # The genesis (gen 0) is the first checkpoint of every game.
+    let (_, rem) = unsigned_div_rem(generation, interval)
+    return (generation - rem, rem)
+end
+
+
+# Returns 1 if a new generation is stored as a checkpoint.
+func is_checkpoint{
+        syscall_ptr : felt*,
+        pedersen_ptr : HashBuiltin*,
+        range_check_ptr
+    }(
+        generation : felt
+    ) -> (
+        store : felt
+    ):
+    let (interval) = history_interval.read()
+    if interval == 0:
+        return (0)
+    end
+    let (_, rem) = unsigned_div_rem(generation, interval)
+    if rem == 0:
+        return (1)
+    end
+    return (0)
+end
+
+
+# Returns 1 if the current board is kept under CURRENT_KEY, which is
+# the case unless every generation is stored.
+func has_separate_head{
+        syscall_ptr : felt*,
+        pedersen_ptr : HashBuiltin*,
+        range_check_ptr
+    }() -> (
+        separate_head : felt
+    ):
+    let (interval) = history_interval.read()
+    if interval == 1:
+        return (0)
+    end
+    return (1)
+end
+
+# Pre-sim. Walk slots to read a packed board.
+func read_slots{
+        syscall_ptr : felt*,
+        pedersen_ptr : HashBuiltin*,
+        range_check_ptr
+    }(
+        game_index : felt,
+        generation : felt,
+        slots : felt*,
+        slot : felt
+    ):
+    if slot == 0:
         return ()
     end
 
-    unpack_rows(game_index=game_index, generation=generation,
-        cell_states=cell_states, row=row-1)
-    # Get the binary encoded store.
-    # (Note, on first entry, row=1 so row-1 gets the index)
-    let (saved_row) = stored_row.read(game_index=game_index,
-        gen=generation, row=row-1)
-
-    let (local stored_row_unpacked : felt*) = alloc()
-    split_int(
-        value=saved_row,
-        n=32,
-        base=2,
-        bound=2,
-        output=stored_row_unpacked)
-    # Pass the 32-long array to add to the cell_states array.
-    append_cols(cell_states=cell_states,
-        row=row-1, col=DIM, stored_row=stored_row_unpacked)
+    read_slots(game_index=game_index, generation=generation,
+        slots=slots, slot=slot-1)
+    # Each slot holds several binary encoded rows.
+    # (Note, on first entry, slot=1 so slot-1 gets the index)
+    let (saved_slot) = stored_slot.read(game_index=game_index,
+        gen=generation, slot=slot-1)
+    assert slots[slot - 1] = saved_slot
     return ()
 end
 
-# Saves inidividual rows in the given array. (pack rows and save)
-func save_rows{
+# Saves the packed slots in the given array.
+func save_slots{
         syscall_ptr : felt*,
-        bitwise_ptr : BitwiseBuiltin*,
         pedersen_ptr : HashBuiltin*,
         range_check_ptr
     }(
         game_index : felt,
         generation : felt,
-        cell_states : felt*,
-        row : felt
+        slots : felt*,
+        slot : felt
     ):
-    if row == 0:
+    if slot == 0:
         return ()
     end
 
-    save_rows(
+    save_slots(
         game_index=game_index,
         generation=generation,
-        cell_states=cell_states,
-        row=row-1)
-    # (Note, on first entry, row=1 so row-1 gets the index)
-    # Create the binary encoded state for the row.
-    let (row_to_store) = pack_cols(cell_states=cell_states,
-        row=row-1, col=DIM, row_to_store=0)
-
+        slots=slots,
+        slot=slot-1)
+    # (Note, on first entry, slot=1 so slot-1 gets the index)
     # Permanently store the game state.
-    stored_row.write(
+    stored_slot.write(
         game_index=game_index,
         gen=generation,
-        row=row-1,
-        value=row_to_store)
+        slot=slot-1,
+        value=slots[slot - 1])
 
     return ()
 end
-
@@ -6,29 +6,99 @@ from starkware.cairo.common.bitwise import bitwise_and, bitwise_or
 from starkware.cairo.common.cairo_builtins import (HashBuiltin,
     BitwiseBuiltin)
 from starkware.cairo.common.math import (unsigned_div_rem, assert_nn,
-    assert_not_zero, assert_nn_le, assert_not_equal, split_int)
+    assert_not_zero, assert_nn_le, assert_not_equal, assert_in_range,
+    split_int)
+from starkware.cairo.common.math_cmp import is_le, is_in_range
 from starkware.cairo.common.pow import pow
 from starkware.starknet.common.syscalls import (call_contract,
     get_caller_address)
 
-from contracts.utils.packing import pack_cols, append_cols
-from contracts.utils.life_rules import (evaluate_rounds,
-    apply_rules, get_adjacent)
+from contracts.utils.hash_game import hash_generation
+from contracts.utils.paging import has_field, page_length, MAX_PAGE_SIZE
+from contracts.utils.life_rules import (evaluate_rounds_dirty,
+    changed_rows_mask, ALL_ROWS_CHANGED)
+from contracts.utils.packing import (pack_generation, unpack_generation,
+    remask_generation,
+    unpack_slot, unpack_last_slot, last_slot_mask, rows_in_slot,
+    ROWS_PER_SLOT, DIM, SLOTS_PER_GEN, ROW_SHIFT, MASK_SHIFT, POPULATION_SHIFT)
 
 ## This is a high-storage implementation that does not require
-## Events or a token contract.
+## a token contract. Every generation and give_life action is also
+## emitted as an event, so that history can be rebuilt off-chain
+## (see gol2/indexer.py). With a history_interval of 0 only the
+## current board is kept in storage and the events are the history.
+## With a history_interval of n > 1, every n-th generation and every
+## generation changed by give_life is stored as a checkpoint. Other
+## generations are recomputed from the checkpoint before them on view.
 
 ##### Constants #####
-# Width of the simulation grid.
-const DIM = 32
+# Most generations a single turn may evolve (and claim).
+const MAX_GENERATIONS_PER_TURN = 10
+# Storage key of the current board when history is not stored.
+const CURRENT_KEY = -1
+# Longest gap between checkpoints (bounds the replay cost of a view).
+const MAX_HISTORY_INTERVAL = 50
+# Most cells a single give_life_to_cells call may revive.
+const MAX_CELLS_PER_GIVE_LIFE = 64
+# The mask bit of the first row of a slot over that of the slot before
+# (2 ** ROWS_PER_SLOT).
+const SLOT_MASK_STEP = 2 ** 7
+# The mask bit of the first row of the last slot.
+const LAST_SLOT_BIT = 2 ** 28
+# The acorn is generation 1.
+const GENESIS_GEN = 1
+# Field mask bits of latest_useful_state.
+const FIELD_BOARDS = 1
+const FIELD_OWNERS = 2
+const FIELD_REDEMPTIONS = 4
 
 ##### Storage #####
 
+# 1 stores every generation, 0 stores only the current board,
+# n > 1 stores a checkpoint every n generations.
+@storage_var
+func history_interval() -> (interval : felt):
+end
+
+# With checkpoints, the latest generation changed by give_life in each
+# group of history_interval generations (bucket = gen_id / interval).
+@storage_var
+func latest_edit_in_bucket(bucket : felt) -> (gen_id : felt):
+end
+
+# The previous give_life changed generation in the same bucket (or 0).
+@storage_var
+func previous_edit(gen_id : felt) -> (prev_gen_id : felt):
+end
+
 # Returns the gen_id of the current alive generation.
 @storage_var
 func current_generation() -> (gen_id : felt):
 end
 
+# The first stored generation holding a board, by state hash (see
+# utils/hash_game.cairo).
+@storage_var
+func generation_of_state(state_hash : felt) -> (gen_id : felt):
+end
+
+# Once a board repeats, the board at gen_id >= cycle_start is the one at
+# cycle_start + (gen_id - cycle_start) % cycle_period. The period is 0
+# if no cycle is known, or give_life has changed the board since.
+@storage_var
+func cycle_start() -> (gen_id : felt):
+end
+
+@storage_var
+func cycle_period() -> (period : felt):
+end
+
+# The latest generation changed by give_life (0 if none). Boards up to
+# it may have been edited after they were indexed.
+@storage_var
+func last_edit_generation() -> (gen_id : felt):
+end
+
 # Stores how many tokens have been redeemed for a give_life act.
 @storage_var
 func redemption_count() -> (count : felt):
@@ -76,14 +146,16 @@ func highest_redemption_index_of_gen(gen_id : felt) -> (
     redemption_index_of_token : felt):
 end
 
-# Records the history of the game on chain.
-# Could pack this more efficiently (E.g., 1/4 storage if packed).
+# Records the history of the game on chain, keyed by generation.
+# Rows are packed ROWS_PER_SLOT to a slot (see utils/packing.cairo).
+# Unless every generation is stored, the current board is under
+# CURRENT_KEY.
 @storage_var
-func historical_row(
+func historical_slot(
         gen_id : felt,
-        row_index : felt
+        slot_index : felt
     ) -> (
-        row_state : felt
+        packed_rows : felt
     ):
 end
 
@@ -96,6 +168,30 @@ func token_gave_life(
     ):
 end
 
+##### Events #####
+
+# A new generation, with its board packed as in storage.
+@event
+func generation_evolved(
+        user_id : felt,
+        gen_id : felt,
+        packed_rows_len : felt,
+        packed_rows : felt*
+    ):
+end
+
+# A give life token was redeemed on the current generation.
+@event
+func life_given(
+        user_id : felt,
+        token_id : felt,
+        redemption_index : felt,
+        gen_id : felt,
+        cell_row_index : felt,
+        cell_column_index : felt
+    ):
+end
+
 ##################
 
 @constructor
@@ -103,16 +199,34 @@ func constructor{
         syscall_ptr : felt*,
         pedersen_ptr : HashBuiltin*,
         range_check_ptr
-    }():
+    }(
+        interval : felt
+    ):
+    alloc_locals
+    assert_nn_le(interval, MAX_HISTORY_INTERVAL)
+    history_interval.write(interval)
 
     # Start with an acorn near bottom right in a 32x32 grid.
     # https://www.conwaylife.com/patterns/acorn.cells
     # https://playgameoflife.com/lexicon/acorn
-    historical_row.write(1, 12, 32)
-    historical_row.write(1, 13, 8)
-    historical_row.write(1, 14, 103)
-    # Set the current generation as '1'.
-    current_generation.write(1)
+    # Rows 12 and 13 are the top of slot 1, row 14 starts slot 2.
+    let (local acorn : felt*) = alloc()
+    assert acorn[0] = 0
+    assert acorn[1] = 32 * ROW_SHIFT ** 5 + 8 * ROW_SHIFT ** 6
+    assert acorn[2] = 103
+    assert acorn[3] = 0
+    # Every row of a new board counts as changed. The acorn has 7 cells.
+    local acorn_summary = ALL_ROWS_CHANGED + 7 * ROW_SHIFT
+    assert acorn[4] = acorn_summary * MASK_SHIFT
+    # The genesis is always kept. It is also the current board.
+    current_generation.write(GENESIS_GEN)
+    write_slots(key=GENESIS_GEN, slots=acorn, slot=SLOTS_PER_GEN)
+    let (acorn_hash) = hash_generation(acorn, acorn_summary)
+    generation_of_state.write(acorn_hash, GENESIS_GEN)
+    if interval == 1:
+        return ()
+    end
+    write_slots(key=CURRENT_KEY, slots=acorn, slot=SLOTS_PER_GEN)
     # Prevent entry to this function again.
     return ()
 end
@@ -129,37 +243,26 @@ func evolve_and_claim_next_generation{
     }(
         user_id : felt
     ):
-    alloc_locals
-    let (local last_gen) = current_generation.read()
     # Limit to one generation per turn.
-    local generations = 1
-    local new_gen = last_gen + generations
-    # Unpack the stored game
-    # Iterates over rows, then cols to get an array of all cells.
-    let (local cell_states_init : felt*) = alloc()
-    unpack_rows(gen_id=last_gen, cell_states=cell_states_init,row=DIM)
-
-    # Run the game for the specified number of generations.
-    let (local cell_states : felt*) = evaluate_rounds(
-        generations, cell_states_init)
-    # Pack the game for storage.
-    pack_rows(new_gen, cell_states, row=DIM)
-
-    # Save the current generation.
-    current_generation.write(new_gen)
-
-    # To expose information to the frontend (pending Token/Events).
-    let user = user_id
-    let (caller) = get_caller_address()
-    # For testing, skip account contract use.
-    assert_not_zero(caller)
-    assert user = caller
+    evolve_and_claim(user_id, 1)
+    return ()
+end
 
-    let (prev_tokens) = count_tokens_owned.read(user)
-    count_tokens_owned.write(user, prev_tokens + 1)
-    # Store the token_id as a zero-based index of the users token.
-    generation_of_owner.write(user, prev_tokens, new_gen)
-    owner_of_generation.write(new_gen, user)
+# Progresses the game by several generations in one turn.
+# Every generation is stored and claimed as a token by the user.
+@external
+func evolve_and_claim_generations{
+        syscall_ptr : felt*,
+        bitwise_ptr : BitwiseBuiltin*,
+        pedersen_ptr : HashBuiltin*,
+        range_check_ptr
+    }(
+        user_id : felt,
+        generations : felt
+    ):
+    # 1 <= generations <= MAX_GENERATIONS_PER_TURN.
+    assert_in_range(generations, 1, MAX_GENERATIONS_PER_TURN + 1)
+    evolve_and_claim(user_id, generations)
     return ()
 end
 
@@ -193,8 +296,12 @@ func give_life_to_cell{
 
     activate_cell(cell_row_index, cell_column_index)
 
-    # Temporary record pending Events.
-    let (current_gen) = current_generation.read()
+    # Temporary record alongside the life_given event.
+    let (local current_gen) = current_generation.read()
+    record_edit(current_gen)
+    # The edited board breaks any cycle.
+    last_edit_generation.write(current_gen)
+    cycle_period.write(0)
     let (local redeemed) = token_redeemed_at.read(gen_id_of_token_to_redeem)
     # Assumption: storage is initialized as zero.
     # Enable this check when accounts are used.
@@ -205,14 +312,87 @@ func give_life_to_cell{
     token_redeemed_at.write(gen_id_of_token_to_redeem, current_gen)
 
     # Index the redemption for simpler database creation.
-    let (redemptions) = redemption_count.read()
+    let (local redemptions) = redemption_count.read()
     redemption_count.write(redemptions + 1)
     # New redemption index = count - 1 + 1 = count
-    token_at_redemption_index.write(redemptions, current_gen)
-    redemption_index_of_token.write(current_gen, redemptions)
+    token_at_redemption_index.write(redemptions, gen_id_of_token_to_redeem)
+    redemption_index_of_token.write(gen_id_of_token_to_redeem, redemptions)
     # For the current generation overwrite the redemption index.
     # If multiple give_live actions are used, stores the highest index.
     highest_redemption_index_of_gen.write(current_gen, redemptions)
+    life_given.emit(user_id, gen_id_of_token_to_redeem, redemptions,
+        current_gen, cell_row_index, cell_column_index)
+    return ()
+end
+
+
+# Redeems several tokens at once, each reviving one cell of the current
+# generation. Cells must be sorted by row, then by column, with no cell
+# given twice (token_ids, cell_rows and cell_cols are in the same
+# order). Only the slots holding a revived row are read and written,
+# once each.
+@external
+func give_life_to_cells{
+        syscall_ptr : felt*,
+        bitwise_ptr : BitwiseBuiltin*,
+        pedersen_ptr : HashBuiltin*,
+        range_check_ptr
+    }(
+        user_id : felt,
+        token_ids_len : felt,
+        token_ids : felt*,
+        cell_rows_len : felt,
+        cell_rows : felt*,
+        cell_cols_len : felt,
+        cell_cols : felt*
+    ):
+    alloc_locals
+    # Only the caller can redeem
+    let (user) = get_caller_address()
+    # For testing, skip account contract use. TODO add accounts.
+    assert user = user_id
+    assert_not_zero(user)
+    assert cell_rows_len = token_ids_len
+    assert cell_cols_len = token_ids_len
+    assert_in_range(token_ids_len, 1, MAX_CELLS_PER_GIVE_LIFE + 1)
+
+    # Revive every cell in the packed slots, reading and writing only the
+    # slots that hold a revived row.
+    let (local current_gen) = current_generation.read()
+    let (local key, _) = board_source(current_gen)
+    let (local revived_mask, local n_cells) = revive_slots(key=key, slot=0,
+        slot_bit=1, cells_len=token_ids_len, cell_rows=cell_rows,
+        cell_cols=cell_cols)
+    # The last slot always changes: it also holds the summary.
+    let last_row = (SLOTS_PER_GEN - 1) * ROWS_PER_SLOT
+    let (local added, local last_mask, last_cells) = revive_slot_rows(
+        min_row=last_row, first_row=last_row, slot_bit=LAST_SLOT_BIT,
+        end_row=DIM, cells_len=token_ids_len - n_cells,
+        cell_rows=cell_rows + n_cells, cell_cols=cell_cols + n_cells)
+    # Cells out of range or out of order are never reached.
+    assert n_cells + last_cells = token_ids_len
+    let (local last_slot) = historical_slot.read(key, SLOTS_PER_GEN - 1)
+    let (alive) = bitwise_and(last_slot, added)
+    assert alive = 0
+    # The next evolution must recompute around the edited rows. Every
+    # revived cell was dead, so the population grows by one per cell.
+    let (local mask) = last_slot_mask(last_slot)
+    let (new_mask) = bitwise_or(mask, revived_mask + last_mask)
+    historical_slot.write(key, SLOTS_PER_GEN - 1, last_slot + added +
+        (new_mask - mask) * MASK_SHIFT + token_ids_len * POPULATION_SHIFT)
+
+    record_edit(current_gen)
+    # The edited board breaks any cycle.
+    last_edit_generation.write(current_gen)
+    cycle_period.write(0)
+
+    # Index the redemptions in bulk.
+    let (local redemptions) = redemption_count.read()
+    redeem_tokens(user_id, token_ids_len, token_ids, cell_rows,
+        cell_cols, current_gen, redemptions)
+    redemption_count.write(redemptions + token_ids_len)
+    highest_redemption_index_of_gen.write(current_gen,
+        redemptions + token_ids_len - 1)
     return ()
 end
 
@@ -298,9 +478,11 @@ end
 
 
 # Returns a list of rows for the specified generation.
+# Between checkpoints the generation is recomputed from the last one.
 @view
 func view_game{
         syscall_ptr : felt*,
+        bitwise_ptr : BitwiseBuiltin*,
         pedersen_ptr : HashBuiltin*,
         range_check_ptr
     }(
@@ -315,47 +497,53 @@ func view_game{
         row_24 : felt, row_25 : felt, row_26 : felt, row_27 : felt,
         row_28 : felt, row_29 : felt, row_30 : felt, row_31 : felt
     ):
-    let gen_id = id_of_generation_to_view
-
-    let (row_0) = historical_row.read(gen_id, 0)
-    let (row_1) = historical_row.read(gen_id, 1)
-    let (row_2) = historical_row.read(gen_id, 2)
-    let (row_3) = historical_row.read(gen_id, 3)
-    let (row_4) = historical_row.read(gen_id, 4)
-    let (row_5) = historical_row.read(gen_id, 5)
-    let (row_6) = historical_row.read(gen_id, 6)
-    let (row_7) = historical_row.read(gen_id, 7)
-    let (row_8) = historical_row.read(gen_id, 8)
-    let (row_9) = historical_row.read(gen_id, 9)
-    let (row_10) = historical_row.read(gen_id, 10)
-    let (row_11) = historical_row.read(gen_id, 11)
-    let (row_12) = historical_row.read(gen_id, 12)
-    let (row_13) = historical_row.read(gen_id, 13)
-    let (row_14) = historical_row.read(gen_id, 14)
-    let (row_15) = historical_row.read(gen_id, 15)
-    let (row_16) = historical_row.read(gen_id, 16)
-    let (row_17) = historical_row.read(gen_id, 17)
-    let (row_18) = historical_row.read(gen_id, 18)
-    let (row_19) = historical_row.read(gen_id, 19)
-    let (row_20) = historical_row.read(gen_id, 20)
-    let (row_21) = historical_row.read(gen_id, 21)
-    let (row_22) = historical_row.read(gen_id, 22)
-    let (row_23) = historical_row.read(gen_id, 23)
-    let (row_24) = historical_row.read(gen_id, 24)
-    let (row_25) = historical_row.read(gen_id, 25)
-    let (row_26) = historical_row.read(gen_id, 26)
-    let (row_27) = historical_row.read(gen_id, 27)
-    let (row_28) = historical_row.read(gen_id, 28)
-    let (row_29) = historical_row.read(gen_id, 29)
-    let (row_30) = historical_row.read(gen_id, 30)
-    let (row_31) = historical_row.read(gen_id, 31)
-
-    return (row_0, row_1, row_2, row_3, row_4, row_5,
-        row_6, row_7, row_8, row_9, row_10, row_11,
-        row_12, row_13, row_14, row_15, row_16, row_17,
-        row_18, row_19, row_20, row_21, row_22, row_23,
-        row_24, row_25, row_26, row_27, row_28, row_29,
-        row_30, row_31)
+    alloc_locals
+    let (key, local rounds) = board_source(id_of_generation_to_view)
+    let (local slots : felt*) = alloc()
+    read_slots(key=key, slots=slots, slot=SLOTS_PER_GEN)
+    let (local stored_rows : felt*) = alloc()
+    let (mask) = unpack_generation(slots, stored_rows)
+    let (rows, _) = evaluate_rounds_dirty(rounds, stored_rows, mask)
+
+    return (rows[0], rows[1], rows[2], rows[3], rows[4], rows[5],
+        rows[6], rows[7], rows[8], rows[9], rows[10], rows[11],
+        rows[12], rows[13], rows[14], rows[15], rows[16], rows[17],
+        rows[18], rows[19], rows[20], rows[21], rows[22], rows[23],
+        rows[24], rows[25], rows[26], rows[27], rows[28], rows[29],
+        rows[30], rows[31])
+end
+
+
+# Returns the cycle the game is in, period=0 if none is known.
+@view
+func get_cycle{
+        syscall_ptr : felt*,
+        pedersen_ptr : HashBuiltin*,
+        range_check_ptr
+    }() -> (
+        cycle_start : felt,
+        cycle_period : felt
+    ):
+    let (start) = cycle_start.read()
+    let (period) = cycle_period.read()
+    return (start, period)
+end
+
+
+# Returns the first stored generation with a given state hash (the
+# pedersen chain of the slots of the board without the mask), or 0.
+@view
+func generation_of_state_hash{
+        syscall_ptr : felt*,
+        pedersen_ptr : HashBuiltin*,
+        range_check_ptr
+    }(
+        state_hash : felt
+    ) -> (
+        gen_id : felt
+    ):
+    let (gen_id) = generation_of_state.read(state_hash)
+    return (gen_id)
 end
 
 
@@ -463,126 +651,168 @@ func get_token_data{
     )
 end
 
-# Get a collection of useful contemporary information
+# Get a page of useful contemporary information. Only the fields set in
+# the field mask are fetched (FIELD_BOARDS, FIELD_OWNERS,
+# FIELD_REDEMPTIONS). A page holds up to page_size generations, counting
+# back from the given generation (0 for the current one), and up to
+# page_size redemptions, counting back from the latest. Pass the
+# returned next_cursor (0 if nothing is left) to get the next page.
 @view
 func latest_useful_state{
         syscall_ptr : felt*,
+        bitwise_ptr : BitwiseBuiltin*,
         pedersen_ptr : HashBuiltin*,
         range_check_ptr
     }(
-        enter_zero_or_specific_generation_id : felt
+        enter_zero_or_specific_generation_id : felt,
+        fields : felt,
+        cursor : felt,
+        page_size : felt
     ) -> (
-        gen_id, latest_red, a_owner, b_owner, c_owner,
-        r0_id, r0_gen, r0_row, r0_col, r0_owner,
-        r1_id, r1_gen, r1_row, r1_col, r1_owner,
-        r2_id, r2_gen, r2_row, r2_col, r2_owner,
-        r3_id, r3_gen, r3_row, r3_col, r3_owner,
-        r4_id, r4_gen, r4_row, r4_col, r4_owner,
-        r5_id, r5_gen, r5_row, r5_col, r5_owner,
-        r6_id, r6_gen, r6_row, r6_col, r6_owner,
-        r7_id, r7_gen, r7_row, r7_col, r7_owner,
-        r8_id, r8_gen, r8_row, r8_col, r8_owner,
-        r9_id, r9_gen, r9_row, r9_col, r9_owner,
-        a0, a1, a2, a3, a4, a5, a6, a7, a8, a9,
-        a10, a11, a12, a13, a14, a15, a16, a17, a18, a19,
-        a20, a21, a22, a23, a24, a25, a26, a27, a28, a29,
-        a30, a31,
-        b0, b1, b2, b3, b4, b5, b6, b7, b8, b9,
-        b10, b11, b12, b13, b14, b15, b16, b17, b18, b19,
-        b20, b21, b22, b23, b24, b25, b26, b27, b28, b29,
-        b30, b31,
-        c0, c1, c2, c3, c4, c5, c6, c7, c8, c9,
-        c10, c11, c12, c13, c14, c15, c16, c17, c18, c19,
-        c20, c21, c22, c23, c24, c25, c26, c27, c28, c29,
-        c30, c31
-    ):
-    # gen_id = la
+        gen_id : felt,
+        redemption_count : felt,
+        next_cursor : felt,
+        gen_ids_len : felt,
+        gen_ids : felt*,
+        boards_len : felt,
+        boards : felt*,
+        owners_len : felt,
+        owners : felt*,
+        redemptions_len : felt,
+        redemptions : felt*
+    ):
+    # Output descriptions:
+    #   gen_ids -> generations of the page, most recent first.
+    #   boards -> 32 rows for each of gen_ids.
+    #   owners -> owner of each of gen_ids.
+    #   redemptions -> 6 fields for each give life redemption:
+    #       [redemption_index, id_minted, id_used, row, col, owner]
     alloc_locals
+    assert_nn(cursor)
+    assert_in_range(page_size, 1, MAX_PAGE_SIZE + 1)
     # If the caller used '0', use the latest ID, otherwise use specified.
     let (current_id) = current_generation.read()
+    local gen_id : felt
+    if enter_zero_or_specific_generation_id != 0:
+        assert gen_id = enter_zero_or_specific_generation_id
+    else:
+        assert gen_id = current_id
+    end
+    let (local count) = redemption_count.read()
+
+    let (local want_boards) = has_field(fields, FIELD_BOARDS)
+    let (local want_owners) = has_field(fields, FIELD_OWNERS)
+    let (local want_redemptions) = has_field(fields, FIELD_REDEMPTIONS)
+
+    # Generations start at GENESIS_GEN, so there are gen_id of them.
+    let (local want_gens) = has_field(fields, FIELD_BOARDS + FIELD_OWNERS)
+    let (n_gens) = page_length(gen_id, cursor, page_size)
+    local gen_ids_len = n_gens * want_gens
+    let (local gen_ids : felt*) = alloc()
+    build_array(gen_id - cursor, gen_ids_len, gen_ids)
+
+    let (local boards : felt*) = alloc()
+    local n_boards = gen_ids_len * want_boards
+    append_states(n_boards, gen_ids, boards)
+
+    let (local owners : felt*) = alloc()
+    local n_owners = gen_ids_len * want_owners
+    append_owners(n_owners, gen_ids, owners)
+
+    # Redemption indices start at 0, the latest is count - 1.
+    let (n_red) = page_length(count, cursor, page_size)
+    local n_redemptions = n_red * want_redemptions
+    let (local red_indices : felt*) = alloc()
+    build_array(count - 1 - cursor, n_redemptions, red_indices)
+    let (local redemptions : felt*) = alloc()
+    append_redemptions(n_redemptions, red_indices, redemptions)
+
+    let (more_gens) = is_le(cursor + page_size + 1, gen_id)
+    let (more_redemptions) = is_le(cursor + page_size + 1, count)
+    local next_cursor : felt
+    if more_gens * want_gens + more_redemptions * want_redemptions == 0:
+        assert next_cursor = 0
+    else:
+        assert next_cursor = cursor + page_size
+    end
+
+    return (
+        gen_id,
+        count,
+        next_cursor,
+        gen_ids_len,
+        gen_ids,
+        n_boards * 32,
+        boards,
+        n_owners,
+        owners,
+        n_redemptions * 6,
+        redemptions)
+end
 
+# Get the summaries of a page of generations: the population (number of
+# live cells) and changed-row mask of each, read from the last storage
+# slot of a stored generation without unpacking the board. A page holds
+# up to page_size generations, counting back from the given generation
+# (0 for the current one). Pass the returned next_cursor (0 if nothing
+# is left) to get the next page.
+@view
+func get_generation_summaries{
+        syscall_ptr : felt*,
+        bitwise_ptr : BitwiseBuiltin*,
+        pedersen_ptr : HashBuiltin*,
+        range_check_ptr
+    }(
+        enter_zero_or_specific_generation_id : felt,
+        cursor : felt,
+        page_size : felt
+    ) -> (
+        gen_id : felt,
+        next_cursor : felt,
+        gen_ids_len : felt,
+        gen_ids : felt*,
+        populations_len : felt,
+        populations : felt*,
+        masks_len : felt,
+        masks : felt*
+    ):
+    alloc_locals
+    assert_nn(cursor)
+    assert_in_range(page_size, 1, MAX_PAGE_SIZE + 1)
+    # If the caller used '0', use the latest ID, otherwise use specified.
+    let (current_id) = current_generation.read()
     local gen_id : felt
     if enter_zero_or_specific_generation_id != 0:
         assert gen_id = enter_zero_or_specific_generation_id
     else:
         assert gen_id = current_id
     end
-    # Returns:
-    # Current generation_id
-    # three images (a=current, b=n-1, c=n-2).
-    # a4 = image a (current image), row index 4 (fifth row).
-
-    # For the given generation, get the index of the latest
-    # give_live redemption.
-    let (latest_red) = highest_redemption_index_of_gen.read(gen_id)
-
-    # TODO if caller is asking for an older generation, perhaps need
-    # fetch for redemption tokens from that generation.
-    # Get token_ids of the 5 most recently redeemed give-life tokens.
-    let (r0_id) = token_id_from_redemption_index(latest_red)
-    let (r1_id) = token_id_from_redemption_index(latest_red - 1)
-    let (r2_id) = token_id_from_redemption_index(latest_red - 2)
-    let (r3_id) = token_id_from_redemption_index(latest_red - 3)
-    let (r4_id) = token_id_from_redemption_index(latest_red - 4)
-    let (r5_id) = token_id_from_redemption_index(latest_red - 5)
-    let (r6_id) = token_id_from_redemption_index(latest_red - 6)
-    let (r7_id) = token_id_from_redemption_index(latest_red - 7)
-    let (r8_id) = token_id_from_redemption_index(latest_red - 8)
-    let (r9_id) = token_id_from_redemption_index(latest_red - 9)
-    # Get the effect of the give_life action (generation, row, col).
-    let (_, r0_gen, r0_row, r0_col, r0_owner) = get_token_data(r0_id)
-    let (_, r1_gen, r1_row, r1_col, r1_owner) = get_token_data(r1_id)
-    let (_, r2_gen, r2_row, r2_col, r2_owner) = get_token_data(r2_id)
-    let (_, r3_gen, r3_row, r3_col, r3_owner) = get_token_data(r3_id)
-    let (_, r4_gen, r4_row, r4_col, r4_owner) = get_token_data(r4_id)
-    let (_, r5_gen, r5_row, r5_col, r5_owner) = get_token_data(r5_id)
-    let (_, r6_gen, r6_row, r6_col, r6_owner) = get_token_data(r6_id)
-    let (_, r7_gen, r7_row, r7_col, r7_owner) = get_token_data(r7_id)
-    let (_, r8_gen, r8_row, r8_col, r8_owner) = get_token_data(r8_id)
-    let (_, r9_gen, r9_row, r9_col, r9_owner) = get_token_data(r9_id)
-
-    let (a0, a1, a2, a3, a4, a5, a6, a7, a8, a9,
-        a10, a11, a12, a13, a14, a15, a16, a17, a18, a19,
-        a20, a21, a22, a23, a24, a25, a26, a27, a28, a29,
-        a30, a31) = view_game(gen_id)
-
-    let (b0, b1, b2, b3, b4, b5, b6, b7, b8, b9,
-        b10, b11, b12, b13, b14, b15, b16, b17, b18, b19,
-        b20, b21, b22, b23, b24, b25, b26, b27, b28, b29,
-        b30, b31) = view_game(gen_id - 1)
-
-    let (c0, c1, c2, c3, c4, c5, c6, c7, c8, c9,
-        c10, c11, c12, c13, c14, c15, c16, c17, c18, c19,
-        c20, c21, c22, c23, c24, c25, c26, c27, c28, c29,
-        c30, c31) = view_game(gen_id - 2)
-
-    let (a_owner) = owner_of_generation.read(gen_id)
-    let (b_owner) = owner_of_generation.read(gen_id - 1)
-    let (c_owner) = owner_of_generation.read(gen_id - 2)
-
-    return (gen_id, latest_red, a_owner, b_owner, c_owner,
-        r0_id, r0_gen, r0_row, r0_col, r0_owner,
-        r1_id, r1_gen, r1_row, r1_col, r1_owner,
-        r2_id, r2_gen, r2_row, r2_col, r2_owner,
-        r3_id, r3_gen, r3_row, r3_col, r3_owner,
-        r4_id, r4_gen, r4_row, r4_col, r4_owner,
-        r5_id, r5_gen, r5_row, r5_col, r5_owner,
-        r6_id, r6_gen, r6_row, r6_col, r6_owner,
-        r7_id, r7_gen, r7_row, r7_col, r7_owner,
-        r8_id, r8_gen, r8_row, r8_col, r8_owner,
-        r9_id, r9_gen, r9_row, r9_col, r9_owner,
-        a0, a1, a2, a3, a4, a5, a6, a7, a8, a9,
-        a10, a11, a12, a13, a14, a15, a16, a17, a18, a19,
-        a20, a21, a22, a23, a24, a25, a26, a27, a28, a29,
-        a30, a31,
-        b0, b1, b2, b3, b4, b5, b6, b7, b8, b9,
-        b10, b11, b12, b13, b14, b15, b16, b17, b18, b19,
-        b20, b21, b22, b23, b24, b25, b26, b27, b28, b29,
-        b30, b31,
-        c0, c1, c2, c3, c4, c5, c6, c7, c8, c9,
-        c10, c11, c12, c13, c14, c15, c16, c17, c18, c19,
-        c20, c21, c22, c23, c24, c25, c26, c27, c28, c29,
-        c30, c31)
+
+    # Generations start at GENESIS_GEN, so there are gen_id of them.
+    let (local n_gens) = page_length(gen_id, cursor, page_size)
+    let (local gen_ids : felt*) = alloc()
+    build_array(gen_id - cursor, n_gens, gen_ids)
+    let (local populations : felt*) = alloc()
+    let (local masks : felt*) = alloc()
+    append_summaries(n_gens, gen_ids, populations, masks)
+
+    let (more) = is_le(cursor + page_size + 1, gen_id)
+    local next_cursor : felt
+    if more == 0:
+        assert next_cursor = 0
+    else:
+        assert next_cursor = cursor + page_size
+    end
+
+    return (
+        gen_id,
+        next_cursor,
+        n_gens,
+        gen_ids,
+        n_gens,
+        populations,
+        n_gens,
+        masks)
 end
 
 # Pass a list of generation ids to fetch multiple states.
@@ -731,6 +961,203 @@ func get_user_tokens{
 end
 
 ##### Private functions #####
+# Evolves the current generation and claims each new generation.
+func evolve_and_claim{
+        syscall_ptr : felt*,
+        bitwise_ptr : BitwiseBuiltin*,
+        pedersen_ptr : HashBuiltin*,
+        range_check_ptr
+    }(
+        user_id : felt,
+        generations : felt
+    ):
+    alloc_locals
+    # The per-turn checks and reads are paid once for all generations.
+    let user = user_id
+    let (caller) = get_caller_address()
+    # For testing, skip account contract use.
+    assert_not_zero(caller)
+    assert user = caller
+
+    let (local last_gen) = current_generation.read()
+    # Read the stored game as an array of packed rows.
+    let (local key, _) = board_source(last_gen)
+    let (local slots_init : felt*) = alloc()
+    read_slots(key=key, slots=slots_init, slot=SLOTS_PER_GEN)
+    let (local rows_init : felt*) = alloc()
+    let (local mask_init) = unpack_generation(slots_init, rows_init)
+    # A board changed by give_life becomes a checkpoint as it is left.
+    let (edited) = is_edit_checkpoint(last_gen)
+    write_slots(key=last_gen, slots=slots_init,
+        slot=SLOTS_PER_GEN * edited)
+
+    let (local prev_tokens) = count_tokens_owned.read(user)
+    let (start, period) = replayable_cycle()
+    # Run the game, storing the generations that are checkpoints.
+    let (local final_slots) = claim_generations(user=user,
+        rows=rows_init, mask=mask_init, gen_id=last_gen + 1,
+        token_index=prev_tokens, generations=generations,
+        start=start, period=period)
+
+    # Save the current generation.
+    current_generation.write(last_gen + generations)
+    count_tokens_owned.write(user, prev_tokens + generations)
+
+    # Unless every generation is stored, keep the board as current.
+    let (interval) = history_interval.read()
+    if interval == 1:
+        return ()
+    end
+    write_slots(key=CURRENT_KEY, slots=final_slots, slot=SLOTS_PER_GEN)
+    return ()
+end
+
+# Evolves one generation at a time, emitting and assigning each.
+# Returns the packed slots of the last generation.
+func claim_generations{
+        syscall_ptr : felt*,
+        bitwise_ptr : BitwiseBuiltin*,
+        pedersen_ptr : HashBuiltin*,
+        range_check_ptr
+    }(
+        user : felt,
+        rows : felt*,
+        mask : felt,
+        gen_id : felt,
+        token_index : felt,
+        generations : felt,
+        start : felt,
+        period : felt
+    ) -> (
+        slots : felt*
+    ):
+    alloc_locals
+    let (local new_rows : felt*, local new_mask, local new_slots : felt*,
+        local summary) = next_board(rows, mask, gen_id, start, period)
+    # Save the slots to storage (no slots are written if store=0).
+    let (local store) = is_checkpoint(gen_id)
+    write_slots(key=gen_id, slots=new_slots, slot=SLOTS_PER_GEN * store)
+    let (local next_start, local next_period) = track_cycle(new_slots,
+        summary, gen_id, store, start, period)
+    generation_evolved.emit(user, gen_id, SLOTS_PER_GEN, new_slots)
+    # To expose information to the frontend.
+    # Store the token_id as a zero-based index of the users token.
+    generation_of_owner.write(user, token_index, gen_id)
+    owner_of_generation.write(gen_id, user)
+
+    if generations == 1:
+        return (new_slots)
+    end
+    let (last_slots) = claim_generations(user=user, rows=new_rows,
+        mask=new_mask, gen_id=gen_id + 1, token_index=token_index + 1,
+        generations=generations - 1, start=next_start,
+        period=next_period)
+    return (last_slots)
+end
+
+# Returns the board after rows, its mask, its slots and their summary.
+# Inside a known cycle it is read back from storage, otherwise rows next
+# to a row changed in the last generation are evolved.
+func next_board{
+        syscall_ptr : felt*,
+        bitwise_ptr : BitwiseBuiltin*,
+        pedersen_ptr : HashBuiltin*,
+        range_check_ptr
+    }(
+        rows : felt*,
+        mask : felt,
+        gen_id : felt,
+        start : felt,
+        period : felt
+    ) -> (
+        rows : felt*,
+        mask : felt,
+        slots : felt*,
+        summary : felt
+    ):
+    alloc_locals
+    let (local new_slots : felt*) = alloc()
+    if period == 0:
+        let (local new_rows : felt*, local new_mask) = evaluate_rounds_dirty(
+            1, rows, mask)
+        let (summary) = pack_generation(new_rows, new_mask, new_slots)
+        return (new_rows, new_mask, new_slots, summary)
+    end
+    let (_, offset) = unsigned_div_rem(gen_id - start, period)
+    let (local slots : felt*) = alloc()
+    read_slots(key=start + offset, slots=slots, slot=SLOTS_PER_GEN)
+    let (local new_rows : felt*) = alloc()
+    let (local stored_mask) = unpack_generation(slots, new_rows)
+    # The stored mask is against the board before start + offset,
+    # which is not always this board. The population is read back.
+    let (local new_mask, _) = changed_rows_mask(DIM, rows, new_rows)
+    let (summary) = remask_generation(slots, stored_mask, new_rows, new_mask,
+        new_slots)
+    return (new_rows, new_mask, new_slots, summary)
+end
+
+
+# Returns the known cycle if boards can be read back from it, which
+# needs every generation to be stored. Otherwise returns (0, 0).
+func replayable_cycle{
+        syscall_ptr : felt*,
+        pedersen_ptr : HashBuiltin*,
+        range_check_ptr
+    }() -> (
+        start : felt,
+        period : felt
+    ):
+    let (interval) = history_interval.read()
+    if interval != 1:
+        return (0, 0)
+    end
+    let (start) = cycle_start.read()
+    let (period) = cycle_period.read()
+    return (start, period)
+end
+
+
+# Indexes the state hash of a newly stored board. If the board was seen
+# before (and not edited since), the game is in a cycle, which is
+# saved and returned. Boards read back from a cycle are not indexed.
+func track_cycle{
+        syscall_ptr : felt*,
+        pedersen_ptr : HashBuiltin*,
+        range_check_ptr
+    }(
+        slots : felt*,
+        summary : felt,
+        gen_id : felt,
+        store : felt,
+        start : felt,
+        period : felt
+    ) -> (
+        start : felt,
+        period : felt
+    ):
+    alloc_locals
+    if period != 0:
+        return (start, period)
+    end
+    if store == 0:
+        return (0, 0)
+    end
+    let (local state_hash) = hash_generation(slots, summary)
+    let (local seen) = generation_of_state.read(state_hash)
+    # Any board at or before the last give_life may have been edited.
+    let (last_edit) = last_edit_generation.read()
+    let (valid) = is_le(last_edit + 1, seen)
+    if valid == 0:
+        generation_of_state.write(state_hash, gen_id)
+        return (0, 0)
+    end
+    cycle_start.write(seen)
+    cycle_period.write(gen_id - seen)
+    let (replay_start, replay_period) = replayable_cycle()
+    return (replay_start, replay_period)
+end
+
+
 # Creates an array of n numbers starting from x: [x, x-1, x-2, x-n-1].
 func build_array{
         syscall_ptr : felt*,
@@ -797,11 +1224,13 @@ func append_states{
     ):
     # This helper function can be used to grab a large number of specific
     # states for a frontend to quickly get game data.
+    alloc_locals
     if len == 0:
         return ()
     end
     # Loop with recursion.
     append_states(len - 1, gen_id_array, states)
+    local bitwise_ptr : BitwiseBuiltin* = bitwise_ptr
     let index = len - 1
     # Get rows for the n-th requested generation.
     let (r0, r1, r2, r3, r4, r5, r6, r7, r8, r9,
@@ -870,6 +1299,68 @@ func append_owners{
 end
 
 
+# For an array of generation IDs, creates arrays of their populations
+# and changed-row masks.
+func append_summaries{
+        syscall_ptr : felt*,
+        bitwise_ptr : BitwiseBuiltin*,
+        pedersen_ptr : HashBuiltin*,
+        range_check_ptr
+    }(
+        len : felt,
+        gen_id_array : felt*,
+        populations : felt*,
+        masks : felt*
+    ):
+    if len == 0:
+        return ()
+    end
+    # Loop with recursion.
+    append_summaries(len - 1, gen_id_array, populations, masks)
+    # On first entry here, len=1.
+    let index = len - 1
+    let (mask, population) = generation_summary(gen_id_array[index])
+    assert populations[index] = population
+    assert masks[index] = mask
+    return ()
+end
+
+
+# Returns the changed-row mask and population of a generation. A stored
+# generation costs one storage read, others are replayed from their
+# checkpoint.
+func generation_summary{
+        syscall_ptr : felt*,
+        bitwise_ptr : BitwiseBuiltin*,
+        pedersen_ptr : HashBuiltin*,
+        range_check_ptr
+    }(
+        gen_id : felt
+    ) -> (
+        mask : felt,
+        population : felt
+    ):
+    alloc_locals
+    let (local key, local rounds) = board_source(gen_id)
+    if rounds == 0:
+        let (last_slot) = historical_slot.read(key, SLOTS_PER_GEN - 1)
+        let (local last_rows : felt*) = alloc()
+        let (mask, population) = unpack_last_slot(last_slot, last_rows)
+        return (mask, population)
+    end
+    let (local slots : felt*) = alloc()
+    read_slots(key=key, slots=slots, slot=SLOTS_PER_GEN)
+    let (local stored_rows : felt*) = alloc()
+    let (stored_mask) = unpack_generation(slots, stored_rows)
+    let (rows, local mask) = evaluate_rounds_dirty(rounds, stored_rows,
+        stored_mask)
+    let (local new_slots : felt*) = alloc()
+    let (summary) = pack_generation(rows, mask, new_slots)
+    # The summary is mask + population * 2**32.
+    return (mask, (summary - mask) / ROW_SHIFT)
+end
+
+
 # For an array of redemption indices, creates an array of their data.
 func append_redemptions{
         syscall_ptr : felt*,
@@ -908,37 +1399,183 @@ end
 
 
 
-# Pre-sim. Walk rows then columns to build state.
-func unpack_rows{
+# Returns where the board of a generation is stored, and how many
+# rounds must be evolved from there to reach it.
+func board_source{
+        syscall_ptr : felt*,
+        pedersen_ptr : HashBuiltin*,
+        range_check_ptr
+    }(
+        gen_id : felt
+    ) -> (
+        key : felt,
+        rounds : felt
+    ):
+    alloc_locals
+    let (local interval) = history_interval.read()
+    if interval == 1:
+        return (gen_id, 0)
+    end
+    let (local current_gen) = current_generation.read()
+    if gen_id == current_gen:
+        return (CURRENT_KEY, 0)
+    end
+    if interval == 0:
+        return (gen_id, 0)
+    end
+    # Unknown generations read as empty storage.
+    let (known) = is_in_range(gen_id, GENESIS_GEN, current_gen)
+    if known == 0:
+        return (gen_id, 0)
+    end
+    let (checkpoint) = checkpoint_before(gen_id, interval)
+    return (checkpoint, gen_id - checkpoint)
+end
+
+
+# Returns the latest checkpoint at or before a (past) generation.
+func checkpoint_before{
         syscall_ptr : felt*,
-        bitwise_ptr : BitwiseBuiltin*,
         pedersen_ptr : HashBuiltin*,
         range_check_ptr
     }(
         gen_id : felt,
-        cell_states : felt*,
-        row : felt
+        interval : felt
+    ) -> (
+        checkpoint : felt
+    ):
+    alloc_locals
+    let (local bucket, _) = unsigned_div_rem(gen_id, interval)
+    # A give_life checkpoint is newer than the regular one in its bucket.
+    let (latest_edit) = latest_edit_in_bucket.read(bucket)
+    let (edit) = find_edit_before(latest_edit, gen_id)
+    if edit != 0:
+        return (edit)
+    end
+    # Before the first regular checkpoint is the genesis.
+    if bucket == 0:
+        return (GENESIS_GEN)
+    end
+    return (bucket * interval)
+end
+
+
+# Walks back through give_life checkpoints until one is at or before
+# gen_id. Returns 0 if there is none in the bucket.
+func find_edit_before{
+        syscall_ptr : felt*,
+        pedersen_ptr : HashBuiltin*,
+        range_check_ptr
+    }(
+        edit : felt,
+        gen_id : felt
+    ) -> (
+        edit : felt
+    ):
+    if edit == 0:
+        return (0)
+    end
+    let (before) = is_le(edit, gen_id)
+    if before == 1:
+        return (edit)
+    end
+    let (prev_edit) = previous_edit.read(edit)
+    let (found) = find_edit_before(prev_edit, gen_id)
+    return (found)
+end
+
+
+# Returns 1 if a new generation is stored as a regular checkpoint.
+func is_checkpoint{
+        syscall_ptr : felt*,
+        pedersen_ptr : HashBuiltin*,
+        range_check_ptr
+    }(
+        gen_id : felt
+    ) -> (
+        store : felt
+    ):
+    let (interval) = history_interval.read()
+    if interval == 0:
+        return (0)
+    end
+    let (_, rem) = unsigned_div_rem(gen_id, interval)
+    if rem == 0:
+        return (1)
+    end
+    return (0)
+end
+
+
+# Returns 1 if a generation was changed by give_life and needs its
+# own checkpoint (only when checkpoints are used).
+func is_edit_checkpoint{
+        syscall_ptr : felt*,
+        pedersen_ptr : HashBuiltin*,
+        range_check_ptr
+    }(
+        gen_id : felt
+    ) -> (
+        edited : felt
+    ):
+    let (interval) = history_interval.read()
+    if interval * (interval - 1) == 0:
+        return (0)
+    end
+    let (bucket, _) = unsigned_div_rem(gen_id, interval)
+    let (latest_edit) = latest_edit_in_bucket.read(bucket)
+    if latest_edit == gen_id:
+        return (1)
+    end
+    return (0)
+end
+
+
+# Registers the current generation as changed by give_life, so that
+# views replay from it (only when checkpoints are used).
+func record_edit{
+        syscall_ptr : felt*,
+        pedersen_ptr : HashBuiltin*,
+        range_check_ptr
+    }(
+        gen_id : felt
     ):
     alloc_locals
-    if row == 0:
+    let (local interval) = history_interval.read()
+    if interval * (interval - 1) == 0:
+        return ()
+    end
+    let (local bucket, _) = unsigned_div_rem(gen_id, interval)
+    let (latest_edit) = latest_edit_in_bucket.read(bucket)
+    # Multiple give_life actions on a generation register it once.
+    if latest_edit == gen_id:
+        return ()
+    end
+    previous_edit.write(gen_id, latest_edit)
+    latest_edit_in_bucket.write(bucket, gen_id)
+    return ()
+end
+
+
+# Pre-sim. Walk slots to read a packed board.
+func read_slots{
+        syscall_ptr : felt*,
+        pedersen_ptr : HashBuiltin*,
+        range_check_ptr
+    }(
+        key : felt,
+        slots : felt*,
+        slot : felt
+    ):
+    if slot == 0:
         return ()
     end
 
-    unpack_rows(gen_id=gen_id, cell_states=cell_states, row=row-1)
-    # Get the binary encoded store.
-    # (Note, on first entry, row=1 so row-1 gets the index)
-    let (stored_row) = historical_row.read(gen_id, row-1)
-    # New empty array to store the cell states for that row.
-    let (local stored_row_unpacked : felt*) = alloc()
-    split_int(
-        value=stored_row,
-        n=32,
-        base=2,
-        bound=2,
-        output=stored_row_unpacked)
-    # Pass the 32-long array to add to the cell_states array.
-    append_cols(cell_states=cell_states,
-        row=row-1, col=DIM, stored_row=stored_row_unpacked)
+    read_slots(key=key, slots=slots, slot=slot-1)
+    # Each slot holds several binary encoded rows.
+    # (Note, on first entry, slot=1 so slot-1 gets the index)
+    let (stored_slot) = historical_slot.read(key, slot-1)
+    assert slots[slot - 1] = stored_slot
 
     return ()
 end
@@ -964,46 +1601,238 @@ func activate_cell{
     #                 ^ index 2
     let binary_position = DIM - 1 - col
     let (local bit) = pow(2, binary_position)
+    # Only the slot holding the row is read and rewritten.
+    let (local slot_index, local position) = unsigned_div_rem(row,
+        ROWS_PER_SLOT)
     let (gen) = current_generation.read()
-    let (local stored) = historical_row.read(gen, row)
+    let (local key, _) = board_source(gen)
+    let (local stored_slot) = historical_slot.read(key, slot_index)
+    let (n_rows) = rows_in_slot(slot_index)
+    let (local slot_rows : felt*) = alloc()
+    # The last slot also holds the changed-row mask and population.
+    let (is_last) = is_le(SLOTS_PER_GEN - 1, slot_index)
+    unpack_slot(stored_slot, n_rows + 2 * is_last, slot_rows)
+    local stored = slot_rows[position]
     let (local updated) = bitwise_or(bit, stored)
     # Reject the transaction if the user is going to waste their time.
     assert_not_equal(stored, updated)
-    historical_row.write(gen, row, updated)
-
+    let (shift) = pow(ROW_SHIFT, position)
+    historical_slot.write(key, slot_index,
+        stored_slot + (updated - stored) * shift)
+    # The next evolution must recompute around the edited row.
+    mark_revived_cell(key, row)
     return ()
 end
 
-# Post-sim. Walk rows then columns to store state.
-func pack_rows{
+# Revives the sorted cells in the slots from slot up to the last slot
+# (see give_life_to_cells), adding their bits to the packed rows without
+# unpacking them. Only the slots holding a revived row are read and
+# written. Returns the mask of the rows changed and how many cells were
+# revived.
+func revive_slots{
         syscall_ptr : felt*,
         bitwise_ptr : BitwiseBuiltin*,
         pedersen_ptr : HashBuiltin*,
         range_check_ptr
     }(
-        new_gen_id : felt,
-        cell_states : felt*,
-        row : felt
+        key : felt,
+        slot : felt,
+        slot_bit : felt,
+        cells_len : felt,
+        cell_rows : felt*,
+        cell_cols : felt*
+    ) -> (
+        changed_mask : felt,
+        n_cells : felt
+    ):
+    alloc_locals
+    if slot == SLOTS_PER_GEN - 1:
+        return (0, 0)
+    end
+    let first_row = slot * ROWS_PER_SLOT
+    let (local added, local slot_mask, local n_cells) = revive_slot_rows(
+        min_row=first_row, first_row=first_row, slot_bit=slot_bit,
+        end_row=first_row + ROWS_PER_SLOT, cells_len=cells_len,
+        cell_rows=cell_rows, cell_cols=cell_cols)
+    let (local rest_mask, local rest_cells) = revive_slots(key=key,
+        slot=slot + 1, slot_bit=slot_bit * SLOT_MASK_STEP,
+        cells_len=cells_len - n_cells,
+        cell_rows=cell_rows + n_cells, cell_cols=cell_cols + n_cells)
+    if n_cells == 0:
+        return (rest_mask, rest_cells)
+    end
+    let (stored) = historical_slot.read(key, slot)
+    # Reject the transaction if a cell is already alive.
+    let (alive) = bitwise_and(stored, added)
+    assert alive = 0
+    historical_slot.write(key, slot, stored + added)
+    return (rest_mask + slot_mask, rest_cells + n_cells)
+end
+
+
+# Returns the bits of the leading cells in rows from min_row up to
+# end_row, each at its place in the slot that starts at first_row, with
+# the mask of those rows and how many cells there are. slot_bit is the
+# mask bit of first_row.
+func revive_slot_rows{
+        range_check_ptr
+    }(
+        min_row : felt,
+        first_row : felt,
+        slot_bit : felt,
+        end_row : felt,
+        cells_len : felt,
+        cell_rows : felt*,
+        cell_cols : felt*
+    ) -> (
+        added : felt,
+        changed_mask : felt,
+        n_cells : felt
+    ):
+    alloc_locals
+    if cells_len == 0:
+        return (0, 0, 0)
+    end
+    local row = cell_rows[0]
+    let (after_slot) = is_le(end_row, row)
+    if after_slot == 1:
+        return (0, 0, 0)
+    end
+    # Rows must increase (the cells of a row are taken together).
+    assert_nn(row - min_row)
+    # Rows are DIM bits wide, row first_row in the lowest bits.
+    let (local bits, local n_cells) = row_cells(row=row, min_col=0,
+        top_bit=(row - first_row + 1) * DIM - 1, cells_len=cells_len,
+        cell_rows=cell_rows, cell_cols=cell_cols)
+    let (shift) = pow(2, row - first_row)
+    local row_bit = slot_bit * shift
+    let (added, changed_mask, rest) = revive_slot_rows(min_row=row + 1,
+        first_row=first_row, slot_bit=slot_bit, end_row=end_row,
+        cells_len=cells_len - n_cells, cell_rows=cell_rows + n_cells,
+        cell_cols=cell_cols + n_cells)
+    return (added + bits, changed_mask + row_bit, rest + n_cells)
+end
+
+
+# Returns the bits of the leading cells that are in row, and how many
+# there are. Their columns must increase. Column 0 is bit top_bit
+# (DIM - 1 in a row on its own, higher for a row further up a slot).
+func row_cells{
+        range_check_ptr
+    }(
+        row : felt,
+        min_col : felt,
+        top_bit : felt,
+        cells_len : felt,
+        cell_rows : felt*,
+        cell_cols : felt*
+    ) -> (
+        bits : felt,
+        n_cells : felt
+    ):
+    alloc_locals
+    if cells_len == 0:
+        return (0, 0)
+    end
+    if cell_rows[0] != row:
+        return (0, 0)
+    end
+    local col = cell_cols[0]
+    assert_in_range(col, min_col, DIM)
+    let (local bit) = pow(2, top_bit - col)
+    let (bits, n_cells) = row_cells(row=row, min_col=col + 1,
+        top_bit=top_bit, cells_len=cells_len - 1, cell_rows=cell_rows + 1,
+        cell_cols=cell_cols + 1)
+    return (bits + bit, n_cells + 1)
+end
+
+
+# Redeems n tokens for their cells, starting at redemption index
+# first_index.
+func redeem_tokens{
+        syscall_ptr : felt*,
+        pedersen_ptr : HashBuiltin*,
+        range_check_ptr
+    }(
+        user_id : felt,
+        n : felt,
+        token_ids : felt*,
+        cell_rows : felt*,
+        cell_cols : felt*,
+        current_gen : felt,
+        first_index : felt
     ):
-    if row == 0:
+    alloc_locals
+    if n == 0:
         return ()
     end
+    redeem_tokens(user_id, n - 1, token_ids, cell_rows, cell_cols,
+        current_gen, first_index)
+    # (Note, on first entry, n=1 so n-1 gets the index)
+    let index = n - 1
+    local token_id = token_ids[index]
+    let (owner) = owner_of_generation.read(token_id)
+    assert owner = user_id
+    # A token given twice is redeemed by the time its second entry is
+    # reached.
+    let (redeemed) = token_redeemed_at.read(token_id)
+    assert redeemed = 0
+    token_gave_life.write(token_id, (cell_rows[index], cell_cols[index]))
+    token_redeemed_at.write(token_id, current_gen)
+    token_at_redemption_index.write(first_index + index, token_id)
+    redemption_index_of_token.write(token_id, first_index + index)
+    life_given.emit(user_id, token_id, first_index + index, current_gen,
+        cell_rows[index], cell_cols[index])
+    return ()
+end
 
 
-    pack_rows(
-        new_gen_id=new_gen_id,
-        cell_states=cell_states,
-        row=row-1)
-    # (Note, on first entry, row=1 so row-1 gets the index)
-    # Create the binary encoded state for the row.
-    let (row_to_store) = pack_cols(cell_states=cell_states,
-        row=row-1, col=DIM, row_to_store=0)
+# Sets the bit of a row in the changed-row mask of a stored board and
+# counts the cell revived in it.
+func mark_revived_cell{
+        syscall_ptr : felt*,
+        bitwise_ptr : BitwiseBuiltin*,
+        pedersen_ptr : HashBuiltin*,
+        range_check_ptr
+    }(
+        key : felt,
+        row : felt
+    ):
+    alloc_locals
+    let (local last_slot) = historical_slot.read(key, SLOTS_PER_GEN - 1)
+    let (local last_rows : felt*) = alloc()
+    let (local mask, _) = unpack_last_slot(last_slot, last_rows)
+    let (row_bit) = pow(2, row)
+    let (new_mask) = bitwise_or(mask, row_bit)
+    historical_slot.write(key, SLOTS_PER_GEN - 1,
+        last_slot + (new_mask - mask) * MASK_SHIFT + POPULATION_SHIFT)
+    return ()
+end
+
+# Post-sim. Walk slots to store state.
+func write_slots{
+        syscall_ptr : felt*,
+        pedersen_ptr : HashBuiltin*,
+        range_check_ptr
+    }(
+        key : felt,
+        slots : felt*,
+        slot : felt
+    ):
+    if slot == 0:
+        return ()
+    end
 
+    write_slots(
+        key=key,
+        slots=slots,
+        slot=slot-1)
+    # (Note, on first entry, slot=1 so slot-1 gets the index)
     # Permanently store the game state.
-    historical_row.write(
-        gen_id=new_gen_id,
-        row_index=row-1,
-        value=row_to_store)
+    historical_slot.write(
+        gen_id=key,
+        slot_index=slot-1,
+        value=slots[slot - 1])
 
     return ()
 end
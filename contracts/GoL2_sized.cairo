@@ -0,0 +1,323 @@
+%lang starknet
+%builtins pedersen range_check bitwise
+
+from starkware.cairo.common.alloc import alloc
+from starkware.cairo.common.cairo_builtins import (HashBuiltin,
+    BitwiseBuiltin)
+from starkware.cairo.common.math import assert_not_zero, assert_in_range
+from starkware.starknet.common.syscalls import get_caller_address
+
+from contracts.utils.life_rules import evaluate_rounds_sized
+from contracts.utils.packing import (BoardLayout, board_layout, pack_words,
+    unpack_words, assert_valid_words)
+
+## A single game, as in Infinite mode, on a board whose width and height
+## are set at deployment (e.g., a large board for an event). Rows wider
+## than a felt are split into several words (see the sized storage in
+## utils/packing.cairo), and the board evolves with the sized engine
+## in utils/life_rules.cairo. Every generation is stored.
+
+##### Constants #####
+# Smallest width and height, so that a cell has 8 distinct neighbours.
+const MIN_DIM = 3
+# Largest width and height (bounds the cost of a turn).
+const MAX_DIM = 1000
+# Most generations a single turn may evolve (and claim).
+const MAX_GENERATIONS_PER_TURN = 10
+# The genesis board is generation 1.
+const GENESIS_GEN = 1
+
+##### Storage #####
+
+@storage_var
+func board_width() -> (width : felt):
+end
+
+@storage_var
+func board_height() -> (height : felt):
+end
+
+# Returns the gen_id of the current alive generation.
+@storage_var
+func current_generation() -> (gen_id : felt):
+end
+
+# Returns the user_id for a given generation_id.
+@storage_var
+func owner_of_generation(gen_id : felt) -> (user_id : felt):
+end
+
+# The packed words of each generation, layout.slots_per_gen slots.
+@storage_var
+func historical_slot(
+        gen_id : felt,
+        slot_index : felt
+    ) -> (
+        value : felt
+    ):
+end
+
+##### Events #####
+
+# A new generation, with its board packed as in storage.
+@event
+func generation_evolved(
+        user_id : felt,
+        gen_id : felt,
+        packed_rows_len : felt,
+        packed_rows : felt*
+    ):
+end
+
+##################
+
+# Sets the board size and the genesis board. The genesis is given as the
+# words of every row, rows[row * words_per_row + word].
+@constructor
+func constructor{
+        syscall_ptr : felt*,
+        pedersen_ptr : HashBuiltin*,
+        range_check_ptr
+    }(
+        width : felt,
+        height : felt,
+        genesis_len : felt,
+        genesis : felt*
+    ):
+    alloc_locals
+    assert_in_range(width, MIN_DIM, MAX_DIM + 1)
+    assert_in_range(height, MIN_DIM, MAX_DIM + 1)
+    let (local layout : BoardLayout) = board_layout(width, height)
+    assert genesis_len = height * layout.words_per_row
+    assert_valid_words(layout, genesis, height)
+    board_width.write(width)
+    board_height.write(height)
+
+    let (local slots : felt*) = alloc()
+    pack_words(layout, genesis, slots, layout.slots_per_gen)
+    current_generation.write(GENESIS_GEN)
+    write_slots(key=GENESIS_GEN, slots=slots, slot=layout.slots_per_gen)
+    return ()
+end
+
+##### Public functions #####
+# Progresses the game by one generation.
+@external
+func evolve_and_claim_next_generation{
+        syscall_ptr : felt*,
+        bitwise_ptr : BitwiseBuiltin*,
+        pedersen_ptr : HashBuiltin*,
+        range_check_ptr
+    }(
+        user_id : felt
+    ):
+    evolve_and_claim(user_id, 1)
+    return ()
+end
+
+# Progresses the game by several generations in one turn.
+# Every generation is stored and claimed by the user.
+@external
+func evolve_and_claim_generations{
+        syscall_ptr : felt*,
+        bitwise_ptr : BitwiseBuiltin*,
+        pedersen_ptr : HashBuiltin*,
+        range_check_ptr
+    }(
+        user_id : felt,
+        generations : felt
+    ):
+    # 1 <= generations <= MAX_GENERATIONS_PER_TURN.
+    assert_in_range(generations, 1, MAX_GENERATIONS_PER_TURN + 1)
+    evolve_and_claim(user_id, generations)
+    return ()
+end
+
+# Returns the size of the board and the words each row is split into.
+@view
+func get_dimensions{
+        syscall_ptr : felt*,
+        pedersen_ptr : HashBuiltin*,
+        range_check_ptr
+    }(
+    ) -> (
+        width : felt,
+        height : felt,
+        words_per_row : felt
+    ):
+    let (layout) = read_layout()
+    return (layout.width, layout.height, layout.words_per_row)
+end
+
+# Returns a the current generation id.
+@view
+func current_generation_id{
+        syscall_ptr : felt*,
+        pedersen_ptr : HashBuiltin*,
+        range_check_ptr
+    }(
+    ) -> (
+        gen_id : felt
+    ):
+    let (gen_id) = current_generation.read()
+    return (gen_id)
+end
+
+# Returns the user that claimed a generation.
+@view
+func generation_owner{
+        syscall_ptr : felt*,
+        pedersen_ptr : HashBuiltin*,
+        range_check_ptr
+    }(
+        gen_id : felt
+    ) -> (
+        user_id : felt
+    ):
+    let (user_id) = owner_of_generation.read(gen_id)
+    return (user_id)
+end
+
+# Returns the words of every row of a generation (see get_dimensions).
+@view
+func view_game{
+        syscall_ptr : felt*,
+        pedersen_ptr : HashBuiltin*,
+        range_check_ptr
+    }(
+        id_of_generation_to_view : felt
+    ) -> (
+        rows_len : felt,
+        rows : felt*
+    ):
+    alloc_locals
+    let (latest) = current_generation.read()
+    assert_in_range(id_of_generation_to_view, GENESIS_GEN, latest + 1)
+    let (local layout : BoardLayout) = read_layout()
+    let (local slots : felt*) = alloc()
+    read_slots(key=id_of_generation_to_view, slots=slots,
+        slot=layout.slots_per_gen)
+    let (local rows : felt*) = alloc()
+    unpack_words(layout, slots, rows, layout.slots_per_gen)
+    return (layout.height * layout.words_per_row, rows)
+end
+
+##### Private functions #####
+# Evolves the current generation and claims each new generation.
+func evolve_and_claim{
+        syscall_ptr : felt*,
+        bitwise_ptr : BitwiseBuiltin*,
+        pedersen_ptr : HashBuiltin*,
+        range_check_ptr
+    }(
+        user_id : felt,
+        generations : felt
+    ):
+    alloc_locals
+    let (caller) = get_caller_address()
+    # For testing, skip account contract use.
+    assert_not_zero(caller)
+    assert user_id = caller
+
+    let (local layout : BoardLayout) = read_layout()
+    let (local last_gen) = current_generation.read()
+    let (local slots : felt*) = alloc()
+    read_slots(key=last_gen, slots=slots, slot=layout.slots_per_gen)
+    let (local rows : felt*) = alloc()
+    unpack_words(layout, slots, rows, layout.slots_per_gen)
+    claim_generations(user=user_id, layout=layout, rows=rows,
+        gen_id=last_gen + 1, generations=generations)
+    current_generation.write(last_gen + generations)
+    return ()
+end
+
+# Evolves one generation at a time, storing, emitting and assigning each.
+func claim_generations{
+        syscall_ptr : felt*,
+        bitwise_ptr : BitwiseBuiltin*,
+        pedersen_ptr : HashBuiltin*,
+        range_check_ptr
+    }(
+        user : felt,
+        layout : BoardLayout,
+        rows : felt*,
+        gen_id : felt,
+        generations : felt
+    ):
+    alloc_locals
+    if generations == 0:
+        return ()
+    end
+    let (local new_rows : felt*) = evaluate_rounds_sized(1, layout, rows)
+    let (local new_slots : felt*) = alloc()
+    pack_words(layout, new_rows, new_slots, layout.slots_per_gen)
+    write_slots(key=gen_id, slots=new_slots, slot=layout.slots_per_gen)
+    generation_evolved.emit(user, gen_id, layout.slots_per_gen, new_slots)
+    owner_of_generation.write(gen_id, user)
+
+    claim_generations(user=user, layout=layout, rows=new_rows,
+        gen_id=gen_id + 1, generations=generations - 1)
+    return ()
+end
+
+# Returns the layout of the board of this deployment.
+func read_layout{
+        syscall_ptr : felt*,
+        pedersen_ptr : HashBuiltin*,
+        range_check_ptr
+    }(
+    ) -> (
+        layout : BoardLayout
+    ):
+    alloc_locals
+    let (local width) = board_width.read()
+    let (local height) = board_height.read()
+    let (layout) = board_layout(width, height)
+    return (layout)
+end
+
+# Pre-sim. Walk slots to read a packed board.
+func read_slots{
+        syscall_ptr : felt*,
+        pedersen_ptr : HashBuiltin*,
+        range_check_ptr
+    }(
+        key : felt,
+        slots : felt*,
+        slot : felt
+    ):
+    if slot == 0:
+        return ()
+    end
+
+    read_slots(key=key, slots=slots, slot=slot-1)
+    # (Note, on first entry, slot=1 so slot-1 gets the index)
+    let (stored_slot) = historical_slot.read(key, slot-1)
+    assert slots[slot - 1] = stored_slot
+
+    return ()
+end
+
+# Post-sim. Walk slots to store state.
+func write_slots{
+        syscall_ptr : felt*,
+        pedersen_ptr : HashBuiltin*,
+        range_check_ptr
+    }(
+        key : felt,
+        slots : felt*,
+        slot : felt
+    ):
+    if slot == 0:
+        return ()
+    end
+
+    write_slots(key=key, slots=slots, slot=slot-1)
+    # (Note, on first entry, slot=1 so slot-1 gets the index)
+    historical_slot.write(
+        gen_id=key,
+        slot_index=slot-1,
+        value=slots[slot - 1])
+
+    return ()
+end
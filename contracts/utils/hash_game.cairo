@@ -1,8 +1,12 @@
+from starkware.cairo.common.alloc import alloc
 from starkware.cairo.common.hash_state import (hash_init,
     hash_update, HashState)
+from starkware.cairo.common.memcpy import memcpy
 from starkware.cairo.common.cairo_builtins import (HashBuiltin,
     BitwiseBuiltin)
 
+from contracts.utils.packing import SLOTS_PER_GEN, MASK_SHIFT
+
 
 # Computes the unique hash of a list of felts.
 func hash_game{
@@ -20,3 +24,26 @@ func hash_game{
         hash_ptr=pedersen_ptr}(list_hash, list, list_len)
     return (list_hash.current_hash)
 end
+
+
+# Computes the state hash of a stored generation: the hash of its slots
+# without the summary (changed-row mask and population) above the rows,
+# so equal boards have equal hashes.
+func hash_generation{
+        syscall_ptr : felt*,
+        pedersen_ptr : HashBuiltin*,
+        range_check_ptr
+    }(
+        slots : felt*,
+        summary : felt
+    ) -> (
+        hash : felt
+    ):
+    alloc_locals
+    let (local board_slots : felt*) = alloc()
+    memcpy(board_slots, slots, SLOTS_PER_GEN - 1)
+    assert board_slots[SLOTS_PER_GEN - 1] = (
+        slots[SLOTS_PER_GEN - 1] - summary * MASK_SHIFT)
+    let (hash) = hash_game(board_slots, SLOTS_PER_GEN)
+    return (hash)
+end
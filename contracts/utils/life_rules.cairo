@@ -1,10 +1,12 @@
 from starkware.cairo.common.alloc import alloc
-from starkware.cairo.common.math import unsigned_div_rem
+from starkware.cairo.common.bitwise import bitwise_and, bitwise_operations
+from starkware.cairo.common.math import unsigned_div_rem, split_int
 from starkware.cairo.common.math_cmp import is_nn, is_le, is_in_range
+from starkware.cairo.common.pow import pow
 from starkware.cairo.common.cairo_builtins import (HashBuiltin,
     BitwiseBuiltin)
 
-const DIM = 32
+from contracts.utils.packing import DIM, BoardLayout, FULL_WORD_SHIFT
 
 
 # Executes rounds and returns an array with final state.
@@ -142,25 +144,25 @@ func get_adjacent{
 
     if col == 0:
         # Cell is on left, and needs to wrap.
-        assert L = cell_idx + 31
+        assert L = cell_idx + DIM - 1
     else:
         assert L = cell_idx - 1
     end
 
-    if col - 31 == 0:
+    if col == DIM - 1:
         # Cell is on right, and needs to wrap.
-        assert R = cell_idx - 31
+        assert R = cell_idx - (DIM - 1)
     else:
         assert R = cell_idx + 1
     end
 
 
     # Bottom neighbours: D, LD, RD
-    if row - 31 == 0:
+    if row == DIM - 1:
         # Lower neighbour cells are on top, and need to wrap.
-        assert D = cell_idx - 992 # (DIM - DIM * DIM)
-        assert LD = L - 992
-        assert RD = R - 992
+        assert D = cell_idx - (DIM * DIM - DIM)
+        assert LD = L - (DIM * DIM - DIM)
+        assert RD = R - (DIM * DIM - DIM)
     else:
         # Lower neighbour cells are not top row, don't wrap.
         assert D = cell_idx + DIM
@@ -171,9 +173,9 @@ func get_adjacent{
     # Top neighbours: U, LU, RU
     if row == 0:
         # Upper neighbour cells are on top, and need to wrap.
-        assert U = cell_idx + 992 # (DIM * DIM - DIM)
-        assert LU = L + 992
-        assert RU = R + 992
+        assert U = cell_idx + (DIM * DIM - DIM)
+        assert LU = L + (DIM * DIM - DIM)
+        assert RU = R + (DIM * DIM - DIM)
     else:
         # Upper neighbour cells are not top row, don't wrap.
         assert U = cell_idx - DIM
@@ -185,3 +187,632 @@ func get_adjacent{
         RD=RD)
 end
 
+
+##### Packed engine #####
+# Works directly on the stored row felts rather than on 1024 cells.
+# A row is a 32-bit number with col=0 in the MSB and col=DIM-1 in the
+# LSB. Each bit position of a row is a lane, so one bitwise operation
+# evaluates a whole row of cells at once.
+
+# The bit that holds column 0 of a row.
+const MSB_COLUMN = 2 ** 31
+
+# Executes rounds on packed rows and returns an array with final rows.
+func evaluate_rounds_packed{
+        syscall_ptr : felt*,
+        bitwise_ptr : BitwiseBuiltin*,
+        pedersen_ptr : HashBuiltin*,
+        range_check_ptr
+    }(
+        rounds : felt,
+        rows : felt*
+    ) -> (
+        rows : felt*
+    ):
+    alloc_locals
+    if rounds == 0:
+        return(rows=rows)
+    end
+
+    let (rows) = evaluate_rounds_packed(rounds=rounds-1, rows=rows)
+
+    # Bit-planes of the (left + centre + right) count for every row.
+    let (local sum_low : felt*) = alloc()
+    let (local sum_high : felt*) = alloc()
+    sum_rows(row=DIM, rows=rows, sum_low=sum_low, sum_high=sum_high)
+
+    let (local pending_rows : felt*) = alloc()
+    apply_rules_packed(row=DIM, rows=rows, sum_low=sum_low,
+        sum_high=sum_high, pending_rows=pending_rows)
+
+    # Return the pending rows as canonical.
+    return (rows=pending_rows)
+end
+
+# Counts the horizontal neighbourhood (including the cell) of each row.
+func sum_rows{
+        syscall_ptr : felt*,
+        bitwise_ptr : BitwiseBuiltin*,
+        pedersen_ptr : HashBuiltin*,
+        range_check_ptr
+    }(
+        row : felt,
+        rows : felt*,
+        sum_low : felt*,
+        sum_high : felt*
+    ):
+    alloc_locals
+    if row == 0:
+        return ()
+    end
+
+    sum_rows(row=row-1, rows=rows, sum_low=sum_low, sum_high=sum_high)
+    # (Note, on first entry, row=1 so row-1 gets the index).
+    sum_row(row_idx=row - 1, rows=rows, sum_low=sum_low,
+        sum_high=sum_high)
+    return ()
+end
+
+# Counts the horizontal neighbourhood of one row.
+func sum_row{
+        syscall_ptr : felt*,
+        bitwise_ptr : BitwiseBuiltin*,
+        pedersen_ptr : HashBuiltin*,
+        range_check_ptr
+    }(
+        row_idx : felt,
+        rows : felt*,
+        sum_low : felt*,
+        sum_high : felt*
+    ):
+    alloc_locals
+    local centre = rows[row_idx]
+
+    # Shift the row one column each way, wrapping the edge column.
+    # 'left' holds the left neighbour of each cell in that cell's lane.
+    # 1100...0011 centre
+    # 1110...0001 left (rotate towards LSB)
+    # 1000...0111 right (rotate towards MSB)
+    let (lsb) = bitwise_and(centre, 1)
+    let (msb) = bitwise_and(centre, MSB_COLUMN)
+    # Divisions are exact: the dropped bit is removed first.
+    let left = (centre - lsb) / 2 + lsb * MSB_COLUMN
+    let right = (centre - msb) * 2 + msb / MSB_COLUMN
+
+    let (low, high) = full_adder(left, centre, right)
+    assert sum_low[row_idx] = low
+    assert sum_high[row_idx] = high
+
+    return ()
+end
+
+# Full adder: left + centre + right in every lane, as two bit-planes.
+func full_adder{
+        bitwise_ptr : BitwiseBuiltin*
+    }(
+        left : felt,
+        centre : felt,
+        right : felt
+    ) -> (
+        low : felt,
+        high : felt
+    ):
+    let (carry_a, partial, _) = bitwise_operations(left, centre)
+    let (carry_b, low, _) = bitwise_operations(partial, right)
+    # The two carries never share a lane, so adding them is an OR.
+    return (low=low, high=carry_a + carry_b)
+end
+
+# Steps through every row, adding the row sums above, at and below.
+func apply_rules_packed{
+        syscall_ptr : felt*,
+        bitwise_ptr : BitwiseBuiltin*,
+        pedersen_ptr : HashBuiltin*,
+        range_check_ptr
+    }(
+        row : felt,
+        rows : felt*,
+        sum_low : felt*,
+        sum_high : felt*,
+        pending_rows : felt*
+    ):
+    alloc_locals
+    if row == 0:
+        return ()
+    end
+
+    apply_rules_packed(row=row-1, rows=rows, sum_low=sum_low,
+        sum_high=sum_high, pending_rows=pending_rows)
+
+    # (Note, on first entry, row=1 so row-1 gets the index).
+    apply_rules_row(row_idx=row - 1, rows=rows, sum_low=sum_low,
+        sum_high=sum_high, pending_rows=pending_rows)
+    return ()
+end
+
+# Adds the row sums above, at and below one row and applies the rules.
+func apply_rules_row{
+        syscall_ptr : felt*,
+        bitwise_ptr : BitwiseBuiltin*,
+        pedersen_ptr : HashBuiltin*,
+        range_check_ptr
+    }(
+        row_idx : felt,
+        rows : felt*,
+        sum_low : felt*,
+        sum_high : felt*,
+        pending_rows : felt*
+    ):
+    alloc_locals
+    # Wrap around: the top row is below the bottom row.
+    local up
+    local down
+    if row_idx == 0:
+        assert up = DIM - 1
+    else:
+        assert up = row_idx - 1
+    end
+    if row_idx == DIM - 1:
+        assert down = 0
+    else:
+        assert down = row_idx + 1
+    end
+    apply_rules_word(word_idx=row_idx, up=up, down=down, rows=rows,
+        sum_low=sum_low, sum_high=sum_high, pending_rows=pending_rows)
+    return ()
+end
+
+# Adds the sums of a word and the words above and below it (at indices
+# up and down) and applies the rules to the word.
+func apply_rules_word{
+        bitwise_ptr : BitwiseBuiltin*
+    }(
+        word_idx : felt,
+        up : felt,
+        down : felt,
+        rows : felt*,
+        sum_low : felt*,
+        sum_high : felt*,
+        pending_rows : felt*
+    ):
+    # Add three 2-bit row sums per lane. The total is the 3x3 block
+    # including the cell (0-9), kept as bits (s2, s1, s0), mod 8.
+    # Bit 0: low planes.
+    let (k0, t0, _) = bitwise_operations(sum_low[up], sum_low[word_idx])
+    let (k1, s0, _) = bitwise_operations(t0, sum_low[down])
+    let carry = k0 + k1
+    # Bit 1: high planes plus the carry from bit 0.
+    let (k2, t1, _) = bitwise_operations(sum_high[up], sum_high[word_idx])
+    let (k3, t2, _) = bitwise_operations(t1, sum_high[down])
+    let (k4, s1, _) = bitwise_operations(t2, carry)
+    # Bit 2: parity of the carries into bit 2 (8 wraps to 0).
+    let (_, s2, _) = bitwise_operations(k2 + k3, k4)
+
+    # With the cell included in the block:
+    # Block of 3 -> alive (birth, or survival with 2 neighbours).
+    # Block of 4 -> unchanged (survival with 3 neighbours).
+    let (s0_and_s1, _, s0_or_s1) = bitwise_operations(s0, s1)
+    let (three_and_more, _, _) = bitwise_operations(s0_and_s1, s2)
+    let three = s0_and_s1 - three_and_more
+    let (four_and_more, _, _) = bitwise_operations(s2, s0_or_s1)
+    let four = s2 - four_and_more
+    let (four_alive) = bitwise_and(four, rows[word_idx])
+
+    # The two outcomes never share a lane.
+    assert pending_rows[word_idx] = three + four_alive
+
+    return ()
+end
+
+
+##### Dirty-row engine #####
+# A row can only change if it, or a row next to it, changed in the
+# previous round. 'mask' has bit i set when row i changed, rows next to
+# no changed row are copied forward and a board with mask=0 is stable.
+
+# Every row is treated as changed (e.g., a new or edited board).
+const ALL_ROWS_CHANGED = 2 ** 32 - 1
+
+# Executes rounds on packed rows, recomputing only rows that can change.
+# Returns the final rows and the mask of rows changed in the last round.
+func evaluate_rounds_dirty{
+        syscall_ptr : felt*,
+        bitwise_ptr : BitwiseBuiltin*,
+        pedersen_ptr : HashBuiltin*,
+        range_check_ptr
+    }(
+        rounds : felt,
+        rows : felt*,
+        mask : felt
+    ) -> (
+        rows : felt*,
+        mask : felt
+    ):
+    alloc_locals
+    if rounds == 0:
+        return (rows=rows, mask=mask)
+    end
+
+    let (local rows, local mask) = evaluate_rounds_dirty(rounds=rounds-1,
+        rows=rows, mask=mask)
+    # Stable board: nothing changes in any later round.
+    if mask == 0:
+        return (rows=rows, mask=0)
+    end
+
+    # Changed flags, padded with two wrapped rows on each side so that
+    # flags[row + 2] is the row and neighbours need no wrap checks.
+    let (local flags : felt*) = alloc()
+    split_int(value=mask, n=DIM, base=2, bound=2, output=flags + 2)
+    assert flags[0] = flags[DIM]
+    assert flags[1] = flags[DIM + 1]
+    assert flags[DIM + 2] = flags[2]
+    assert flags[DIM + 3] = flags[3]
+
+    let (local sum_low : felt*) = alloc()
+    let (local sum_high : felt*) = alloc()
+    sum_rows_dirty(row=DIM, rows=rows, flags=flags, sum_low=sum_low,
+        sum_high=sum_high)
+
+    let (local pending_rows : felt*) = alloc()
+    let (new_mask, _) = apply_rules_dirty(row=DIM, rows=rows, flags=flags,
+        sum_low=sum_low, sum_high=sum_high, pending_rows=pending_rows)
+
+    return (rows=pending_rows, mask=new_mask)
+end
+
+# Row sums as in sum_rows, for the rows read by a recomputed row
+# (those within two rows of a changed row).
+func sum_rows_dirty{
+        syscall_ptr : felt*,
+        bitwise_ptr : BitwiseBuiltin*,
+        pedersen_ptr : HashBuiltin*,
+        range_check_ptr
+    }(
+        row : felt,
+        rows : felt*,
+        flags : felt*,
+        sum_low : felt*,
+        sum_high : felt*
+    ):
+    alloc_locals
+    if row == 0:
+        return ()
+    end
+
+    sum_rows_dirty(row=row-1, rows=rows, flags=flags, sum_low=sum_low,
+        sum_high=sum_high)
+    # (Note, on first entry, row=1 so row-1 gets the index).
+    # Padded flags of rows row-3 to row+1 (indices row-1 to row+3).
+    let near = flags[row - 1] + flags[row] + flags[row + 1] +
+        flags[row + 2] + flags[row + 3]
+    if near == 0:
+        return ()
+    end
+    sum_row(row_idx=row - 1, rows=rows, sum_low=sum_low,
+        sum_high=sum_high)
+    return ()
+end
+
+# Applies the rules to rows next to a changed row and copies the rest.
+# Returns the mask of rows that changed and the bit of the next row.
+func apply_rules_dirty{
+        syscall_ptr : felt*,
+        bitwise_ptr : BitwiseBuiltin*,
+        pedersen_ptr : HashBuiltin*,
+        range_check_ptr
+    }(
+        row : felt,
+        rows : felt*,
+        flags : felt*,
+        sum_low : felt*,
+        sum_high : felt*,
+        pending_rows : felt*
+    ) -> (
+        mask : felt,
+        bit : felt
+    ):
+    alloc_locals
+    if row == 0:
+        return (mask=0, bit=1)
+    end
+
+    let (local mask, local bit) = apply_rules_dirty(row=row-1, rows=rows,
+        flags=flags, sum_low=sum_low, sum_high=sum_high,
+        pending_rows=pending_rows)
+
+    # (Note, on first entry, row=1 so row-1 gets the index).
+    # Padded flags of rows row-2 to row (indices row to row+2).
+    let active = flags[row] + flags[row + 1] + flags[row + 2]
+    if active == 0:
+        assert pending_rows[row - 1] = rows[row - 1]
+        return (mask=mask, bit=bit * 2)
+    end
+
+    apply_rules_row(row_idx=row - 1, rows=rows, sum_low=sum_low,
+        sum_high=sum_high, pending_rows=pending_rows)
+    if pending_rows[row - 1] == rows[row - 1]:
+        return (mask=mask, bit=bit * 2)
+    end
+    return (mask=mask + bit, bit=bit * 2)
+end
+
+# Returns the mask of rows that differ between two boards.
+func changed_rows_mask(
+        row : felt,
+        rows : felt*,
+        new_rows : felt*
+    ) -> (
+        mask : felt,
+        bit : felt
+    ):
+    alloc_locals
+    if row == 0:
+        return (mask=0, bit=1)
+    end
+
+    let (local mask, local bit) = changed_rows_mask(row=row-1, rows=rows,
+        new_rows=new_rows)
+    # (Note, on first entry, row=1 so row-1 gets the index).
+    if new_rows[row - 1] == rows[row - 1]:
+        return (mask=mask, bit=bit * 2)
+    end
+    return (mask=mask + bit, bit=bit * 2)
+end
+
+
+##### Sized engine #####
+# Boards of any width and height, with each row split into words as set
+# out by board_layout (packing.cairo): rows[row * words_per_row + word].
+# Every word is evaluated like a packed row. The edge columns of a word
+# take their neighbours from the words beside it, and the ends of a row
+# wrap around to each other. A 32 column board is one word per row and
+# evolves exactly as in evaluate_rounds_packed.
+
+# Executes rounds on the words of a sized board and returns the final words.
+func evaluate_rounds_sized{
+        syscall_ptr : felt*,
+        bitwise_ptr : BitwiseBuiltin*,
+        pedersen_ptr : HashBuiltin*,
+        range_check_ptr
+    }(
+        rounds : felt,
+        layout : BoardLayout,
+        rows : felt*
+    ) -> (
+        rows : felt*
+    ):
+    alloc_locals
+    # The bit holding the first column of each word of a row.
+    let (local msbs : felt*) = alloc()
+    let (last_msb) = pow(2, layout.last_word_bits - 1)
+    assert msbs[layout.words_per_row - 1] = last_msb
+    fill(msbs, layout.words_per_row - 1, FULL_WORD_SHIFT / 2)
+
+    let (rows) = evolve_sized(rounds=rounds, layout=layout, msbs=msbs,
+        rows=rows)
+    return (rows=rows)
+end
+
+# Sets the first n values of an array.
+func fill(
+        array : felt*,
+        n : felt,
+        value : felt
+    ):
+    if n == 0:
+        return ()
+    end
+    assert array[n - 1] = value
+    return fill(array, n - 1, value)
+end
+
+# Executes rounds on the words of a sized board.
+func evolve_sized{
+        syscall_ptr : felt*,
+        bitwise_ptr : BitwiseBuiltin*,
+        pedersen_ptr : HashBuiltin*,
+        range_check_ptr
+    }(
+        rounds : felt,
+        layout : BoardLayout,
+        msbs : felt*,
+        rows : felt*
+    ) -> (
+        rows : felt*
+    ):
+    alloc_locals
+    if rounds == 0:
+        return(rows=rows)
+    end
+
+    let (rows) = evolve_sized(rounds=rounds-1, layout=layout, msbs=msbs,
+        rows=rows)
+
+    let (local sum_low : felt*) = alloc()
+    let (local sum_high : felt*) = alloc()
+    sum_rows_sized(row=layout.height, layout=layout, msbs=msbs, rows=rows,
+        sum_low=sum_low, sum_high=sum_high)
+
+    let (local pending_rows : felt*) = alloc()
+    apply_rules_sized(row=layout.height, layout=layout, rows=rows,
+        sum_low=sum_low, sum_high=sum_high, pending_rows=pending_rows)
+
+    return (rows=pending_rows)
+end
+
+# Counts the horizontal neighbourhood of every word, row by row.
+func sum_rows_sized{
+        syscall_ptr : felt*,
+        bitwise_ptr : BitwiseBuiltin*,
+        pedersen_ptr : HashBuiltin*,
+        range_check_ptr
+    }(
+        row : felt,
+        layout : BoardLayout,
+        msbs : felt*,
+        rows : felt*,
+        sum_low : felt*,
+        sum_high : felt*
+    ):
+    alloc_locals
+    if row == 0:
+        return ()
+    end
+
+    sum_rows_sized(row=row-1, layout=layout, msbs=msbs, rows=rows,
+        sum_low=sum_low, sum_high=sum_high)
+    # (Note, on first entry, row=1 so row-1 gets the index).
+    let offset = (row - 1) * layout.words_per_row
+    # The first and last column of each word (0 or 1).
+    let (local first : felt*) = alloc()
+    let (local last : felt*) = alloc()
+    word_edges(word=layout.words_per_row, msbs=msbs, row_words=rows + offset,
+        first=first, last=last)
+    sum_words(word=layout.words_per_row, words=layout.words_per_row,
+        msbs=msbs, row_words=rows + offset, first=first, last=last,
+        sum_low=sum_low + offset, sum_high=sum_high + offset)
+    return ()
+end
+
+# Reads the first and last column of each word of a row.
+func word_edges{
+        bitwise_ptr : BitwiseBuiltin*
+    }(
+        word : felt,
+        msbs : felt*,
+        row_words : felt*,
+        first : felt*,
+        last : felt*
+    ):
+    if word == 0:
+        return ()
+    end
+
+    word_edges(word=word-1, msbs=msbs, row_words=row_words, first=first,
+        last=last)
+    # (Note, on first entry, word=1 so word-1 gets the index).
+    let (msb) = bitwise_and(row_words[word - 1], msbs[word - 1])
+    assert first[word - 1] = msb / msbs[word - 1]
+    let (lsb) = bitwise_and(row_words[word - 1], 1)
+    assert last[word - 1] = lsb
+    return ()
+end
+
+# Counts the horizontal neighbourhood of each word of a row.
+func sum_words{
+        bitwise_ptr : BitwiseBuiltin*
+    }(
+        word : felt,
+        words : felt,
+        msbs : felt*,
+        row_words : felt*,
+        first : felt*,
+        last : felt*,
+        sum_low : felt*,
+        sum_high : felt*
+    ):
+    alloc_locals
+    if word == 0:
+        return ()
+    end
+
+    sum_words(word=word-1, words=words, msbs=msbs, row_words=row_words,
+        first=first, last=last, sum_low=sum_low, sum_high=sum_high)
+    # (Note, on first entry, word=1 so word-1 gets the index).
+    local idx = word - 1
+    # Wrap around: the last word of a row is left of the first.
+    local prev
+    local next
+    if idx == 0:
+        assert prev = words - 1
+    else:
+        assert prev = idx - 1
+    end
+    if idx == words - 1:
+        assert next = 0
+    else:
+        assert next = idx + 1
+    end
+
+    # As in sum_row, with the edge column of each shift taken from the
+    # word beside it. Divisions are exact: the dropped bit is removed.
+    local centre = row_words[idx]
+    let left = (centre - last[idx]) / 2 + last[prev] * msbs[idx]
+    let right = (centre - first[idx] * msbs[idx]) * 2 + first[next]
+    let (low, high) = full_adder(left, centre, right)
+    assert sum_low[idx] = low
+    assert sum_high[idx] = high
+    return ()
+end
+
+# Steps through every row, adding the word sums above, at and below.
+func apply_rules_sized{
+        syscall_ptr : felt*,
+        bitwise_ptr : BitwiseBuiltin*,
+        pedersen_ptr : HashBuiltin*,
+        range_check_ptr
+    }(
+        row : felt,
+        layout : BoardLayout,
+        rows : felt*,
+        sum_low : felt*,
+        sum_high : felt*,
+        pending_rows : felt*
+    ):
+    alloc_locals
+    if row == 0:
+        return ()
+    end
+
+    apply_rules_sized(row=row-1, layout=layout, rows=rows, sum_low=sum_low,
+        sum_high=sum_high, pending_rows=pending_rows)
+    # (Note, on first entry, row=1 so row-1 gets the index).
+    # Wrap around: the top row is below the bottom row.
+    local up
+    local down
+    if row == 1:
+        assert up = layout.height - 1
+    else:
+        assert up = row - 2
+    end
+    if row == layout.height:
+        assert down = 0
+    else:
+        assert down = row
+    end
+    let words = layout.words_per_row
+    let offset = (row - 1) * words
+    # Word indices relative to the row.
+    apply_rules_words(word=words, offset=offset, up=(up * words - offset),
+        down=(down * words - offset), rows=rows, sum_low=sum_low,
+        sum_high=sum_high, pending_rows=pending_rows)
+    return ()
+end
+
+# Applies the rules to each word of a row (words offset to offset+word).
+func apply_rules_words{
+        bitwise_ptr : BitwiseBuiltin*
+    }(
+        word : felt,
+        offset : felt,
+        up : felt,
+        down : felt,
+        rows : felt*,
+        sum_low : felt*,
+        sum_high : felt*,
+        pending_rows : felt*
+    ):
+    if word == 0:
+        return ()
+    end
+
+    apply_rules_words(word=word-1, offset=offset, up=up, down=down,
+        rows=rows, sum_low=sum_low, sum_high=sum_high,
+        pending_rows=pending_rows)
+    # (Note, on first entry, word=1 so word-1 gets the index).
+    let idx = offset + word - 1
+    apply_rules_word(word_idx=idx, up=idx + up, down=idx + down, rows=rows,
+        sum_low=sum_low, sum_high=sum_high, pending_rows=pending_rows)
+    return ()
+end
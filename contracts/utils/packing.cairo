@@ -3,9 +3,34 @@ from starkware.cairo.common.pow import pow
 from starkware.cairo.common.bitwise import bitwise_or, bitwise_and
 from starkware.cairo.common.cairo_builtins import (HashBuiltin,
     BitwiseBuiltin)
-from starkware.cairo.common.math import split_int
+from starkware.cairo.common.math import (split_int, assert_nn_le,
+    assert_le_felt, unsigned_div_rem)
+from starkware.cairo.common.memcpy import memcpy
 
+# Width and height of the Infinite and Creator boards (the 32 bit rows
+# below). GoL2_sized sets its size at deployment, see 'Sized storage'.
 const DIM = 32
+# Rows per storage slot. 7 x 32 bits fits in a 251 bit felt.
+const ROWS_PER_SLOT = 7
+# Slots per generation, ceil(DIM / ROWS_PER_SLOT).
+const SLOTS_PER_GEN = 5
+# Width of one row within a slot.
+const ROW_SHIFT = 2 ** 32
+# The last slot holds 4 rows, the summary of the generation is kept
+# above them: the changed-row mask (see life_rules.cairo), then the
+# population (number of live cells).
+const MASK_SHIFT = 2 ** 128
+const POPULATION_SHIFT = 2 ** 160
+# Every other field of 1, 2, 4 ... 128 bits of a 7 row slot (224 bits),
+# see count_cells.
+const FIELDS_1 = 0x55555555555555555555555555555555555555555555555555555555
+const FIELDS_2 = 0x33333333333333333333333333333333333333333333333333333333
+const FIELDS_4 = 0x0f0f0f0f0f0f0f0f0f0f0f0f0f0f0f0f0f0f0f0f0f0f0f0f0f0f0f0f
+const FIELDS_8 = 0x00ff00ff00ff00ff00ff00ff00ff00ff00ff00ff00ff00ff00ff00ff
+const FIELDS_16 = 0x0000ffff0000ffff0000ffff0000ffff0000ffff0000ffff0000ffff
+const FIELDS_32 = 0xffffffff00000000ffffffff00000000ffffffff00000000ffffffff
+const FIELDS_64 = 0xffffffffffffffff0000000000000000ffffffffffffffff
+const FIELDS_128 = 0xffffffffffffffffffffffffffffffff
 # Post-sim. Walk rows then columns to store state.
 func pack_rows{
         syscall_ptr : felt*,
@@ -155,3 +180,448 @@ func custom_bitwise_and{
     let res = result_array[binary_position]
     return (res)
 end
+
+
+##### Dense storage #####
+# A generation is stored as SLOTS_PER_GEN felts. Slot k holds rows
+# k*ROWS_PER_SLOT onwards, with the first of those rows in the lowest
+# 32 bits: slot = row_a + row_b * 2**32 + row_c * 2**64 ...
+# The last slot also holds the summary of the generation:
+# rows 28-31 + mask * 2**128 + population * 2**160.
+
+# Returns how many rows a slot holds (the last slot holds the rest).
+func rows_in_slot(
+        slot_index : felt
+    ) -> (
+        n_rows : felt
+    ):
+    if slot_index == SLOTS_PER_GEN - 1:
+        return (DIM - ROWS_PER_SLOT * (SLOTS_PER_GEN - 1))
+    end
+    return (ROWS_PER_SLOT)
+end
+
+
+# Combines n rows into one felt. Rows must be below 2**32.
+func pack_slot(
+        rows : felt*,
+        n_rows : felt
+    ) -> (
+        slot : felt
+    ):
+    if n_rows == 0:
+        return (0)
+    end
+    let (rest) = pack_slot(rows + 1, n_rows - 1)
+    return (rows[0] + rest * ROW_SHIFT)
+end
+
+
+# Splits a slot into its n rows, writing them to rows.
+func unpack_slot{
+        range_check_ptr
+    }(
+        slot : felt,
+        n_rows : felt,
+        rows : felt*
+    ):
+    split_int(value=slot, n=n_rows, base=ROW_SHIFT,
+        bound=ROW_SHIFT, output=rows)
+    return ()
+end
+
+
+# Checks that user supplied rows fit the board (and so a slot).
+func assert_valid_rows{
+        range_check_ptr
+    }(
+        rows : felt*,
+        row : felt
+    ):
+    if row == 0:
+        return ()
+    end
+    assert_valid_rows(rows, row - 1)
+    # (Note, on first entry, row=1 so row-1 gets the index)
+    assert_nn_le(rows[row - 1], ROW_SHIFT - 1)
+    return ()
+end
+
+
+# Packs a generation of DIM rows into its slots.
+func pack_slots(
+        rows : felt*,
+        slots : felt*,
+        slot : felt
+    ):
+    if slot == 0:
+        return ()
+    end
+    pack_slots(rows, slots, slot - 1)
+    # (Note, on first entry, slot=1 so slot-1 gets the index)
+    let (n_rows) = rows_in_slot(slot - 1)
+    let (packed) = pack_slot(rows + (slot - 1) * ROWS_PER_SLOT, n_rows)
+    assert slots[slot - 1] = packed
+    return ()
+end
+
+
+# Unpacks the slots of a generation into DIM rows.
+func unpack_slots{
+        range_check_ptr
+    }(
+        slots : felt*,
+        rows : felt*,
+        slot : felt
+    ):
+    if slot == 0:
+        return ()
+    end
+    unpack_slots(slots, rows, slot - 1)
+    # (Note, on first entry, slot=1 so slot-1 gets the index)
+    let (n_rows) = rows_in_slot(slot - 1)
+    unpack_slot(slots[slot - 1], n_rows, rows + (slot - 1) * ROWS_PER_SLOT)
+    return ()
+end
+
+
+# Packs a generation of DIM rows and its changed-row mask. Returns the
+# summary stored above the rows: mask + population * 2**32.
+func pack_generation{
+        bitwise_ptr : BitwiseBuiltin*
+    }(
+        rows : felt*,
+        mask : felt,
+        slots : felt*
+    ) -> (
+        summary : felt
+    ):
+    alloc_locals
+    pack_slots(rows, slots, SLOTS_PER_GEN - 1)
+    let (n_rows) = rows_in_slot(SLOTS_PER_GEN - 1)
+    let (local packed) = pack_slot(rows + (SLOTS_PER_GEN - 1) * ROWS_PER_SLOT,
+        n_rows)
+    let (local population) = count_slots(slots, SLOTS_PER_GEN - 1)
+    let (last_population) = count_cells(packed)
+    local summary = mask + (population + last_population) * ROW_SHIFT
+    assert slots[SLOTS_PER_GEN - 1] = packed + summary * MASK_SHIFT
+    return (summary)
+end
+
+
+# Repacks a stored generation with a new mask (e.g., a board read back
+# from a cycle, after another board than when it was stored). The
+# population is kept, so no cells are counted. Returns the new summary.
+func remask_generation(
+        stored : felt*,
+        stored_mask : felt,
+        rows : felt*,
+        mask : felt,
+        slots : felt*
+    ) -> (
+        summary : felt
+    ):
+    alloc_locals
+    memcpy(slots, stored, SLOTS_PER_GEN - 1)
+    let (n_rows) = rows_in_slot(SLOTS_PER_GEN - 1)
+    let (local packed) = pack_slot(rows + (SLOTS_PER_GEN - 1) * ROWS_PER_SLOT,
+        n_rows)
+    # The stored slot is an exact multiple of MASK_SHIFT above the rows.
+    let stored_summary = (stored[SLOTS_PER_GEN - 1] - packed) / MASK_SHIFT
+    local summary = stored_summary - stored_mask + mask
+    assert slots[SLOTS_PER_GEN - 1] = packed + summary * MASK_SHIFT
+    return (summary)
+end
+
+
+# Unpacks a stored generation into DIM rows and returns its mask.
+func unpack_generation{
+        range_check_ptr
+    }(
+        slots : felt*,
+        rows : felt*
+    ) -> (
+        mask : felt
+    ):
+    alloc_locals
+    unpack_slots(slots, rows, SLOTS_PER_GEN - 1)
+    let (local last : felt*) = alloc()
+    let (mask, _) = unpack_last_slot(slots[SLOTS_PER_GEN - 1], last)
+    let (n_rows) = rows_in_slot(SLOTS_PER_GEN - 1)
+    memcpy(rows + (SLOTS_PER_GEN - 1) * ROWS_PER_SLOT, last, n_rows)
+    return (mask)
+end
+
+
+# Splits the last slot of a generation into its rows, then the mask and
+# population.
+func unpack_last_slot{
+        range_check_ptr
+    }(
+        slot : felt,
+        rows : felt*
+    ) -> (
+        mask : felt,
+        population : felt
+    ):
+    alloc_locals
+    let (local n_rows) = rows_in_slot(SLOTS_PER_GEN - 1)
+    # The mask and population are two more 32 bit parts.
+    unpack_slot(slot, n_rows + 2, rows)
+    return (rows[n_rows], rows[n_rows + 1])
+end
+
+
+# Returns the changed-row mask of a generation from its last slot,
+# without splitting the slot.
+func last_slot_mask{
+        bitwise_ptr : BitwiseBuiltin*
+    }(
+        slot : felt
+    ) -> (
+        mask : felt
+    ):
+    let (field) = bitwise_and(slot, (ROW_SHIFT - 1) * MASK_SHIFT)
+    # The field is an exact multiple of MASK_SHIFT.
+    return (field / MASK_SHIFT)
+end
+
+
+# Counts the live cells in the first n slots (rows only, not the last).
+func count_slots{
+        bitwise_ptr : BitwiseBuiltin*
+    }(
+        slots : felt*,
+        slot : felt
+    ) -> (
+        population : felt
+    ):
+    alloc_locals
+    if slot == 0:
+        return (0)
+    end
+    let (local rest) = count_slots(slots, slot - 1)
+    # (Note, on first entry, slot=1 so slot-1 gets the index)
+    let (count) = count_cells(slots[slot - 1])
+    return (rest + count)
+end
+
+
+# Counts the set bits of a slot of rows. Neighbouring fields are added in
+# parallel, each step doubling the field width, until one field holds
+# the count. One bitwise operation per step.
+func count_cells{
+        bitwise_ptr : BitwiseBuiltin*
+    }(
+        slot : felt
+    ) -> (
+        count : felt
+    ):
+    let (fields) = add_fields(slot, FIELDS_1, 2)
+    let (fields) = add_fields(fields, FIELDS_2, 2 ** 2)
+    let (fields) = add_fields(fields, FIELDS_4, 2 ** 4)
+    let (fields) = add_fields(fields, FIELDS_8, 2 ** 8)
+    let (fields) = add_fields(fields, FIELDS_16, 2 ** 16)
+    let (fields) = add_fields(fields, FIELDS_32, 2 ** 32)
+    let (fields) = add_fields(fields, FIELDS_64, 2 ** 64)
+    let (count) = add_fields(fields, FIELDS_128, 2 ** 128)
+    return (count)
+end
+
+
+# Adds the field above (shift higher) to each field of value picked by
+# the mask. The sums are left in the picked fields.
+func add_fields{
+        bitwise_ptr : BitwiseBuiltin*
+    }(
+        value : felt,
+        mask : felt,
+        shift : felt
+    ) -> (
+        sums : felt
+    ):
+    let (low) = bitwise_and(value, mask)
+    # The other fields are exact multiples of shift.
+    return (low + (value - low) / shift)
+end
+
+
+##### Sized storage #####
+# Boards of any width and height (see the sized engine in life_rules.cairo).
+# A row of 'width' columns is split into words of up to MAX_WORD_BITS
+# columns: words_per_row - 1 full words, then a word with the rest. As in
+# a 32 column row, a word holds its first column in the MSB. The words of
+# every row, rows[row * words_per_row + word], are packed words_per_slot
+# to a slot, each in a field as wide as the first word of a row.
+
+# Widest word, and the most bits packed into one slot.
+const MAX_WORD_BITS = 250
+# 2 ** MAX_WORD_BITS, the bound of a full word.
+const FULL_WORD_SHIFT = 2 ** 250
+
+# The sizes derived from the width and height of a board.
+struct BoardLayout:
+    member width : felt
+    member height : felt
+    member words_per_row : felt
+    # Bits of the last word of a row (the others have MAX_WORD_BITS).
+    member last_word_bits : felt
+    # 2 ** (bits of the first word of a row), the field of a packed word.
+    member word_shift : felt
+    member words_per_slot : felt
+    member slots_per_gen : felt
+end
+
+# Returns the word and slot sizes of a width x height board.
+func board_layout{
+        range_check_ptr
+    }(
+        width : felt,
+        height : felt
+    ) -> (
+        layout : BoardLayout
+    ):
+    alloc_locals
+    let (full_words, rest) = unsigned_div_rem(width - 1, MAX_WORD_BITS)
+    local field_bits
+    if full_words == 0:
+        assert field_bits = width
+    else:
+        assert field_bits = MAX_WORD_BITS
+    end
+    let (local word_shift) = pow(2, field_bits)
+    # Fields wider than MAX_WORD_BITS / 2 get a slot each (split_int can
+    # only unpack fields of up to 128 bits).
+    let (local words_per_slot, _) = unsigned_div_rem(MAX_WORD_BITS,
+        field_bits)
+    let n_words = height * (full_words + 1)
+    let (slots_per_gen, _) = unsigned_div_rem(n_words + words_per_slot - 1,
+        words_per_slot)
+    let layout = BoardLayout(width=width, height=height,
+        words_per_row=full_words + 1, last_word_bits=rest + 1,
+        word_shift=word_shift, words_per_slot=words_per_slot,
+        slots_per_gen=slots_per_gen)
+    return (layout)
+end
+
+
+# Returns how many words a slot of a sized generation holds.
+func words_in_slot(
+        layout : BoardLayout,
+        slot_index : felt
+    ) -> (
+        n_words : felt
+    ):
+    if slot_index == layout.slots_per_gen - 1:
+        # The last slot holds the rest.
+        return (layout.height * layout.words_per_row -
+            slot_index * layout.words_per_slot)
+    end
+    return (layout.words_per_slot)
+end
+
+
+# Combines n fields into one felt, the first in the lowest bits.
+func pack_fields(
+        fields : felt*,
+        n_fields : felt,
+        shift : felt
+    ) -> (
+        packed : felt
+    ):
+    if n_fields == 0:
+        return (0)
+    end
+    let (rest) = pack_fields(fields + 1, n_fields - 1, shift)
+    return (fields[0] + rest * shift)
+end
+
+
+# Packs the words of a sized generation into its slots.
+func pack_words{
+        range_check_ptr
+    }(
+        layout : BoardLayout,
+        words : felt*,
+        slots : felt*,
+        slot : felt
+    ):
+    alloc_locals
+    if slot == 0:
+        return ()
+    end
+    pack_words(layout, words, slots, slot - 1)
+    # (Note, on first entry, slot=1 so slot-1 gets the index)
+    let (n_words) = words_in_slot(layout, slot - 1)
+    let (packed) = pack_fields(words + (slot - 1) * layout.words_per_slot,
+        n_words, layout.word_shift)
+    assert slots[slot - 1] = packed
+    return ()
+end
+
+
+# Unpacks the slots of a sized generation into its words.
+func unpack_words{
+        range_check_ptr
+    }(
+        layout : BoardLayout,
+        slots : felt*,
+        words : felt*,
+        slot : felt
+    ):
+    alloc_locals
+    if slot == 0:
+        return ()
+    end
+    unpack_words(layout, slots, words, slot - 1)
+    # (Note, on first entry, slot=1 so slot-1 gets the index)
+    let (n_words) = words_in_slot(layout, slot - 1)
+    let slot_words = words + (slot - 1) * layout.words_per_slot
+    # A word wider than 128 bits is a slot on its own.
+    if n_words == 1:
+        assert slot_words[0] = slots[slot - 1]
+        return ()
+    end
+    split_int(value=slots[slot - 1], n=n_words, base=layout.word_shift,
+        bound=layout.word_shift, output=slot_words)
+    return ()
+end
+
+
+# Checks that user supplied words fit their columns, row by row.
+func assert_valid_words{
+        range_check_ptr
+    }(
+        layout : BoardLayout,
+        words : felt*,
+        row : felt
+    ):
+    alloc_locals
+    if row == 0:
+        return ()
+    end
+    assert_valid_words(layout, words, row - 1)
+    # (Note, on first entry, row=1 so row-1 gets the index)
+    let row_words = words + (row - 1) * layout.words_per_row
+    let (last_word_shift) = pow(2, layout.last_word_bits)
+    assert_le_felt(row_words[layout.words_per_row - 1], last_word_shift - 1)
+    assert_valid_full_words(row_words, layout.words_per_row - 1)
+    return ()
+end
+
+
+# Checks the full words of a row (all but the last).
+func assert_valid_full_words{
+        range_check_ptr
+    }(
+        row_words : felt*,
+        word : felt
+    ):
+    if word == 0:
+        return ()
+    end
+    assert_valid_full_words(row_words, word - 1)
+    # (Note, on first entry, word=1 so word-1 gets the index)
+    assert_le_felt(row_words[word - 1], FULL_WORD_SHIFT - 1)
+    return ()
+end
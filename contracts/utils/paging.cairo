@@ -0,0 +1,44 @@
+from starkware.cairo.common.bitwise import bitwise_and
+from starkware.cairo.common.cairo_builtins import BitwiseBuiltin
+from starkware.cairo.common.math_cmp import is_le
+
+# Most items a paginated view returns per call.
+const MAX_PAGE_SIZE = 20
+
+# Returns 1 if any bit of field is set in a view field mask.
+func has_field{
+        bitwise_ptr : BitwiseBuiltin*
+    }(
+        fields : felt,
+        field : felt
+    ) -> (
+        wanted : felt
+    ):
+    let (bits) = bitwise_and(fields, field)
+    if bits == 0:
+        return (0)
+    end
+    return (1)
+end
+
+# Returns how many of total items (counted back from the newest) are on
+# the page starting cursor items back, at most page_size.
+func page_length{
+        range_check_ptr
+    }(
+        total : felt,
+        cursor : felt,
+        page_size : felt
+    ) -> (
+        n : felt
+    ):
+    let (past_end) = is_le(total, cursor)
+    if past_end == 1:
+        return (0)
+    end
+    let (full) = is_le(page_size, total - cursor)
+    if full == 1:
+        return (page_size)
+    end
+    return (total - cursor)
+end
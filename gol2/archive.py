@@ -0,0 +1,352 @@
+"""Append-only binary archive of the history of one game.
+
+An archive is a directory of three files, each a 64 byte header followed
+by fixed-stride records:
+
+    boards.bin        128 bytes per generation: DIM little-endian uint32
+                      rows, as returned by view_game
+    owners.bin        32 bytes per generation: the owner (Infinite) or
+                      contributor (Creator) felt, big-endian
+    redemptions.bin   64 bytes per give_life redemption, REDEMPTION_DTYPE
+
+Generation g is record g - first_generation of boards.bin and owners.bin,
+so the boards of the whole history are one numpy.memmap of shape
+(generations, DIM) that is read without copying or going through Python
+integers:
+
+    archive = Archive('infinite.arc')
+    boards = archive.boards()            # memmap, shape (gens, 32), uint32
+    alive = np.unpackbits(boards.view(np.uint8), axis=1).sum(axis=1)
+
+Records are only appended. The header holds the number of committed
+records, which is advanced only after the records are flushed to disk. On
+open, bytes past the committed records (a write cut short by a crash) are
+truncated, so a crash loses at most the uncommitted tail.
+"""
+
+import os
+import struct
+
+import numpy as np
+
+from gol2.packing import DIM
+
+MAGIC = b'GOL2ARC1'
+VERSION = 1
+HEADER_SIZE = 64
+# magic, version, record size, first generation, committed records.
+HEADER_FORMAT = '<8sIIqQ'
+COMMITTED_OFFSET = struct.calcsize('<8sIIq')
+
+BOARD_DTYPE = np.dtype('<u4')
+BOARD_RECORD = DIM * BOARD_DTYPE.itemsize
+FELT_BYTES = 32
+REDEMPTION_DTYPE = np.dtype([
+    ('user_id', 'u1', (FELT_BYTES,)),
+    ('token_id', '<u8'),
+    ('redemption_index', '<u8'),
+    ('generation', '<u8'),
+    ('row', '<u4'),
+    ('col', '<u4'),
+])
+
+BOARDS_FILE = 'boards.bin'
+OWNERS_FILE = 'owners.bin'
+REDEMPTIONS_FILE = 'redemptions.bin'
+
+
+def felt_to_bytes(value):
+    return int(value).to_bytes(FELT_BYTES, 'big')
+
+
+def felt_from_bytes(data):
+    """Reads a felt from its 32 stored bytes (e.g., a row of owners())."""
+    return int.from_bytes(bytes(data), 'big')
+
+
+class RecordFile():
+    """
+    One header plus fixed-stride records, opened for appending.
+
+    Parameters
+    ----------
+
+    path : str
+
+    record_size : int
+
+    first_generation : int
+        Written to the header of a new file, read from an existing one.
+    """
+
+    def __init__(self, path, record_size, first_generation=0):
+        self.path = path
+        self.record_size = record_size
+        exists = os.path.exists(path) and os.path.getsize(path) > 0
+        self.file = open(path, 'r+b' if exists else 'w+b')
+        if exists:
+            self._read_header()
+            self._recover_tail()
+        else:
+            self.first_generation = first_generation
+            self.committed = 0
+            self._write_header()
+            self._sync()
+
+    def _read_header(self):
+        self.file.seek(0)
+        header = self.file.read(HEADER_SIZE)
+        if len(header) < HEADER_SIZE:
+            raise ValueError(f'{self.path}: truncated header')
+        magic, version, record_size, first, committed = struct.unpack_from(
+            HEADER_FORMAT, header)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f'{self.path}: not a version {VERSION} archive')
+        if record_size != self.record_size:
+            raise ValueError(f'{self.path}: record size {record_size}, '
+                f'expected {self.record_size}')
+        self.first_generation = first
+        self.committed = committed
+
+    def _write_header(self):
+        self.file.seek(0)
+        self.file.write(struct.pack(HEADER_FORMAT, MAGIC, VERSION,
+            self.record_size, self.first_generation, self.committed).ljust(
+            HEADER_SIZE, b'\0'))
+
+    def _recover_tail(self):
+        end = HEADER_SIZE + self.committed * self.record_size
+        size = os.path.getsize(self.path)
+        if size < end:
+            raise ValueError(f'{self.path}: {self.committed} records '
+                f'committed but only {size} bytes')
+        if size > end:
+            # Records written after the last commit.
+            self.file.truncate(end)
+            self._sync()
+
+    def _sync(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def append(self, data):
+        """Writes whole records (bytes) at the end. They are not visible
+        to readers until commit()."""
+        if len(data) % self.record_size:
+            raise ValueError('Data is not a whole number of records')
+        self.file.seek(0, os.SEEK_END)
+        self.file.write(data)
+        return len(data) // self.record_size
+
+    def commit(self, count):
+        """Makes the records written so far durable, then counts them."""
+        self._sync()
+        self.committed = count
+        self.file.seek(COMMITTED_OFFSET)
+        self.file.write(struct.pack('<Q', count))
+        self._sync()
+
+    def records(self, dtype, shape=()):
+        """Returns the committed records as a read-only memmap."""
+        if self.committed == 0:
+            return np.zeros((0,) + shape, dtype=dtype)
+        return np.memmap(self.path, dtype=dtype, mode='r',
+            offset=HEADER_SIZE, shape=(self.committed,) + shape)
+
+    def close(self):
+        self.file.close()
+
+
+class Archive():
+    """
+    The boards, owners and redemptions of one game, on disk.
+
+    Parameters
+    ----------
+
+    directory : str
+        Created if missing.
+
+    first_generation : int
+        Generation of the first board of a new archive (the genesis: 1 in
+        Infinite, 0 in Creator). Ignored for an existing archive.
+    """
+
+    def __init__(self, directory, first_generation=1):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self._boards = RecordFile(os.path.join(directory, BOARDS_FILE),
+            BOARD_RECORD, first_generation)
+        self._owners = RecordFile(os.path.join(directory, OWNERS_FILE),
+            FELT_BYTES, self._boards.first_generation)
+        self._redemptions = RecordFile(os.path.join(directory,
+            REDEMPTIONS_FILE), REDEMPTION_DTYPE.itemsize)
+        # Boards and owners are committed together, keep the shorter.
+        count = min(self._boards.committed, self._owners.committed)
+        for records in (self._boards, self._owners):
+            if records.committed != count:
+                records.committed = count
+                records._recover_tail()
+                records.commit(count)
+        self._pending = 0
+        self._pending_redemptions = 0
+
+    @property
+    def first_generation(self):
+        return self._boards.first_generation
+
+    @property
+    def next_generation(self):
+        """The generation the next appended board must be."""
+        return self.first_generation + self._boards.committed + self._pending
+
+    def __len__(self):
+        """Number of committed generations."""
+        return self._boards.committed
+
+    @property
+    def redemption_count(self):
+        """Redemptions added so far, committed or not."""
+        return self._redemptions.committed + self._pending_redemptions
+
+    def append(self, generation, rows, owner=0):
+        """Adds the next generation. Call commit() to make it durable."""
+        self.extend(generation, np.asarray(rows)[None], [owner])
+
+    def extend(self, first, boards, owners):
+        """
+        Adds consecutive generations starting at first.
+
+        Parameters
+        ----------
+
+        first : int
+            Must be next_generation.
+
+        boards : array of shape (N, DIM), rows below 2**32.
+
+        owners : sequence of N felts.
+        """
+        if first != self.next_generation:
+            raise ValueError(f'Expected generation {self.next_generation}, '
+                f'got {first}')
+        boards = np.asarray(boards, dtype=np.uint64)
+        if boards.ndim != 2 or boards.shape[1] != DIM:
+            raise ValueError(f'Expected boards of shape (N, {DIM})')
+        if len(owners) != len(boards):
+            raise ValueError('Expected one owner per board')
+        if (boards >> 32).any():
+            raise ValueError('Rows must fit in 32 bits')
+        self._boards.append(boards.astype(BOARD_DTYPE).tobytes())
+        self._owners.append(b''.join(felt_to_bytes(o) for o in owners))
+        self._pending += len(boards)
+
+    def add_redemption(self, redemption_index, token_id, generation, row,
+            col, user_id):
+        """Adds a give_life redemption (in redemption index order)."""
+        record = np.zeros(1, dtype=REDEMPTION_DTYPE)
+        record['user_id'][0] = np.frombuffer(felt_to_bytes(user_id),
+            dtype=np.uint8)
+        record['token_id'] = token_id
+        record['redemption_index'] = redemption_index
+        record['generation'] = generation
+        record['row'] = row
+        record['col'] = col
+        self._redemptions.append(record.tobytes())
+        self._pending_redemptions += 1
+
+    def commit(self):
+        """Makes everything appended so far durable and readable."""
+        if self._pending:
+            # Owners first: on open both are cut to the shorter count.
+            count = self._boards.committed + self._pending
+            self._owners.commit(count)
+            self._boards.commit(count)
+            self._pending = 0
+        if self._pending_redemptions:
+            self._redemptions.commit(self._redemptions.committed +
+                self._pending_redemptions)
+            self._pending_redemptions = 0
+
+    def boards(self):
+        """All committed boards, a memmap of shape (generations, DIM)."""
+        return self._boards.records(BOARD_DTYPE, (DIM,))
+
+    def board(self, generation):
+        return self.boards()[generation - self.first_generation]
+
+    def owners(self):
+        """The owner felts, a memmap of shape (generations, 32) bytes."""
+        return self._owners.records(np.uint8, (FELT_BYTES,))
+
+    def owner(self, generation):
+        return felt_from_bytes(
+            self.owners()[generation - self.first_generation])
+
+    def redemptions(self):
+        """All committed redemptions, a memmap of REDEMPTION_DTYPE."""
+        return self._redemptions.records(REDEMPTION_DTYPE)
+
+    def close(self):
+        self.commit()
+        for records in (self._boards, self._owners, self._redemptions):
+            records.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_boards(directory):
+    """
+    Maps the committed boards of an archive read-only, e.g., in another
+    process than the one appending. Unlike Archive, nothing past the
+    committed records is truncated.
+
+    Returns
+    -------
+
+    (first_generation, memmap of shape (generations, DIM))
+    """
+    path = os.path.join(directory, BOARDS_FILE)
+    with open(path, 'rb') as file:
+        header = file.read(HEADER_SIZE)
+    if len(header) < HEADER_SIZE:
+        raise ValueError(f'{path}: truncated header')
+    magic, version, record_size, first, committed = struct.unpack_from(
+        HEADER_FORMAT, header)
+    if magic != MAGIC or version != VERSION or record_size != BOARD_RECORD:
+        raise ValueError(f'{path}: not a version {VERSION} board archive')
+    if committed == 0:
+        return first, np.zeros((0, DIM), dtype=BOARD_DTYPE)
+    return first, np.memmap(path, dtype=BOARD_DTYPE, mode='r',
+        offset=HEADER_SIZE, shape=(committed, DIM))
+
+
+def archive_from_store(store, archive, game_index=0):
+    """
+    Appends the generations and redemptions an IndexStore (see
+    gol2/indexer.py) holds beyond the end of the archive.
+
+    Returns
+    -------
+
+    int number of generations added.
+    """
+    added = 0
+    head = store.head(game_index)
+    if head is not None:
+        for generation in range(archive.next_generation, head[0] + 1):
+            rows = store.board(generation, game_index)
+            if rows is None:
+                break
+            archive.append(generation, rows,
+                store.owner(generation, game_index))
+            added += 1
+    if game_index == 0:
+        for redemption in store.redemptions()[archive.redemption_count:]:
+            archive.add_redemption(*redemption)
+    archive.commit()
+    return added
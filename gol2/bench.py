@@ -0,0 +1,246 @@
+"""Resource benchmarks for the GoL2 contracts.
+
+Deploys both contracts on an in-process Starknet and records, for every
+external and view a turn or a frontend poll uses, the Cairo steps, the
+range_check, pedersen and bitwise builtin usage and the number of storage
+cells written. Scenarios cover several history lengths (generations
+evolved before the measurement) and, for Creator, several board densities.
+
+Results are compared against a JSON baseline, any metric that grew by
+more than the tolerance is reported as a regression:
+
+    python -m gol2.bench                 # compare with bench/baseline.json
+    python -m gol2.bench --update        # rewrite the baseline
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+
+import numpy as np
+from starkware.starknet.compiler.compile import compile_starknet_files
+from starkware.starknet.testing.starknet import Starknet
+
+from gol2.client import FIELD_BOARDS, FIELD_OWNERS
+from gol2.simulator import DIM, ROW_MASK, fetch_board, to_cells
+
+INFINITE_SOURCE = 'contracts/GoL2_infinite.cairo'
+CREATOR_SOURCE = 'contracts/GoL2_creator.cairo'
+DEFAULT_BASELINE = 'bench/baseline.json'
+# Allowed growth of any metric before it is flagged.
+DEFAULT_TOLERANCE = 0.02
+
+METRICS = ('steps', 'range_check', 'pedersen', 'bitwise', 'storage_writes')
+BUILTINS = {
+    'range_check': 'range_check_builtin',
+    'pedersen': 'pedersen_builtin',
+    'bitwise': 'bitwise_builtin',
+}
+# Generations evolved before measuring.
+HISTORY_LENGTHS = (1, 30)
+# Fraction of live cells in Creator genesis boards.
+DENSITIES = (0.05, 0.25, 0.5)
+# Constructor history_interval: store every generation.
+STORE_ALL = 1
+# Most generations a single turn may evolve, see the contracts.
+MAX_GENERATIONS_PER_TURN = 10
+CREDIT_REQUIREMENT = 10
+USER_IDS = [76543, 23456]
+# Every field of the paginated views.
+ALL_FIELDS = 7
+
+
+def random_board(density, seed=0):
+    """Returns DIM rows with roughly the given fraction of live cells."""
+    rng = np.random.default_rng(seed)
+    cells = rng.random((DIM, DIM)) < density
+    weights = 2 ** np.arange(DIM - 1, -1, -1, dtype=np.uint64)
+    return [int(row) & ROW_MASK for row in (cells * weights).sum(axis=1)]
+
+
+def storage_of(contract):
+    updates = contract.state.state.contract_states[
+        contract.contract_address].storage_updates
+    return {key: leaf.value for key, leaf in updates.items()}
+
+
+async def measure(contract, name, *args, invoke=False, caller=0):
+    """
+    Calls (or invokes) a contract function and returns its resource use.
+
+    Returns
+    -------
+
+    dict with a value for each of METRICS. Storage writes count the
+    storage cells whose value changed.
+    """
+    method = getattr(contract, name)(*args)
+    before = storage_of(contract)
+    if invoke:
+        info = await method.invoke(caller_address=caller)
+    else:
+        info = await method.call(caller_address=caller)
+    after = storage_of(contract)
+    usage = info.call_info.cairo_usage
+    record = {'steps': usage.n_steps}
+    for metric, builtin in BUILTINS.items():
+        record[metric] = usage.builtin_instance_counter.get(builtin, 0)
+    record['storage_writes'] = sum(
+        1 for key, value in after.items() if before.get(key) != value)
+    return record
+
+
+async def evolve_infinite(game, generations, user):
+    while generations > 0:
+        turn = min(generations, MAX_GENERATIONS_PER_TURN)
+        await game.evolve_and_claim_generations(user, turn).invoke(
+            caller_address=user)
+        generations -= turn
+
+
+async def dead_cell(game):
+    response = await game.current_generation_id().call()
+    board = await fetch_board(game, response.result.gen_id)
+    row, col = np.argwhere(to_cells(board) == 0)[0]
+    return int(row), int(col)
+
+
+async def bench_infinite(starknet, contract_def, history):
+    game = await starknet.deploy(contract_def=contract_def,
+        constructor_calldata=[STORE_ALL])
+    user = USER_IDS[0]
+    await evolve_infinite(game, history, user)
+    results = {}
+    results['evolve_and_claim_next_generation'] = await measure(game,
+        'evolve_and_claim_next_generation', user, invoke=True, caller=user)
+    # The first token of the user (generation 2) is unused.
+    row, col = await dead_cell(game)
+    results['give_life_to_cell'] = await measure(game,
+        'give_life_to_cell', user, row, col, 2, invoke=True, caller=user)
+    results['latest_useful_state'] = await measure(game,
+        'latest_useful_state', 0, ALL_FIELDS, 0, 3)
+    results['latest_useful_state/boards'] = await measure(game,
+        'latest_useful_state', 0, FIELD_BOARDS, 0, 1)
+    results['get_arbitrary_state_arrays'] = await measure(game,
+        'get_arbitrary_state_arrays', [1, 2], 5, [0], 1)
+    return {f'infinite/{name}/history={history}': record
+        for name, record in results.items()}
+
+
+async def bench_creator(starknet, contract_def, history):
+    game = await starknet.deploy(contract_def=contract_def,
+        constructor_calldata=[STORE_ALL])
+    user = USER_IDS[0]
+    results = {}
+    for index, density in enumerate(DENSITIES):
+        # Credits for the new game.
+        await game.contribute_generations(0, CREDIT_REQUIREMENT).invoke(
+            caller_address=user)
+        label = f'density={density}'
+        results[f'create/{label}'] = await measure(game, 'create',
+            *random_board(density, seed=index), invoke=True, caller=user)
+        game_index = index + 1
+        remaining = history - 1
+        while remaining > 0:
+            turn = min(remaining, MAX_GENERATIONS_PER_TURN)
+            await game.contribute_generations(game_index, turn).invoke(
+                caller_address=user)
+            remaining -= turn
+        results[f'contribute/{label}'] = await measure(game, 'contribute',
+            game_index, invoke=True, caller=user)
+    results['get_recently_created'] = await measure(game,
+        'get_recently_created', 0, ALL_FIELDS, 0, 5)
+    results['get_recently_created/owners'] = await measure(game,
+        'get_recently_created', 0, FIELD_OWNERS, 0, 5)
+    results['get_recent_user_data'] = await measure(game,
+        'get_recent_user_data', user, 3, 3)
+    return {f'creator/{name}/history={history}': record
+        for name, record in results.items()}
+
+
+async def run_benchmarks(history_lengths=HISTORY_LENGTHS):
+    """Runs every scenario. Returns {scenario: {metric: value}}."""
+    starknet = await Starknet.empty()
+    infinite = compile_starknet_files([INFINITE_SOURCE], debug_info=True)
+    creator = compile_starknet_files([CREATOR_SOURCE], debug_info=True)
+    results = {}
+    for history in history_lengths:
+        results.update(await bench_infinite(starknet, infinite, history))
+        results.update(await bench_creator(starknet, creator, history))
+    return results
+
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """
+    Compares results with a baseline.
+
+    Parameters
+    ----------
+
+    results, baseline : dict
+        {scenario: {metric: value}} as returned by run_benchmarks.
+
+    tolerance : float
+        Relative growth allowed before a metric is a regression.
+
+    Returns
+    -------
+
+    list of (scenario, metric, baseline value, new value) regressions.
+    Scenarios or metrics missing from the baseline are not compared.
+    """
+    regressions = []
+    for scenario, record in sorted(results.items()):
+        expected = baseline.get(scenario, {})
+        for metric in METRICS:
+            if metric not in expected or metric not in record:
+                continue
+            if record[metric] > expected[metric] * (1 + tolerance):
+                regressions.append(
+                    (scenario, metric, expected[metric], record[metric]))
+    return regressions
+
+
+def format_table(results, baseline):
+    lines = [f"{'scenario':<60}" + ''.join(f'{m:>16}' for m in METRICS)]
+    for scenario, record in sorted(results.items()):
+        cells = []
+        for metric in METRICS:
+            value = record[metric]
+            old = baseline.get(scenario, {}).get(metric)
+            change = '' if not old else f' {100 * (value - old) / old:+.0f}%'
+            cells.append(f'{str(value) + change:>16}')
+        lines.append(f'{scenario:<60}' + ''.join(cells))
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--update', action='store_true',
+        help='Write the results as the new baseline.')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE)
+    args = parser.parse_args(argv)
+
+    results = asyncio.get_event_loop().run_until_complete(run_benchmarks())
+    try:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    except FileNotFoundError:
+        baseline = {}
+    print(format_table(results, baseline))
+
+    if args.update:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+            f.write('\n')
+        return 0
+    regressions = compare(results, baseline, args.tolerance)
+    for scenario, metric, old, new in regressions:
+        print(f'REGRESSION {scenario} {metric}: {old} -> {new}')
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
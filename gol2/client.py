@@ -0,0 +1,399 @@
+"""Read client for the GoL2 contracts with a cache of finalised boards.
+
+A generation cannot change once the game has moved past it: evolving only
+writes new generations and give_life only edits the current one. Boards
+older than the latest known head are therefore kept in a BoardCache (an
+LRU in memory, optionally backed by an sqlite file) and never read again.
+The head itself is always read from the contract.
+
+Concurrent single-generation reads of an Infinite game are coalesced into
+one get_arbitrary_state_arrays call.
+
+Contracts are used through the interface of the in-process test contracts,
+``await contract.method(*args).call()`` returning a response with a
+``result`` tuple.
+"""
+
+import asyncio
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+from gol2.indexer import IndexStore
+from gol2.simulator import DIM, as_board, population
+
+# Generation the acorn is stored under, per contract.
+INFINITE_GENESIS = 1
+CREATOR_GENESIS = 0
+# Boards per coalesced get_arbitrary_state_arrays call.
+MAX_BATCH = 32
+# Fields per give life event in get_arbitrary_state_arrays.
+REDEMPTION_FIELDS = 6
+# Field mask bits of the paginated views, see the contracts.
+FIELD_BOARDS = 1
+FIELD_OWNERS = 2
+FIELD_REDEMPTIONS = 4  # Infinite latest_useful_state.
+FIELD_GENERATIONS = 4  # Creator get_recently_created.
+FIELD_GENESIS = 8  # Creator get_recent_generations_of_game.
+# Most items a paginated view returns per call.
+MAX_PAGE_SIZE = 20
+
+
+@dataclass(frozen=True)
+class Board():
+    """DIM rows of one generation, column 0 in the MSB of each row."""
+    generation: int
+    rows: Tuple[int, ...]
+    game_index: int = 0
+
+    def array(self):
+        """Rows as a uint32 array, see gol2/simulator.py."""
+        return as_board(self.rows)
+
+    def population(self):
+        return int(population(self.rows))
+
+
+@dataclass(frozen=True)
+class Redemption():
+    """A give life action: the token redeemed and the cell revived."""
+    token_id: int
+    generation: int
+    row: int
+    col: int
+    owner: int
+    redemption_index: Optional[int] = None
+
+
+@dataclass(frozen=True)
+class UsefulState():
+    """Decoded page of latest_useful_state. Fields left out of the field
+    mask are empty."""
+    generation: int
+    redemption_count: int
+    # Cursor of the next page, 0 if this is the last.
+    next_cursor: int
+    # Generations of the page, newest first, with their owners.
+    generations: Tuple[int, ...]
+    boards: Tuple[Board, ...]
+    owners: Tuple[int, ...]
+    # Redemptions of the page, newest first.
+    redemptions: Tuple[Redemption, ...]
+
+
+@dataclass(frozen=True)
+class StateArrays():
+    """Decoded get_arbitrary_state_arrays result."""
+    head: int
+    boards: Tuple[Board, ...]
+    owners: Tuple[int, ...]
+    latest_boards: Tuple[Board, ...]
+    latest_owners: Tuple[int, ...]
+    latest_redemption_index: int
+    redemptions: Tuple[Redemption, ...]
+    latest_redemptions: Tuple[Redemption, ...]
+
+
+def split_boards(flat, generations, game_index=0):
+    """Splits a flat array of rows into one Board per generation."""
+    return tuple(
+        Board(gen, tuple(flat[DIM * i:DIM * (i + 1)]), game_index)
+        for i, gen in enumerate(generations))
+
+
+def decode_useful_state(result):
+    """Decodes a page returned by latest_useful_state."""
+    return UsefulState(
+        generation=result.gen_id,
+        redemption_count=result.redemption_count,
+        next_cursor=result.next_cursor,
+        generations=tuple(result.gen_ids),
+        boards=split_boards(result.boards,
+            result.gen_ids[:len(result.boards) // DIM]),
+        owners=tuple(result.owners),
+        redemptions=decode_redemptions(result.redemptions))
+
+
+def decode_redemptions(flat):
+    # [redemption_index, id_minted, id_used, row, col, owner], where the
+    # generation is the one the token was used in.
+    return tuple(
+        Redemption(token_id=flat[i + 1], generation=flat[i + 2],
+            row=flat[i + 3], col=flat[i + 4], owner=flat[i + 5],
+            redemption_index=flat[i])
+        for i in range(0, len(flat), REDEMPTION_FIELDS))
+
+
+def decode_state_arrays(result, generations):
+    """
+    Decodes a get_arbitrary_state_arrays result.
+
+    Parameters
+    ----------
+
+    result : response.result of the call.
+
+    generations : list of int
+        The gen_ids_array passed to the call.
+
+    Returns
+    -------
+
+    StateArrays
+    """
+    head = result.current_generation_id
+    n_latest = len(result.latest_state_owners)
+    return StateArrays(
+        head=head,
+        boards=split_boards(result.gen_ids_array_result, generations),
+        owners=tuple(result.specific_state_owners),
+        latest_boards=split_boards(result.n_latest_states_result,
+            [head - i for i in range(n_latest)]),
+        latest_owners=tuple(result.latest_state_owners),
+        latest_redemption_index=result.latest_redemption_index,
+        redemptions=decode_redemptions(result.give_life_array_result),
+        latest_redemptions=decode_redemptions(
+            result.n_latest_give_life_result))
+
+
+class BoardCache():
+    """
+    LRU cache of finalised boards, keyed by (game_index, generation).
+
+    Parameters
+    ----------
+
+    max_boards : int
+        Boards kept in memory.
+
+    path : str, optional
+        sqlite file (in the IndexStore format) keeping every cached board
+        across runs. Memory only if omitted.
+    """
+
+    def __init__(self, max_boards=4096, path=None):
+        self.max_boards = max_boards
+        self.boards = OrderedDict()
+        self.disk = None if path is None else IndexStore(path)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, game_index, generation):
+        key = (game_index, generation)
+        board = self.boards.get(key)
+        if board is None and self.disk is not None:
+            rows = self.disk.board(generation, game_index)
+            if rows is not None:
+                board = Board(generation, tuple(rows), game_index)
+                self._remember(key, board)
+        if board is None:
+            self.misses += 1
+            return None
+        self.boards.move_to_end(key)
+        self.hits += 1
+        return board
+
+    def put(self, board):
+        key = (board.game_index, board.generation)
+        if key in self.boards:
+            return
+        self._remember(key, board)
+        if self.disk is not None:
+            with self.disk.db:
+                self.disk._put_board(board.game_index, board.generation, 0,
+                    board.rows)
+
+    def _remember(self, key, board):
+        self.boards[key] = board
+        if len(self.boards) > self.max_boards:
+            self.boards.popitem(last=False)
+
+
+class InfiniteClient():
+    """
+    Cached, coalescing reads of a GoL2_infinite contract.
+
+    Parameters
+    ----------
+
+    contract : deployed GoL2_infinite contract.
+
+    cache : BoardCache, optional
+
+    coalesce_window : float
+        Seconds to wait for more board requests before a batch is sent.
+        The default of 0 batches the requests made in one event loop pass,
+        e.g. by asyncio.gather.
+
+    Examples
+    ---------
+    Reading the last ten generations in one call
+
+    >>> client = InfiniteClient(game)
+    >>> head = await client.head()
+    >>> boards = await asyncio.gather(
+            *(client.board(gen) for gen in range(head - 9, head + 1)))
+    """
+
+    def __init__(self, contract, cache=None, coalesce_window=0.0):
+        self.contract = contract
+        self.cache = BoardCache() if cache is None else cache
+        self.coalesce_window = coalesce_window
+        self.known_head = 0
+        self.pending = {}
+        self.flush = None
+
+    def _seen_head(self, head):
+        self.known_head = max(self.known_head, head)
+
+    def _finalised(self, generation):
+        return INFINITE_GENESIS <= generation < self.known_head
+
+    def _keep(self, boards):
+        for board in boards:
+            if self._finalised(board.generation):
+                self.cache.put(board)
+
+    async def head(self):
+        """Reads the current generation id."""
+        response = await self.contract.current_generation_id().call()
+        self._seen_head(response.result.gen_id)
+        return response.result.gen_id
+
+    async def board(self, generation):
+        """Returns one generation, batched with concurrent requests."""
+        cached = self.cache.get(0, generation)
+        if cached is not None:
+            return cached
+        future = self.pending.get(generation)
+        if future is None:
+            future = asyncio.get_event_loop().create_future()
+            self.pending[generation] = future
+            if self.flush is None:
+                self.flush = asyncio.ensure_future(self._flush())
+        return await future
+
+    async def boards(self, generations):
+        """Returns several generations, reading only the uncached ones."""
+        return list(await asyncio.gather(
+            *(self.board(gen) for gen in generations)))
+
+    async def _flush(self):
+        await asyncio.sleep(self.coalesce_window)
+        pending, self.pending, self.flush = self.pending, {}, None
+        generations = list(pending)
+        for start in range(0, len(generations), MAX_BATCH):
+            batch = generations[start:start + MAX_BATCH]
+            try:
+                arrays = await self.state_arrays(batch)
+            except Exception as error:
+                for gen in batch:
+                    pending[gen].set_exception(error)
+                continue
+            for board in arrays.boards:
+                pending[board.generation].set_result(board)
+
+    async def state_arrays(self, generations, n_latest=0,
+            give_life_indices=(), n_latest_give_life=0):
+        """Calls get_arbitrary_state_arrays and decodes the result."""
+        response = await self.contract.get_arbitrary_state_arrays(
+            list(generations), n_latest, list(give_life_indices),
+            n_latest_give_life).call()
+        arrays = decode_state_arrays(response.result, list(generations))
+        self._seen_head(arrays.head)
+        self._keep(arrays.boards + arrays.latest_boards)
+        return arrays
+
+    async def latest_useful_state(self, generation=0,
+            fields=FIELD_BOARDS | FIELD_OWNERS | FIELD_REDEMPTIONS,
+            cursor=0, page_size=MAX_PAGE_SIZE):
+        """Calls latest_useful_state (0 for the head) for one page and
+        decodes it."""
+        response = await self.contract.latest_useful_state(
+            generation, fields, cursor, page_size).call()
+        state = decode_useful_state(response.result)
+        if generation == 0:
+            self._seen_head(state.generation)
+        self._keep(state.boards)
+        return state
+
+
+class CreatorClient():
+    """
+    Cached reads of a GoL2_creator contract.
+
+    Creator has no batch board view, so concurrent reads of the same board
+    share one view_game call instead.
+
+    Parameters
+    ----------
+
+    contract : deployed GoL2_creator contract.
+
+    cache : BoardCache, optional
+    """
+
+    def __init__(self, contract, cache=None):
+        self.contract = contract
+        self.cache = BoardCache() if cache is None else cache
+        self.known_heads = {}
+        self.in_flight = {}
+
+    def _seen_head(self, game_index, head):
+        self.known_heads[game_index] = max(
+            self.known_heads.get(game_index, 0), head)
+
+    def _finalised(self, board):
+        head = self.known_heads.get(board.game_index, 0)
+        return CREATOR_GENESIS <= board.generation < head
+
+    async def head(self, game_index):
+        """Reads the latest generation of a game."""
+        response = await self.contract.generation_of_game(game_index).call()
+        self._seen_head(game_index, response.result.generation)
+        return response.result.generation
+
+    async def board(self, game_index, generation):
+        """Returns one generation of a game."""
+        cached = self.cache.get(game_index, generation)
+        if cached is not None:
+            return cached
+        key = (game_index, generation)
+        task = self.in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(
+                self._read(game_index, generation))
+            self.in_flight[key] = task
+            task.add_done_callback(lambda _: self.in_flight.pop(key, None))
+        return await task
+
+    async def _read(self, game_index, generation):
+        response = await self.contract.view_game(game_index,
+            generation).call()
+        board = Board(generation, tuple(response.result), game_index)
+        if self._finalised(board):
+            self.cache.put(board)
+        return board
+
+    async def recently_created(self, game_index=0, cursor=0, page_size=5):
+        """
+        Calls get_recently_created (0 for the newest game) for one page.
+
+        Returns
+        -------
+
+        list of (Board, owner) for up to page_size games, newest first,
+        and the cursor of the next page (0 if this is the last).
+        """
+        response = await self.contract.get_recently_created(game_index,
+            FIELD_BOARDS | FIELD_OWNERS | FIELD_GENERATIONS, cursor,
+            page_size).call()
+        result = response.result
+        games = []
+        for i, index in enumerate(result.game_indices):
+            board = Board(result.generations[i],
+                tuple(result.boards[DIM * i:DIM * (i + 1)]), index)
+            games.append((board, result.owners[i]))
+            # Each game is at its head here.
+            self._seen_head(board.game_index, board.generation)
+        return games, result.next_cursor
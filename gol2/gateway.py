@@ -0,0 +1,422 @@
+"""Read gateway for frontends, with new generations pushed over WebSocket.
+
+A Gateway polls the contracts on behalf of every viewer: one
+latest_useful_state call for Infinite (head, recent boards, owners and
+redemptions) and one get_recently_created call for Creator (the newest
+games and their latest generations) per poll_interval. What it reads is
+kept in memory and served over HTTP, and whatever changed is pushed to
+every WebSocket subscriber. However many viewers are connected, the node
+sees one reader.
+
+Older boards go through InfiniteClient and CreatorClient, so a board is
+read once and concurrent requests for it share the read. User data is
+cached until the game it belongs to changes.
+
+    gateway = Gateway(InfiniteClient(game), CreatorClient(creator))
+    runner = await serve(gateway, port=8080)
+    ...
+    await gateway.close()
+    await runner.cleanup()
+
+Routes:
+
+    GET /infinite/head                      head board, owner, redemptions
+    GET /infinite/boards/{generation}
+    GET /infinite/redemptions               newest first
+    GET /infinite/users/{user}              tokens and where they gave life
+    GET /creator/games                      recent games, newest first
+    GET /creator/games/{game_index}/{generation}
+    GET /creator/users/{user}               credits, games and their heads
+    GET /ws                                 push messages (JSON)
+
+Boards are JSON unless ?format=binary, which returns the DIM rows as
+big-endian uint32 (the IndexStore row format).
+
+Pushed messages have a type of 'generation' (Infinite, also sent again
+when give_life edits the head), 'redemption' or 'game' (a Creator game
+that was created or evolved). A new subscriber first gets a 'snapshot'.
+Creator games older than the `recent` newest are not watched.
+"""
+
+import asyncio
+import json
+import struct
+from collections import deque
+
+from aiohttp import web, WSMsgType
+
+from gol2.client import (FIELD_BOARDS, FIELD_OWNERS, FIELD_REDEMPTIONS,
+    MAX_PAGE_SIZE)
+from gol2.indexer import ROWS_FORMAT
+
+DEFAULT_POLL_INTERVAL = 1.0
+# Games of a user fetched with their latest generation.
+USER_GAMES = 5
+# Messages a slow subscriber may fall behind by before it is dropped.
+MAX_QUEUED = 256
+# Seconds between WebSocket pings (a subscriber that misses a pong is
+# dropped).
+HEARTBEAT = 30.0
+
+
+def board_json(board, owner=None):
+    data = {'generation': board.generation, 'rows': list(board.rows)}
+    if owner is not None:
+        data['owner'] = hex(owner)
+    return data
+
+
+def redemption_json(redemption):
+    return {'redemption_index': redemption.redemption_index,
+        'token_id': redemption.token_id,
+        'generation': redemption.generation, 'row': redemption.row,
+        'col': redemption.col, 'owner': hex(redemption.owner)}
+
+
+class Gateway():
+    """
+    In-memory view of the contracts, refreshed by one poller.
+
+    Parameters
+    ----------
+
+    infinite : InfiniteClient, optional
+
+    creator : CreatorClient, optional
+
+    recent : int
+        Generations, redemptions and Creator games kept hot. At most
+        MAX_PAGE_SIZE, the page size of the views polled.
+
+    poll_interval : float
+        Seconds between polls once run() is started.
+
+    Attributes
+    ----------
+
+    head : Board of the Infinite head, None before the first poll.
+
+    owners : {generation: owner} of the recent Infinite generations.
+
+    redemption_count : int
+
+    redemptions : deque of Redemption, newest first.
+
+    games : {game_index: (Board, owner)} of the recent Creator games, each
+        at its latest generation.
+
+    polls : int
+        Completed polls.
+    """
+
+    def __init__(self, infinite=None, creator=None, recent=MAX_PAGE_SIZE,
+            poll_interval=DEFAULT_POLL_INTERVAL):
+        if not 1 <= recent <= MAX_PAGE_SIZE:
+            raise ValueError(f'recent must be from 1 to {MAX_PAGE_SIZE}')
+        self.infinite = infinite
+        self.creator = creator
+        self.recent = recent
+        self.poll_interval = poll_interval
+        self.head = None
+        self.owners = {}
+        self.redemption_count = 0
+        self.redemptions = deque(maxlen=recent)
+        self.games = {}
+        self.polls = 0
+        self.subscribers = set()
+        self.user_data = {}
+        self.poller = None
+
+    async def poll(self):
+        """
+        Reads the contracts once and publishes what changed.
+
+        Returns
+        -------
+
+        list of the messages published.
+        """
+        messages = []
+        if self.infinite is not None:
+            messages += await self._poll_infinite()
+        if self.creator is not None:
+            messages += await self._poll_creator()
+        self.polls += 1
+        for message in messages:
+            self.publish(message)
+        return messages
+
+    async def _poll_infinite(self):
+        state = await self.infinite.latest_useful_state(
+            fields=FIELD_BOARDS | FIELD_OWNERS | FIELD_REDEMPTIONS,
+            page_size=self.recent)
+        messages = []
+        new_redemptions = [r for r in state.redemptions
+            if r.redemption_index >= self.redemption_count]
+        old_head = 0 if self.head is None else self.head.generation
+        owners = dict(zip(state.generations, state.owners))
+        # Oldest first. The old head is sent again if it was edited.
+        for board in reversed(state.boards):
+            changed = board.generation == old_head and board != self.head
+            if board.generation > old_head or changed:
+                messages.append({'type': 'generation',
+                    **board_json(board, owners[board.generation])})
+        for redemption in reversed(new_redemptions):
+            self.redemptions.appendleft(redemption)
+            messages.append({'type': 'redemption',
+                **redemption_json(redemption)})
+        if messages:
+            self.user_data = {key: data
+                for key, data in self.user_data.items() if key[0] != 'infinite'}
+        self.head = state.boards[0]
+        self.owners = owners
+        self.redemption_count = state.redemption_count
+        return messages
+
+    async def _poll_creator(self):
+        games, _ = await self.creator.recently_created(
+            page_size=self.recent)
+        messages = []
+        for board, owner in reversed(games):
+            known = self.games.get(board.game_index)
+            if known is None or known[0] != board:
+                messages.append({'type': 'game',
+                    'game_index': board.game_index,
+                    **board_json(board, owner)})
+        if messages:
+            self.user_data = {key: data
+                for key, data in self.user_data.items() if key[0] != 'creator'}
+        self.games = {board.game_index: (board, owner)
+            for board, owner in games}
+        return messages
+
+    def snapshot(self):
+        """Everything kept hot, as sent to a new subscriber."""
+        return {'type': 'snapshot',
+            'head': None if self.head is None else board_json(self.head,
+                self.owners.get(self.head.generation)),
+            'redemption_count': self.redemption_count,
+            'redemptions': [redemption_json(r) for r in self.redemptions],
+            'games': [{'game_index': index, **board_json(board, owner)}
+                for index, (board, owner) in sorted(self.games.items(),
+                    reverse=True)]}
+
+    def subscribe(self):
+        """Returns a queue that receives every published message."""
+        queue = asyncio.Queue(MAX_QUEUED)
+        self.subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue):
+        self.subscribers.discard(queue)
+
+    def publish(self, message):
+        for queue in list(self.subscribers):
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                # The subscriber gets a None and is closed.
+                self.subscribers.discard(queue)
+                queue.get_nowait()
+                queue.put_nowait(None)
+
+    async def infinite_board(self, generation):
+        """Returns an Infinite board, the head without a read."""
+        if self.head is not None and generation == self.head.generation:
+            return self.head
+        return await self.infinite.board(generation)
+
+    async def creator_board(self, game_index, generation):
+        """Returns a Creator board, the latest of a recent game without
+        a read."""
+        known = self.games.get(game_index)
+        if known is not None and known[0].generation == generation:
+            return known[0]
+        return await self.creator.board(game_index, generation)
+
+    async def infinite_user(self, user):
+        """Tokens of a user and the cell each revived, if redeemed."""
+        return await self._user_data('infinite', user,
+            self._read_infinite_user)
+
+    async def creator_user(self, user):
+        """Credits of a user and the latest board of their newest games."""
+        return await self._user_data('creator', user,
+            self._read_creator_user)
+
+    async def _user_data(self, contract, user, read):
+        # Shared by concurrent requests, dropped when the contract changes.
+        key = (contract, user)
+        task = self.user_data.get(key)
+        if task is None:
+            task = asyncio.ensure_future(read(user))
+            self.user_data[key] = task
+        try:
+            return await asyncio.shield(task)
+        except Exception:
+            if self.user_data.get(key) is task:
+                del self.user_data[key]
+            raise
+
+    async def _read_infinite_user(self, user):
+        contract = self.infinite.contract
+        response = await contract.get_user_tokens(user).call()
+        result = response.result
+        tokens = []
+        for token_id, gave_life_at in zip(result.token_ids,
+                result.gave_life_at):
+            tokens.append({'token_id': token_id,
+                'gave_life_at': gave_life_at})
+        return {'user': hex(user), 'tokens': tokens}
+
+    async def _read_creator_user(self, user):
+        contract = self.creator.contract
+        counts = (await contract.user_counts(user).call()).result
+        n_games = min(counts.game_count, USER_GAMES)
+        games = []
+        if n_games:
+            result = (await contract.get_recent_user_data(user, n_games,
+                1).call()).result
+            rows = len(result.states) // n_games
+            for i, game_index in enumerate(result.games_owned):
+                games.append({'game_index': game_index,
+                    'rows': list(result.states[rows * i:rows * (i + 1)])})
+        return {'user': hex(user), 'credits': counts.credit_count,
+            'game_count': counts.game_count, 'games': games}
+
+    async def run(self):
+        """Polls every poll_interval until close()."""
+        while True:
+            await self.poll()
+            await asyncio.sleep(self.poll_interval)
+
+    def start(self):
+        if self.poller is None:
+            self.poller = asyncio.ensure_future(self.run())
+        return self.poller
+
+    async def close(self):
+        if self.poller is not None:
+            self.poller.cancel()
+            try:
+                await self.poller
+            except asyncio.CancelledError:
+                pass
+            self.poller = None
+        self.publish(None)
+
+
+def board_response(request, board, owner=None):
+    if request.query.get('format') == 'binary':
+        return web.Response(body=struct.pack(ROWS_FORMAT, *board.rows),
+            content_type='application/octet-stream')
+    return web.json_response(board_json(board, owner))
+
+
+def int_param(request, name):
+    try:
+        return int(request.match_info[name], 0)
+    except ValueError:
+        raise web.HTTPBadRequest(text=f'{name} must be an integer')
+
+
+def make_app(gateway, heartbeat=HEARTBEAT):
+    """Returns the aiohttp Application serving a Gateway. heartbeat=None
+    does not ping subscribers."""
+    routes = web.RouteTableDef()
+
+    @routes.get('/infinite/head')
+    async def infinite_head(request):
+        if gateway.head is None:
+            raise web.HTTPServiceUnavailable(text='Not polled yet')
+        if request.query.get('format') == 'binary':
+            return board_response(request, gateway.head)
+        return web.json_response({
+            **board_json(gateway.head,
+                gateway.owners.get(gateway.head.generation)),
+            'redemption_count': gateway.redemption_count})
+
+    @routes.get('/infinite/boards/{generation}')
+    async def infinite_board(request):
+        generation = int_param(request, 'generation')
+        board = await gateway.infinite_board(generation)
+        return board_response(request, board,
+            gateway.owners.get(generation))
+
+    @routes.get('/infinite/redemptions')
+    async def infinite_redemptions(request):
+        return web.json_response(
+            [redemption_json(r) for r in gateway.redemptions])
+
+    @routes.get('/infinite/users/{user}')
+    async def infinite_user(request):
+        return web.json_response(
+            await gateway.infinite_user(int_param(request, 'user')))
+
+    @routes.get('/creator/games')
+    async def creator_games(request):
+        return web.json_response(gateway.snapshot()['games'])
+
+    @routes.get('/creator/games/{game_index}/{generation}')
+    async def creator_board(request):
+        board = await gateway.creator_board(
+            int_param(request, 'game_index'),
+            int_param(request, 'generation'))
+        return board_response(request, board)
+
+    @routes.get('/creator/users/{user}')
+    async def creator_user(request):
+        return web.json_response(
+            await gateway.creator_user(int_param(request, 'user')))
+
+    @routes.get('/ws')
+    async def websocket(request):
+        socket = web.WebSocketResponse(heartbeat=heartbeat)
+        await socket.prepare(request)
+        queue = gateway.subscribe()
+        await socket.send_str(json.dumps(gateway.snapshot()))
+        closed = asyncio.ensure_future(_until_closed(socket))
+        try:
+            while True:
+                get = asyncio.ensure_future(queue.get())
+                done, _ = await asyncio.wait({get, closed},
+                    return_when=asyncio.FIRST_COMPLETED)
+                if closed in done:
+                    get.cancel()
+                    break
+                message = get.result()
+                if message is None:
+                    break
+                await socket.send_str(json.dumps(message))
+        finally:
+            gateway.unsubscribe(queue)
+            closed.cancel()
+            await socket.close()
+        return socket
+
+    app = web.Application()
+    app.add_routes(routes)
+    return app
+
+
+async def _until_closed(socket):
+    # Subscribers only listen, anything they send is ignored.
+    async for message in socket:
+        if message.type in (WSMsgType.CLOSE, WSMsgType.ERROR):
+            break
+
+
+async def serve(gateway, host='127.0.0.1', port=8080):
+    """
+    Starts polling and serving a Gateway.
+
+    Returns
+    -------
+
+    aiohttp AppRunner, call cleanup() on it after gateway.close().
+    """
+    runner = web.AppRunner(make_app(gateway))
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    gateway.start()
+    return runner
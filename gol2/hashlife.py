@@ -0,0 +1,234 @@
+"""Memoised quadtree (HashLife) engine for far-future previews.
+
+Answers "what is the board at generation G" for G in the thousands or
+millions without evolving every generation in between. Boards use the
+contract representation (see gol2/simulator.py): 32 rows of 32 bits with
+wrapped edges.
+
+A wrapped 32x32 board is the same as an infinite plane tiled with copies
+of it, so the board is held as a quadtree node of the tiling. A node of
+level k is a 2**k square made of four level k-1 quadrants. Equal squares
+are one node (hash-consing), and the result of advancing a node is
+memoised, so a square met again, anywhere on the board or at any later
+time, is never evaluated twice. Advancing the tiling by 2**j generations
+takes the centre of a level j+2 node of copies, which is itself a tiling
+of the new board. Any G is reached with one such step per set bit of G.
+
+Wrapped boards always end in a cycle (a still life, oscillator or a
+glider circling the board). Once the board is in one, the memo has seen
+every state, and each step is a few cache hits. The work before that is
+bounded by the transient of the board, not by G.
+
+Nodes and results are kept in LRU caches of at most max_nodes entries
+each. Evicted entries are rebuilt on demand, so the cache size only
+trades memory against time.
+
+    engine = HashLife(max_nodes=200_000)
+    board = engine.advance(rows, 100_000)
+"""
+
+from collections import OrderedDict
+
+import numpy as np
+
+from gol2.simulator import DIM, as_board, from_cells, to_cells
+
+# A board is a level 5 node (2**5 = DIM).
+BOARD_LEVEL = 5
+# Steps of up to 2**(TILE_LEVEL - 2) generations use a tiling of this level
+# (the smallest whose centre covers a whole board at a board offset).
+TILE_LEVEL = 7
+DEFAULT_MAX_NODES = 200_000
+
+
+class Node():
+    """A square of 2**level cells, made of four quadrants (level >= 1),
+    or a single cell (level 0)."""
+    __slots__ = ('level', 'nw', 'ne', 'sw', 'se', 'population')
+
+    def __init__(self, level, nw, ne, sw, se, population):
+        self.level = level
+        self.nw = nw
+        self.ne = ne
+        self.sw = sw
+        self.se = se
+        self.population = population
+
+
+DEAD = Node(0, None, None, None, None, 0)
+ALIVE = Node(0, None, None, None, None, 1)
+
+
+class HashLife():
+    """
+    Quadtree engine with bounded node and result caches.
+
+    Parameters
+    ----------
+
+    max_nodes : int
+        Most entries in each of the node and result caches.
+    """
+
+    def __init__(self, max_nodes=DEFAULT_MAX_NODES):
+        self.max_nodes = max_nodes
+        self._nodes = OrderedDict()
+        self._results = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def advance(self, board, generations):
+        """
+        Returns the board after a number of generations.
+
+        Parameters
+        ----------
+
+        board : 32 rows (a view_game result, list, or array).
+
+        generations : int
+
+        Returns
+        -------
+
+        array of uint32, shape (DIM,).
+        """
+        if generations < 0:
+            raise ValueError('generations must not be negative')
+        node = self.from_board(board)
+        step = 0
+        while generations:
+            if generations & 1:
+                node = self._step(node, step)
+            generations >>= 1
+            step += 1
+        return self.to_board(node)
+
+    def from_board(self, board):
+        """Returns the level 5 node of a board."""
+        cells = to_cells(as_board(board))
+        return self._from_cells(cells, 0, 0, BOARD_LEVEL)
+
+    def to_board(self, node):
+        """Returns the rows of a level 5 node."""
+        cells = np.zeros((DIM, DIM), dtype=np.uint8)
+        self._to_cells(node, cells, 0, 0)
+        return from_cells(cells)
+
+    def stats(self):
+        return {'nodes': len(self._nodes), 'results': len(self._results),
+            'hits': self.hits, 'misses': self.misses,
+            'evictions': self.evictions}
+
+    def _step(self, board, j):
+        # A tiling of level j+2 (at least TILE_LEVEL) advanced 2**j
+        # generations. Its centre starts at a multiple of the board size,
+        # so the top-left board of the centre is the new board.
+        tile = board
+        for _ in range(max(j + 2, TILE_LEVEL) - BOARD_LEVEL):
+            tile = self._join(tile, tile, tile, tile)
+        centre = self._successor(tile, j)
+        while centre.level > BOARD_LEVEL:
+            centre = centre.nw
+        return centre
+
+    def _join(self, nw, ne, sw, se):
+        key = (nw, ne, sw, se)
+        node = self._nodes.get(key)
+        if node is not None:
+            self._nodes.move_to_end(key)
+            return node
+        node = Node(nw.level + 1, nw, ne, sw, se, nw.population +
+            ne.population + sw.population + se.population)
+        self._nodes[key] = node
+        self._evict(self._nodes)
+        return node
+
+    def _evict(self, cache):
+        while len(cache) > self.max_nodes:
+            cache.popitem(last=False)
+            self.evictions += 1
+
+    def _successor(self, node, j):
+        """The centre of a node (level k) after 2**j generations, j <= k-2."""
+        if node.population == 0:
+            return node.nw
+        key = (node, j)
+        result = self._results.get(key)
+        if result is not None:
+            self._results.move_to_end(key)
+            self.hits += 1
+            return result
+        self.misses += 1
+        if node.level == 2:
+            result = self._life_4x4(node)
+        else:
+            result = self._successor_quadrants(node, j)
+        self._results[key] = result
+        self._evict(self._results)
+        return result
+
+    def _successor_quadrants(self, node, j):
+        join = self._join
+        nw, ne, sw, se = node.nw, node.ne, node.sw, node.se
+        # At full speed (j = k-2) the generations are taken in two halves.
+        full = j == node.level - 2
+        first = j - 1 if full else j
+        # Nine overlapping squares of level k-1, each advanced.
+        c1 = self._successor(nw, first)
+        c2 = self._successor(join(nw.ne, ne.nw, nw.se, ne.sw), first)
+        c3 = self._successor(ne, first)
+        c4 = self._successor(join(nw.sw, nw.se, sw.nw, sw.ne), first)
+        c5 = self._successor(join(nw.se, ne.sw, sw.ne, se.nw), first)
+        c6 = self._successor(join(ne.sw, ne.se, se.nw, se.ne), first)
+        c7 = self._successor(sw, first)
+        c8 = self._successor(join(sw.ne, se.nw, sw.se, se.sw), first)
+        c9 = self._successor(se, first)
+        if not full:
+            # The nine squares are already 2**j ahead, take the centre.
+            return join(
+                join(c1.se, c2.sw, c4.ne, c5.nw),
+                join(c2.se, c3.sw, c5.ne, c6.nw),
+                join(c4.se, c5.sw, c7.ne, c8.nw),
+                join(c5.se, c6.sw, c8.ne, c9.nw))
+        # Advance the four quadrants of the nine by the second half.
+        return join(
+            self._successor(join(c1, c2, c4, c5), j - 1),
+            self._successor(join(c2, c3, c5, c6), j - 1),
+            self._successor(join(c4, c5, c7, c8), j - 1),
+            self._successor(join(c5, c6, c8, c9), j - 1))
+
+    def _life_4x4(self, node):
+        # The centre 2x2 of a 4x4 square after one generation.
+        cells = np.zeros((4, 4), dtype=np.uint8)
+        self._to_cells(node, cells, 0, 0)
+        quadrants = []
+        for row, col in ((1, 1), (1, 2), (2, 1), (2, 2)):
+            block = cells[row - 1:row + 2, col - 1:col + 2]
+            neighbours = int(block.sum()) - cells[row, col]
+            alive = neighbours == 3 or (cells[row, col] and neighbours == 2)
+            quadrants.append(ALIVE if alive else DEAD)
+        return self._join(*quadrants)
+
+    def _from_cells(self, cells, row, col, level):
+        if level == 0:
+            return ALIVE if cells[row, col] else DEAD
+        half = 2 ** (level - 1)
+        return self._join(
+            self._from_cells(cells, row, col, level - 1),
+            self._from_cells(cells, row, col + half, level - 1),
+            self._from_cells(cells, row + half, col, level - 1),
+            self._from_cells(cells, row + half, col + half, level - 1))
+
+    def _to_cells(self, node, cells, row, col):
+        if node.population == 0:
+            return
+        if node.level == 0:
+            cells[row, col] = 1
+            return
+        half = 2 ** (node.level - 1)
+        self._to_cells(node.nw, cells, row, col)
+        self._to_cells(node.ne, cells, row, col + half)
+        self._to_cells(node.sw, cells, row + half, col)
+        self._to_cells(node.se, cells, row + half, col + half)
@@ -0,0 +1,289 @@
+"""Rebuilds game history from contract events into a local sqlite store.
+
+The contracts emit every new generation (packed as in storage), every new
+Creator game and every give_life redemption. The Indexer consumes these in
+order and keeps boards, owners, redemptions and credits, so that reads can
+be served locally, including the history a contract deployed with a
+history_interval of 0 no longer stores.
+
+Events come from a source with an ``async fetch(cursor)`` method returning
+``(events, next_cursor)``, where each event has ``keys`` and ``data``.
+StarknetEventSource reads the in-process Starknet used in the tests.
+"""
+
+import asyncio
+import sqlite3
+import struct
+
+from starkware.starknet.public.abi import get_selector_from_name
+
+from gol2.packing import DIM, unpack_slots
+
+INFINITE = 'infinite'
+CREATOR = 'creator'
+# Credits spent by GoL2_creator.create.
+CREDIT_REQUIREMENT = 10
+# The constructors start both contracts with the acorn.
+ACORN = [0] * 12 + [32, 8, 103] + [0] * (DIM - 15)
+# Generation the acorn is stored under, per contract.
+GENESIS_GENERATION = {INFINITE: 1, CREATOR: 0}
+
+GENERATION_EVOLVED = get_selector_from_name('generation_evolved')
+LIFE_GIVEN = get_selector_from_name('life_given')
+GAME_CREATED = get_selector_from_name('game_created')
+GAME_EVOLVED = get_selector_from_name('game_evolved')
+
+ROWS_FORMAT = f'>{DIM}I'
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS boards (
+    game_index INTEGER, generation INTEGER, owner TEXT, rows BLOB,
+    PRIMARY KEY (game_index, generation));
+CREATE TABLE IF NOT EXISTS games (
+    game_index INTEGER PRIMARY KEY, owner TEXT, game_id TEXT);
+CREATE TABLE IF NOT EXISTS redemptions (
+    redemption_index INTEGER PRIMARY KEY, token_id INTEGER,
+    generation INTEGER, row INTEGER, col INTEGER, owner TEXT);
+CREATE TABLE IF NOT EXISTS credits (
+    user TEXT PRIMARY KEY, credit_count INTEGER);
+CREATE TABLE IF NOT EXISTS cursor (
+    id INTEGER PRIMARY KEY CHECK (id = 0), position INTEGER);
+'''
+
+
+class IndexStore():
+    """
+    Local store of indexed game data, backed by sqlite.
+
+    Addresses and hashes are felts, which do not fit sqlite integers,
+    so they are stored as decimal text and returned as int.
+
+    Parameters
+    ----------
+
+    path : str
+        Database file, or ':memory:' (default).
+    """
+
+    def __init__(self, path=':memory:'):
+        self.db = sqlite3.connect(path)
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def cursor_position(self):
+        row = self.db.execute('SELECT position FROM cursor').fetchone()
+        return None if row is None else row[0]
+
+    def board(self, generation, game_index=0):
+        """Returns the DIM rows of a generation, or None if unknown."""
+        row = self.db.execute(
+            'SELECT rows FROM boards WHERE game_index=? AND generation=?',
+            (game_index, generation)).fetchone()
+        return None if row is None else list(struct.unpack(ROWS_FORMAT, row[0]))
+
+    def owner(self, generation, game_index=0):
+        """Owner of an Infinite generation, or contributor in Creator."""
+        row = self.db.execute(
+            'SELECT owner FROM boards WHERE game_index=? AND generation=?',
+            (game_index, generation)).fetchone()
+        return None if row is None else int(row[0])
+
+    def head(self, game_index=0):
+        """Returns (generation, rows) of the latest known generation."""
+        row = self.db.execute(
+            'SELECT MAX(generation) FROM boards WHERE game_index=?',
+            (game_index,)).fetchone()
+        if row[0] is None:
+            return None
+        return row[0], self.board(row[0], game_index)
+
+    def tokens_of(self, user):
+        """Infinite generations owned by a user, oldest first."""
+        rows = self.db.execute(
+            'SELECT generation FROM boards WHERE game_index=0 AND owner=? '
+            'ORDER BY generation', (str(user),)).fetchall()
+        return [r[0] for r in rows]
+
+    def games_of(self, user):
+        """Creator game indices owned by a user, oldest first."""
+        rows = self.db.execute(
+            'SELECT game_index FROM games WHERE owner=? ORDER BY game_index',
+            (str(user),)).fetchall()
+        return [r[0] for r in rows]
+
+    def credits(self, user):
+        row = self.db.execute(
+            'SELECT credit_count FROM credits WHERE user=?',
+            (str(user),)).fetchone()
+        return 0 if row is None else row[0]
+
+    def redemptions(self, first=0):
+        """Returns (index, token_id, generation, row, col, owner) tuples,
+        from redemption index first on."""
+        rows = self.db.execute(
+            'SELECT redemption_index, token_id, generation, row, col, owner '
+            'FROM redemptions WHERE redemption_index >= ? '
+            'ORDER BY redemption_index', (first,)).fetchall()
+        return [r[:5] + (int(r[5]),) for r in rows]
+
+    def heads(self):
+        """Returns {game_index: latest known generation}."""
+        rows = self.db.execute(
+            'SELECT game_index, MAX(generation) FROM boards '
+            'GROUP BY game_index').fetchall()
+        return dict(rows)
+
+    def generations(self, game_index, first, last):
+        """Returns (generation, owner, rows) of a game from first to last
+        inclusive, oldest first."""
+        rows = self.db.execute(
+            'SELECT generation, owner, rows FROM boards WHERE game_index=? '
+            'AND generation BETWEEN ? AND ? ORDER BY generation',
+            (game_index, first, last)).fetchall()
+        return [(gen, int(owner), struct.unpack(ROWS_FORMAT, packed))
+            for gen, owner, packed in rows]
+
+    def games(self, first=0):
+        """Returns (game_index, owner) of the Creator games from first on."""
+        rows = self.db.execute(
+            'SELECT game_index, owner FROM games WHERE game_index >= ? '
+            'ORDER BY game_index', (first,)).fetchall()
+        return [(index, int(owner)) for index, owner in rows]
+
+    def _put_board(self, game_index, generation, owner, rows):
+        self.db.execute(
+            'INSERT OR REPLACE INTO boards VALUES (?, ?, ?, ?)',
+            (game_index, generation, str(owner),
+                struct.pack(ROWS_FORMAT, *rows)))
+
+    def _add_credits(self, user, amount):
+        self.db.execute(
+            'INSERT INTO credits VALUES (?, ?) ON CONFLICT(user) '
+            'DO UPDATE SET credit_count = credit_count + excluded.credit_count',
+            (str(user), amount))
+
+    def _set_cursor(self, position):
+        self.db.execute(
+            'INSERT OR REPLACE INTO cursor VALUES (0, ?)', (position,))
+
+
+class StarknetEventSource():
+    """
+    Events of one contract from an in-process Starknet.
+
+    Parameters
+    ----------
+
+    starknet : starkware.starknet.testing.starknet.Starknet
+
+    contract_address : int
+    """
+
+    def __init__(self, starknet, contract_address):
+        self.starknet = starknet
+        self.contract_address = contract_address
+
+    async def fetch(self, cursor):
+        events = self.starknet.state.events
+        end = len(events)
+        return [
+            event for event in events[cursor:end]
+            if event.from_address == self.contract_address
+        ], end
+
+
+class Indexer():
+    """
+    Applies contract events, in order, to an IndexStore.
+
+    Parameters
+    ----------
+
+    source : event source (see module docstring)
+
+    store : IndexStore
+
+    mode : str
+        INFINITE or CREATOR, the contract the events come from.
+
+    Examples
+    ---------
+    Catching up with an in-process deployment
+
+    >>> indexer = Indexer(StarknetEventSource(starknet,
+                                              game.contract_address),
+                          IndexStore(), INFINITE)
+    >>> await indexer.sync()
+    """
+
+    def __init__(self, source, store, mode):
+        if mode not in GENESIS_GENERATION:
+            raise ValueError(f'Unknown mode {mode}')
+        self.source = source
+        self.store = store
+        self.mode = mode
+        self.handlers = {
+            GENERATION_EVOLVED: self._generation_evolved,
+            LIFE_GIVEN: self._life_given,
+            GAME_CREATED: self._game_created,
+            GAME_EVOLVED: self._game_evolved,
+        }
+        if store.cursor_position() is None:
+            # The genesis is written by the constructor, not an event.
+            with store.db:
+                store._put_board(0, GENESIS_GENERATION[mode], 0, ACORN)
+                if mode == CREATOR:
+                    store.db.execute(
+                        'INSERT INTO games VALUES (0, ?, ?)', ('0', None))
+                store._set_cursor(0)
+
+    async def sync(self):
+        """Applies all pending events. Returns how many were applied."""
+        cursor = self.store.cursor_position()
+        events, next_cursor = await self.source.fetch(cursor)
+        # One transaction per batch, so a crash never half applies it.
+        with self.store.db:
+            for event in events:
+                handler = self.handlers.get(event.keys[0])
+                if handler is not None:
+                    handler(list(event.data))
+            self.store._set_cursor(next_cursor)
+        return len(events)
+
+    async def run(self, poll_interval=1.0):
+        """Follows the source until cancelled."""
+        while True:
+            await self.sync()
+            await asyncio.sleep(poll_interval)
+
+    def _generation_evolved(self, data):
+        user_id, gen_id, n_slots = data[:3]
+        rows = unpack_slots(data[3:3 + n_slots])
+        self.store._put_board(0, gen_id, user_id, rows)
+
+    def _life_given(self, data):
+        user_id, token_id, red_index, gen_id, row, col = data
+        rows = self.store.board(gen_id)
+        # The contract wraps the cell onto the board.
+        rows[row % DIM] |= 1 << (DIM - 1 - col % DIM)
+        self.store._put_board(0, gen_id, self.store.owner(gen_id), rows)
+        self.store.db.execute(
+            'INSERT OR REPLACE INTO redemptions VALUES (?, ?, ?, ?, ?, ?)',
+            (red_index, token_id, gen_id, row, col, str(user_id)))
+
+    def _game_created(self, data):
+        user_id, game_index, game_id, n_slots = data[:4]
+        rows = unpack_slots(data[4:4 + n_slots])
+        self.store._put_board(game_index, 0, user_id, rows)
+        self.store.db.execute(
+            'INSERT OR REPLACE INTO games VALUES (?, ?, ?)',
+            (game_index, str(user_id), str(game_id)))
+        self.store._add_credits(user_id, -CREDIT_REQUIREMENT)
+
+    def _game_evolved(self, data):
+        user_id, game_index, generation, n_slots = data[:4]
+        rows = unpack_slots(data[4:4 + n_slots])
+        self.store._put_board(game_index, generation, user_id, rows)
+        self.store._add_credits(user_id, 1)
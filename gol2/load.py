@@ -0,0 +1,258 @@
+"""Concurrent player load generator for the GoL2 contracts.
+
+Deploys both contracts on an in-process Starknet and runs N asyncio
+players against them. Each player draws actions from a weighted mix:
+
+    evolve      Infinite evolve_and_claim_next_generation
+    give_life   Infinite give_life_to_cell with a random owned token
+                (used tokens included, so double redemptions happen)
+    create      Creator create with a random board (needs 10 credits)
+    contribute  Creator contribute, mostly to the same few games
+    views       latest_useful_state and get_recently_created pages
+
+Players race for the same current generation and game indices. Every
+action is timed, and failed transactions are grouped by the assertion
+that rejected them. The report gives throughput, latency percentiles,
+failure rates and the Cairo steps of the successful actions:
+
+    python -m gol2.load --players 100 --actions 20
+    python -m gol2.load --mix evolve=1,give_life=3 --json report.json
+
+Players call the contracts directly with their user id as the caller
+address, as the tests do, rather than through Account contracts.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from collections import Counter, defaultdict
+
+from starkware.starknet.compiler.compile import compile_starknet_files
+from starkware.starknet.testing.starknet import Starknet
+
+from gol2.bench import random_board
+from gol2.client import FIELD_BOARDS, FIELD_OWNERS, FIELD_REDEMPTIONS
+from gol2.simulator import DIM
+
+INFINITE_SOURCE = 'contracts/GoL2_infinite.cairo'
+CREATOR_SOURCE = 'contracts/GoL2_creator.cairo'
+DEFAULT_MIX = {'evolve': 4, 'give_life': 3, 'create': 1, 'contribute': 4,
+    'views': 2}
+# Constructor history_interval: store every generation.
+STORE_ALL = 1
+# Most Creator games contributions are spread over (the hottest first).
+HOT_GAMES = 3
+FIRST_USER_ID = 1000
+PERCENTILES = (50, 90, 99)
+
+# Source snippets of the assertions a turn is expected to hit under
+# contention, and the name they are reported under.
+FAILURES = {
+    'assert_not_equal(stored, updated)': 'cell_already_alive',
+    'assert redeemed = 0': 'double_redemption',
+    'assert owner = user_id': 'not_token_owner',
+    'assert_le(CREDIT_REQUIREMENT, credits)': 'not_enough_credits',
+    'assert existing_index = 0': 'duplicate_game',
+}
+
+
+def parse_mix(text):
+    """Parses 'evolve=4,give_life=1' into a mix of action weights."""
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        if name not in DEFAULT_MIX:
+            raise ValueError(f'Unknown action {name!r}')
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def classify(error):
+    """Names the assertion a failed transaction was rejected by."""
+    message = str(error)
+    for snippet, name in FAILURES.items():
+        if snippet in message:
+            return name
+    return type(error).__name__
+
+
+def percentile(values, q):
+    """Nearest-rank percentile of a list of numbers (0 if empty)."""
+    if not values:
+        return 0
+    ordered = sorted(values)
+    rank = max(1, -(-q * len(ordered) // 100))
+    return ordered[int(rank) - 1]
+
+
+class LoadStats():
+    """Outcomes of the actions of every player, by action."""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.failures = defaultdict(Counter)
+        self.steps = Counter()
+
+    def record(self, action, latency, info=None, error=None):
+        self.latencies[action].append(latency)
+        if error is not None:
+            self.failures[action][classify(error)] += 1
+        elif info is not None:
+            self.steps[action] += info.call_info.cairo_usage.n_steps
+
+    def report(self, elapsed):
+        """Returns the summary as a dict (latencies in milliseconds)."""
+        actions = {}
+        for action, latencies in sorted(self.latencies.items()):
+            failed = sum(self.failures[action].values())
+            actions[action] = {
+                'count': len(latencies),
+                'failed': failed,
+                'failure_rate': failed / len(latencies),
+                'failures': dict(self.failures[action]),
+                'steps': self.steps[action],
+            }
+            for q in PERCENTILES:
+                actions[action][f'p{q}_ms'] = 1000 * percentile(latencies, q)
+        total = sum(len(latencies) for latencies in self.latencies.values())
+        return {
+            'elapsed_s': elapsed,
+            'actions': total,
+            'throughput_per_s': total / elapsed if elapsed else 0,
+            'steps': sum(self.steps.values()),
+            'by_action': actions,
+        }
+
+
+class Player():
+    """One simulated user, drawing actions from the mix."""
+
+    def __init__(self, user_id, infinite, creator, mix, rng, stats):
+        self.user_id = user_id
+        self.infinite = infinite
+        self.creator = creator
+        self.actions = list(mix)
+        self.weights = [mix[action] for action in self.actions]
+        self.rng = rng
+        self.stats = stats
+
+    async def run(self, n_actions):
+        for _ in range(n_actions):
+            action = self.rng.choices(self.actions, self.weights)[0]
+            await getattr(self, action)()
+            # Let the other players in between turns.
+            await asyncio.sleep(0)
+
+    async def timed(self, action, method, invoke=True):
+        start = time.perf_counter()
+        try:
+            if invoke:
+                info = await method.invoke(caller_address=self.user_id)
+            else:
+                info = await method.call(caller_address=self.user_id)
+        except Exception as error:
+            self.stats.record(action, time.perf_counter() - start,
+                error=error)
+            return None
+        self.stats.record(action, time.perf_counter() - start, info=info)
+        return info
+
+    async def evolve(self):
+        await self.timed('evolve',
+            self.infinite.evolve_and_claim_next_generation(self.user_id))
+
+    async def give_life(self):
+        response = await self.infinite.get_user_tokens(self.user_id).call()
+        tokens = response.result.token_ids
+        if not tokens:
+            # Earn a token first.
+            return await self.evolve()
+        token = self.rng.choice(tokens)
+        row, col = self.rng.randrange(DIM), self.rng.randrange(DIM)
+        await self.timed('give_life', self.infinite.give_life_to_cell(
+            self.user_id, row, col, token))
+
+    async def create(self):
+        board = random_board(0.3, seed=self.rng.randrange(2 ** 32))
+        await self.timed('create', self.creator.create(*board))
+
+    async def contribute(self):
+        response = await self.creator.newest_game().call()
+        newest = response.result.game_index
+        # Contributions pile onto the newest few games.
+        game_index = max(0, newest - self.rng.randrange(HOT_GAMES))
+        await self.timed('contribute', self.creator.contribute(game_index))
+
+    async def views(self):
+        fields = FIELD_BOARDS | FIELD_OWNERS | FIELD_REDEMPTIONS
+        await self.timed('views', self.infinite.latest_useful_state(0,
+            fields, 0, 3), invoke=False)
+        await self.timed('views', self.creator.get_recently_created(0,
+            FIELD_BOARDS | FIELD_OWNERS, 0, 5), invoke=False)
+
+
+async def run_load(n_players, n_actions, mix=None, seed=0):
+    """
+    Runs n_players concurrent players for n_actions actions each.
+
+    Returns
+    -------
+
+    dict report, see LoadStats.report.
+    """
+    mix = DEFAULT_MIX if mix is None else mix
+    starknet = await Starknet.empty()
+    infinite = await starknet.deploy(contract_def=compile_starknet_files(
+        [INFINITE_SOURCE], debug_info=True), constructor_calldata=[STORE_ALL])
+    creator = await starknet.deploy(contract_def=compile_starknet_files(
+        [CREATOR_SOURCE], debug_info=True), constructor_calldata=[STORE_ALL])
+    stats = LoadStats()
+    players = [Player(FIRST_USER_ID + i, infinite, creator, mix,
+        random.Random(seed * 1_000_003 + i), stats)
+        for i in range(n_players)]
+    start = time.perf_counter()
+    await asyncio.gather(*(player.run(n_actions) for player in players))
+    return stats.report(time.perf_counter() - start)
+
+
+def format_report(report):
+    lines = [f"{report['actions']} actions in {report['elapsed_s']:.1f}s "
+        f"({report['throughput_per_s']:.1f}/s), {report['steps']} steps"]
+    header = ['action', 'count', 'failed'] + [
+        f'p{q}_ms' for q in PERCENTILES] + ['steps']
+    lines.append(f'{header[0]:<12}' + ''.join(f'{h:>10}' for h in header[1:]))
+    for action, row in report['by_action'].items():
+        cells = [row['count'], row['failed']] + [
+            f"{row[f'p{q}_ms']:.0f}" for q in PERCENTILES] + [row['steps']]
+        lines.append(f'{action:<12}' + ''.join(f'{c:>10}' for c in cells))
+        for reason, count in sorted(row['failures'].items()):
+            lines.append(f'    {reason}: {count}')
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--players', type=int, default=20)
+    parser.add_argument('--actions', type=int, default=10,
+        help='Actions per player.')
+    parser.add_argument('--mix', type=parse_mix, default=None,
+        help='Action weights, e.g. evolve=4,give_life=1.')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help='Also write the report here.')
+    args = parser.parse_args(argv)
+
+    report = asyncio.get_event_loop().run_until_complete(
+        run_load(args.players, args.actions, args.mix, args.seed))
+    print(format_report(report))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+            f.write('\n')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
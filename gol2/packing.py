@@ -0,0 +1,157 @@
+"""Storage slot layout mirroring contracts/utils/packing.cairo.
+
+A generation is stored as SLOTS_PER_GEN felts. Slot k holds rows
+k * ROWS_PER_SLOT onwards, the first of those rows in the lowest 32 bits.
+The last slot holds 4 rows and, above them, the summary of the generation:
+the changed-row mask (bit i set if row i changed since the previous
+generation), then the population (number of live cells).
+
+Boards of other sizes (GoL2_sized.cairo) split their rows into words
+instead, see board_layout.
+"""
+
+from dataclasses import dataclass
+from functools import reduce
+
+from starkware.crypto.signature.fast_pedersen_hash import pedersen_hash
+
+DIM = 32
+ROWS_PER_SLOT = 7
+SLOTS_PER_GEN = 5
+ROW_SHIFT = 2 ** 32
+MASK_SHIFT = 2 ** 128
+POPULATION_SHIFT = 2 ** 160
+ALL_ROWS_CHANGED = 2 ** DIM - 1
+
+
+def rows_in_slot(slot_index):
+    """Returns how many rows a slot holds (the last slot holds the rest)."""
+    if slot_index == SLOTS_PER_GEN - 1:
+        return DIM - ROWS_PER_SLOT * (SLOTS_PER_GEN - 1)
+    return ROWS_PER_SLOT
+
+
+def pack_slots(rows, mask=ALL_ROWS_CHANGED):
+    """Packs DIM rows, their changed-row mask and population into the
+    SLOTS_PER_GEN felts stored on-chain."""
+    slots = _pack_rows(rows)
+    cells = sum(bin(slot).count('1') for slot in slots)
+    slots[-1] += mask * MASK_SHIFT + cells * POPULATION_SHIFT
+    return slots
+
+
+def _pack_rows(rows):
+    if len(rows) != DIM:
+        raise ValueError(f'Expected {DIM} rows, got {len(rows)}')
+    slots = []
+    for slot_index in range(SLOTS_PER_GEN):
+        start = slot_index * ROWS_PER_SLOT
+        packed = 0
+        for position in range(rows_in_slot(slot_index)):
+            packed += int(rows[start + position]) * ROW_SHIFT ** position
+        slots.append(packed)
+    return slots
+
+
+def unpack_slots(slots):
+    """Unpacks the felts of a stored generation into DIM rows."""
+    if len(slots) != SLOTS_PER_GEN:
+        raise ValueError(f'Expected {SLOTS_PER_GEN} slots, got {len(slots)}')
+    rows = []
+    for slot_index, packed in enumerate(slots):
+        for _ in range(rows_in_slot(slot_index)):
+            rows.append(packed % ROW_SHIFT)
+            packed //= ROW_SHIFT
+    return rows
+
+
+def changed_mask(slots):
+    """Returns the changed-row mask of a stored generation."""
+    return slots[-1] // MASK_SHIFT % ROW_SHIFT
+
+
+def population(slots):
+    """Returns the number of live cells of a stored generation."""
+    return slots[-1] // POPULATION_SHIFT
+
+
+def state_hash(rows):
+    """Returns the state hash the contracts index boards by: the hash
+    chain of the packed slots without the summary above the rows
+    (hash_generation in contracts/utils/hash_game.cairo)."""
+    return reduce(pedersen_hash, _pack_rows(rows), 0)
+
+
+# Sized boards (GoL2_sized.cairo): rows are split into words of up to
+# MAX_WORD_BITS columns, the first column of a word in its MSB.
+MAX_WORD_BITS = 250
+
+
+@dataclass(frozen=True)
+class BoardLayout():
+    """Word and slot sizes of a width x height board (board_layout in
+    contracts/utils/packing.cairo)."""
+    width: int
+    height: int
+    words_per_row: int
+    last_word_bits: int
+    word_shift: int
+    words_per_slot: int
+    slots_per_gen: int
+
+
+def board_layout(width, height):
+    """Returns the BoardLayout of a width x height board."""
+    full_words, rest = divmod(width - 1, MAX_WORD_BITS)
+    field_bits = width if full_words == 0 else MAX_WORD_BITS
+    words_per_slot = MAX_WORD_BITS // field_bits
+    n_words = height * (full_words + 1)
+    return BoardLayout(width, height, full_words + 1, rest + 1,
+        2 ** field_bits, words_per_slot, -(-n_words // words_per_slot))
+
+
+def split_row(row, width):
+    """Splits a row of width columns (column 0 in the MSB) into words."""
+    layout = board_layout(width, 1)
+    words = []
+    for word in range(layout.words_per_row):
+        bits = (layout.last_word_bits if word == layout.words_per_row - 1
+            else MAX_WORD_BITS)
+        width -= bits
+        words.append((int(row) >> width) % 2 ** bits)
+    return words
+
+
+def join_words(words, width):
+    """Joins the words of a row back into one integer."""
+    layout = board_layout(width, 1)
+    row = 0
+    for word in words[:-1]:
+        row = (row << MAX_WORD_BITS) + int(word)
+    return (row << layout.last_word_bits) + int(words[-1])
+
+
+def pack_words(words, layout):
+    """Packs the words of a sized generation into its slots."""
+    if len(words) != layout.height * layout.words_per_row:
+        raise ValueError(f'Expected {layout.height * layout.words_per_row} '
+            f'words, got {len(words)}')
+    slots = []
+    for start in range(0, len(words), layout.words_per_slot):
+        packed = 0
+        for position, word in enumerate(
+                words[start:start + layout.words_per_slot]):
+            packed += int(word) * layout.word_shift ** position
+        slots.append(packed)
+    return slots
+
+
+def unpack_words(slots, layout):
+    """Unpacks the slots of a sized generation into its words."""
+    n_words = layout.height * layout.words_per_row
+    words = []
+    for packed in slots:
+        for _ in range(min(layout.words_per_slot, n_words - len(words))):
+            words.append(packed % layout.word_shift)
+            packed //= layout.word_shift
+    return words
@@ -0,0 +1,422 @@
+"""Function-level step and builtin profiler for contract calls.
+
+Runs an external or view on an in-process Starknet and attributes the
+Cairo steps and builtin instances of the call to the Cairo functions that
+used them, from the trace of the Cairo VM:
+
+    steps        every step is counted for the function executing it
+                 (exclusive) and each function on the call stack
+                 (inclusive).
+    builtins     a function uses the range_check, pedersen and bitwise
+                 instances its implicit builtin pointers advance by,
+                 between its entry and its return. Exclusive usage leaves
+                 out the usage of the functions it calls.
+
+The call stacks are written in the folded format of flamegraph.pl (also
+read by speedscope and inferno), one line per stack:
+
+    __wrappers__.view_game;__main__.view_game;...unpack_slot 1234
+
+Profiles are saved as JSON, and two saved profiles can be diffed:
+
+    python -m gol2.profile infinite evolve_and_claim_next_generation \\
+        --history 30 --folded evolve.folded --save after.json
+    python -m gol2.profile --diff before.json after.json
+
+Contracts must be compiled with debug_info (as Starknet.deploy does for
+a source file) for pcs to be mapped to functions.
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+from starkware.cairo.common.cairo_function_runner import CairoFunctionRunner
+from starkware.cairo.lang.compiler.identifier_definition import (
+    StructDefinition)
+from starkware.cairo.lang.compiler.scoped_name import ScopedName
+from starkware.starknet.compiler.compile import compile_starknet_files
+from starkware.starknet.testing.starknet import Starknet
+
+from gol2.bench import (evolve_infinite, CREATOR_SOURCE, INFINITE_SOURCE,
+    STORE_ALL, USER_IDS)
+
+BUILTINS = ('range_check', 'pedersen', 'bitwise')
+# Per function: steps, then builtin instances.
+METRICS = ('steps',) + BUILTINS
+SOURCES = {'infinite': INFINITE_SOURCE, 'creator': CREATOR_SOURCE}
+DEFAULT_TOP = 25
+
+
+@contextmanager
+def capture_runners():
+    """Collects the CairoFunctionRunner of every contract run (the call
+    and any contract it calls) while the context is open."""
+    runners = []
+    run = CairoFunctionRunner.run_from_entrypoint
+
+    def recording_run(runner, *args, **kwargs):
+        runners.append(runner)
+        return run(runner, *args, **kwargs)
+
+    CairoFunctionRunner.run_from_entrypoint = recording_run
+    try:
+        yield runners
+    finally:
+        CairoFunctionRunner.run_from_entrypoint = run
+
+
+class Frame():
+    __slots__ = ('fp', 'function', 'entry', 'child_usage')
+
+    def __init__(self, fp, function, entry):
+        self.fp = fp
+        self.function = function
+        # {offset of implicit arg: builtin pointer} at entry.
+        self.entry = entry
+        self.child_usage = Counter()
+
+
+class CallProfile():
+    """
+    Steps and builtin usage per Cairo function of one or more runs.
+
+    Attributes
+    ----------
+
+    stacks : Counter
+        Steps per call stack, a tuple of function names (outermost first).
+        Direct recursion is folded into one frame.
+
+    inclusive, exclusive : {function: Counter of METRICS}
+    """
+
+    def __init__(self):
+        self.stacks = Counter()
+        self.inclusive = defaultdict(Counter)
+        self.exclusive = defaultdict(Counter)
+
+    @classmethod
+    def from_runners(cls, runners):
+        profile = cls()
+        for runner in runners:
+            profile.add_run(runner)
+        return profile
+
+    def add_run(self, runner):
+        """Adds the trace of a finished CairoFunctionRunner."""
+        program = runner.program
+        if program.debug_info is None:
+            raise ValueError('The contract was compiled without debug_info')
+        tracer = _RunTracer(runner)
+        trace = runner.vm.trace
+        stack = []
+        names = ()
+        for index, entry in enumerate(trace):
+            fp = entry.fp.offset
+            if not stack or fp > stack[-1].fp:
+                # A call (or the first step of the run).
+                function = tracer.function(entry.pc)
+                stack.append(Frame(fp, function, tracer.entry_pointers(
+                    function, entry.fp)))
+                names = _fold(names, function)
+            elif fp < stack[-1].fp:
+                # A return, ret was the previous step.
+                ret = trace[index - 1]
+                while stack[-1].fp > fp:
+                    self._close(tracer, stack, ret.ap)
+                names = _names(stack)
+            self.stacks[names] += 1
+            self.exclusive[stack[-1].function]['steps'] += 1
+            for function in set(names):
+                self.inclusive[function]['steps'] += 1
+        # The entry point frame ends the run.
+        while stack:
+            self._close(tracer, stack, trace[-1].ap)
+
+    def _close(self, tracer, stack, ap):
+        frame = stack.pop()
+        # Builtins the function does not take a pointer to (e.g., in the
+        # entry point wrappers) are only used by its callees.
+        usage = Counter(frame.child_usage)
+        for builtin, used in tracer.usage(frame, ap).items():
+            usage[builtin] = used
+        # A recursive call is already within the outermost frame.
+        outermost = all(f.function != frame.function for f in stack)
+        for builtin in BUILTINS:
+            if outermost:
+                self.inclusive[frame.function][builtin] += usage[builtin]
+            self.exclusive[frame.function][builtin] += (
+                usage[builtin] - frame.child_usage[builtin])
+        if stack:
+            stack[-1].child_usage.update(usage)
+
+    def total(self):
+        """Steps and builtin instances of the whole profile."""
+        total = Counter()
+        for usage in self.exclusive.values():
+            total.update(usage)
+        return total
+
+    def folded(self):
+        """Returns the call stacks in the folded flame graph format."""
+        return '\n'.join(f"{';'.join(stack)} {steps}"
+            for stack, steps in sorted(self.stacks.items())) + '\n'
+
+    def table(self, top=DEFAULT_TOP):
+        """Returns the top functions by exclusive steps as text."""
+        header = f"{'function':<60}" + ''.join(
+            f'{"self " + m:>18}{m:>14}' for m in METRICS)
+        lines = [header]
+        functions = sorted(self.exclusive, key=lambda f: (
+            -self.exclusive[f]['steps'], f))
+        for function in functions[:top]:
+            lines.append(f'{_short(function):<60}' + ''.join(
+                f'{self.exclusive[function][m]:>18}'
+                f'{self.inclusive[function][m]:>14}' for m in METRICS))
+        return '\n'.join(lines)
+
+    def to_json(self):
+        return {
+            'functions': {function: {
+                    'inclusive': {m: self.inclusive[function][m]
+                        for m in METRICS},
+                    'exclusive': {m: self.exclusive[function][m]
+                        for m in METRICS}}
+                for function in sorted(self.inclusive)},
+            'stacks': {';'.join(stack): steps
+                for stack, steps in sorted(self.stacks.items())},
+        }
+
+    @classmethod
+    def from_json(cls, data):
+        profile = cls()
+        for function, usage in data['functions'].items():
+            profile.inclusive[function].update(usage['inclusive'])
+            profile.exclusive[function].update(usage['exclusive'])
+        for stack, steps in data['stacks'].items():
+            profile.stacks[tuple(stack.split(';'))] = steps
+        return profile
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.to_json(), f, indent=2)
+            f.write('\n')
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls.from_json(json.load(f))
+
+
+def diff(before, after):
+    """
+    Compares two profiles.
+
+    Returns
+    -------
+
+    list of (function, {metric: (before, after)}) for every function whose
+    exclusive usage changed, largest step change first.
+    """
+    changes = []
+    for function in set(before.exclusive) | set(after.exclusive):
+        usage = {m: (before.exclusive[function][m],
+            after.exclusive[function][m]) for m in METRICS}
+        if any(old != new for old, new in usage.values()):
+            changes.append((function, usage))
+    changes.sort(key=lambda change: (-abs(
+        change[1]['steps'][1] - change[1]['steps'][0]), change[0]))
+    return changes
+
+
+def format_diff(changes, top=DEFAULT_TOP):
+    lines = [f"{'function':<60}" + ''.join(f'{m:>22}' for m in METRICS)]
+    for function, usage in changes[:top]:
+        cells = ''.join(f'{f"{old} -> {new}":>22}'
+            for old, new in (usage[m] for m in METRICS))
+        lines.append(f'{_short(function):<60}{cells}')
+    return '\n'.join(lines)
+
+
+async def profile_call(function_call, invoke=False, caller=0):
+    """
+    Runs a prepared contract call and profiles it.
+
+    Parameters
+    ----------
+
+    function_call : the result of calling a function of a StarknetContract,
+        e.g., game.view_game(5).
+
+    invoke : bool
+        Invoke (an external) rather than call (a view).
+
+    Returns
+    -------
+
+    (CallProfile, the call or invoke result).
+    """
+    with capture_runners() as runners:
+        if invoke:
+            result = await function_call.invoke(caller_address=caller)
+        else:
+            result = await function_call.call(caller_address=caller)
+    return CallProfile.from_runners(runners), result
+
+
+class _RunTracer():
+    """Function names and implicit builtin pointers of one run."""
+
+    def __init__(self, runner):
+        self.runner = runner
+        self.program = runner.program
+        self.locations = self.program.debug_info.instruction_locations
+        # Builtin segment index -> (name, memory cells per instance).
+        self.segments = {}
+        for name, builtin in runner.builtin_runners.items():
+            name = name.replace('_builtin', '')
+            if name in BUILTINS:
+                self.segments[builtin.base.segment_index] = (name,
+                    builtin.cells_per_instance)
+        self._functions = {}
+        self._layouts = {}
+
+    def function(self, pc):
+        offset = pc - self.runner.program_base
+        if offset not in self._functions:
+            location = self.locations.get(offset)
+            self._functions[offset] = ('<unknown>' if location is None
+                else str(location.accessible_scopes[-1]))
+        return self._functions[offset]
+
+    def layout(self, function):
+        """Returns (implicit arg offsets, args size, return size), or None
+        if the function has no argument structs (e.g., not a function)."""
+        if function not in self._layouts:
+            structs = []
+            for member in ('ImplicitArgs', 'Args', 'Return'):
+                try:
+                    struct = self.program.identifiers.get_by_full_name(
+                        ScopedName.from_string(function) + member)
+                except Exception:
+                    struct = None
+                structs.append(struct if isinstance(struct, StructDefinition)
+                    else None)
+            implicit, args, ret = structs
+            self._layouts[function] = None if None in structs else (
+                implicit.size, args.size, ret.size)
+        return self._layouts[function]
+
+    def entry_pointers(self, function, fp):
+        layout = self.layout(function)
+        if layout is None:
+            return None
+        implicit, args, _ = layout
+        first = fp - 2 - implicit - args
+        return self._pointers(first, implicit)
+
+    def usage(self, frame, ap):
+        """Builtin instances used by a frame, for the builtins it takes a
+        pointer to."""
+        usage = {}
+        if not frame.entry:
+            return usage
+        implicit, _, ret = self.layout(frame.function)
+        exit = self._pointers(ap - ret - implicit, implicit)
+        for offset, (name, cells, start) in frame.entry.items():
+            if offset in exit:
+                usage[name] = (exit[offset][2] - start) // cells
+        return usage
+
+    def _pointers(self, first, count):
+        pointers = {}
+        memory = self.runner.vm_memory
+        for offset in range(count):
+            value = memory.get(first + offset)
+            segment = getattr(value, 'segment_index', None)
+            if segment in self.segments:
+                name, cells = self.segments[segment]
+                pointers[offset] = (name, cells, value.offset)
+        return pointers
+
+
+def _fold(names, function):
+    if names and names[-1] == function:
+        return names
+    return names + (function,)
+
+
+def _names(stack):
+    names = ()
+    for frame in stack:
+        names = _fold(names, frame.function)
+    return names
+
+
+def _short(function):
+    for prefix in ('__main__.', 'contracts.utils.', 'starkware.cairo.common.'):
+        if function.startswith(prefix):
+            return function[len(prefix):]
+    return function
+
+
+async def profile_scenario(contract, function, args, history=0):
+    """Deploys a contract (storing every generation), evolves the history
+    and profiles one call of a function with args."""
+    starknet = await Starknet.empty()
+    contract_def = compile_starknet_files([SOURCES[contract]],
+        debug_info=True)
+    game = await starknet.deploy(contract_def=contract_def,
+        constructor_calldata=[STORE_ALL])
+    user = USER_IDS[0]
+    if contract == 'infinite':
+        await evolve_infinite(game, history, user)
+    else:
+        for _ in range(history):
+            await game.contribute(0).invoke(caller_address=user)
+    abi = {entry['name']: entry for entry in contract_def.abi}
+    invoke = abi[function].get('stateMutability') != 'view'
+    profile, _ = await profile_call(getattr(game, function)(*args),
+        invoke=invoke, caller=user)
+    return profile
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('contract', nargs='?', choices=sorted(SOURCES))
+    parser.add_argument('function', nargs='?')
+    parser.add_argument('--args', type=int, nargs='*', default=None,
+        help=f'Calldata (default: the user id {USER_IDS[0]}).')
+    parser.add_argument('--history', type=int, default=0,
+        help='Generations to evolve before the call.')
+    parser.add_argument('--folded', help='Write the folded call stacks.')
+    parser.add_argument('--save', help='Write the profile as JSON.')
+    parser.add_argument('--diff', nargs=2, metavar=('BEFORE', 'AFTER'),
+        help='Compare two saved profiles instead of running a call.')
+    parser.add_argument('--top', type=int, default=DEFAULT_TOP)
+    args = parser.parse_args(argv)
+
+    if args.diff:
+        before, after = (CallProfile.load(path) for path in args.diff)
+        print(format_diff(diff(before, after), args.top))
+        return 0
+    if args.function is None:
+        parser.error('contract and function are required without --diff')
+    calldata = [USER_IDS[0]] if args.args is None else args.args
+    profile = asyncio.get_event_loop().run_until_complete(profile_scenario(
+        args.contract, args.function, calldata, args.history))
+    print(profile.table(args.top))
+    if args.folded:
+        with open(args.folded, 'w') as f:
+            f.write(profile.folded())
+    if args.save:
+        profile.save(args.save)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
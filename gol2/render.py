@@ -0,0 +1,379 @@
+"""Renders ranges of generations as images and animations.
+
+Boards are turned into pixels a batch at a time: the packed rows of N
+boards are unpacked into bits, scaled up and laid out in one numpy
+operation, with no per-cell Python. Frames are then written out as they
+are rendered, so a clip of any length is never held in memory:
+
+    png     one PNG file per generation in a directory
+    gif     an animated GIF
+    apng    an animated PNG
+    rgb     raw 8-bit RGB frames back to back (e.g., for
+            ffmpeg -f rawvideo -pix_fmt rgb24 -s WxH -i clip.rgb)
+
+Several boards of the same generation (e.g., Creator games) can be drawn
+side by side in a grid. Only zlib from the standard library is used. GIF
+frames are written without LZW compression (a clear code every 125
+pixels keeps codes at one byte), trading file size for speed; use apng or
+png where size matters.
+
+    python -m gol2.render archives/infinite --generations 1 200 \\
+        --format gif --out acorn.gif
+    python -m gol2.render archives/game_1 archives/game_2 --columns 2 \\
+        --format apng --out games.png
+"""
+
+import argparse
+import os
+import struct
+import sys
+import zlib
+
+import numpy as np
+
+from gol2.archive import read_boards
+from gol2.simulator import DIM, evolve
+
+FORMATS = ('png', 'gif', 'apng', 'rgb')
+# Dead, alive and the lines between the boards of a grid.
+PALETTE = np.array([(255, 255, 255), (0, 0, 0), (160, 160, 160)],
+    dtype=np.uint8)
+DEAD, ALIVE, GAP = 0, 1, 2
+DEFAULT_SCALE = 4
+DEFAULT_DELAY = 100
+# Frames rendered at once.
+BATCH = 256
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+# GIF codes, for 8 bit codes (min code size 7).
+GIF_CODE_SIZE = 7
+GIF_CLEAR = 2 ** GIF_CODE_SIZE
+GIF_END = GIF_CLEAR + 1
+# Data codes per clear code: the table then stays below 2**8 - 1 entries,
+# so that no decoder widens the codes.
+GIF_RUN = 2 ** GIF_CODE_SIZE - 3
+
+
+def frame_size(games=1, columns=1, scale=DEFAULT_SCALE, gap=1):
+    """(width, height) in pixels of the frames of a grid of games."""
+    rows = -(-games // columns)
+    columns = min(columns, games)
+    return (columns * DIM * scale + (columns - 1) * gap,
+        rows * DIM * scale + (rows - 1) * gap)
+
+
+def pixels(boards, scale=DEFAULT_SCALE, columns=1, gap=1):
+    """
+    Expands packed boards into palette indices.
+
+    Parameters
+    ----------
+
+    boards : array of uint32, shape (N, DIM), or (N, games, DIM) for a
+        grid of games.
+
+    scale : int
+        Pixels per cell side.
+
+    columns : int
+        Boards per row of the grid.
+
+    Returns
+    -------
+
+    array of uint8, shape (N, height, width): DEAD, ALIVE or GAP.
+    """
+    boards = np.asarray(boards, dtype=np.uint32)
+    if boards.ndim == 2:
+        boards = boards[:, None]
+    n, games = boards.shape[:2]
+    # Big-endian bytes unpack with column 0 first.
+    cells = np.unpackbits(boards.astype('>u4').view(np.uint8), axis=-1)
+    cells = cells.reshape(n, games, DIM, DIM)
+    if scale > 1:
+        cells = cells.repeat(scale, axis=2).repeat(scale, axis=3)
+    side = DIM * scale
+    width, height = frame_size(games, columns, scale, gap)
+    frames = np.full((n, height, width), GAP, dtype=np.uint8)
+    for game in range(games):
+        top = game // columns * (side + gap)
+        left = game % columns * (side + gap)
+        frames[:, top:top + side, left:left + side] = cells[:, game]
+    return frames
+
+
+def rgb(frames, palette=PALETTE):
+    """Palette indices to (..., 3) uint8 colours."""
+    return palette[frames]
+
+
+def png_chunk(kind, data):
+    return (struct.pack('>I', len(data)) + kind + data +
+        struct.pack('>I', zlib.crc32(kind + data)))
+
+
+def png_header(width, height, palette):
+    # 8-bit palette colour, no interlace.
+    return (png_chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 3,
+        0, 0, 0)) + png_chunk(b'PLTE', palette.tobytes()))
+
+
+def png_data(frame):
+    """zlib stream of one frame of palette indices, filter 0 per line."""
+    lines = np.zeros((frame.shape[0], frame.shape[1] + 1), dtype=np.uint8)
+    lines[:, 1:] = frame
+    return zlib.compress(lines.tobytes(), 6)
+
+
+class FrameWriter():
+    """Base of the writers: write() batches of frames, then close()."""
+
+    def __init__(self, path, width, height, palette=PALETTE):
+        self.path = path
+        self.width = width
+        self.height = height
+        self.palette = palette
+        self.frames = 0
+
+    def write(self, frames):
+        for frame in frames:
+            self._write_frame(frame)
+            self.frames += 1
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class PngWriter(FrameWriter):
+    """One PNG per frame, named with the frame number (first_frame on)."""
+
+    def __init__(self, path, width, height, palette=PALETTE, first_frame=0):
+        super().__init__(path, width, height, palette)
+        os.makedirs(path, exist_ok=True)
+        self.first_frame = first_frame
+
+    def _write_frame(self, frame):
+        name = os.path.join(self.path,
+            f'{self.first_frame + self.frames:06d}.png')
+        with open(name, 'wb') as f:
+            f.write(PNG_SIGNATURE + png_header(self.width, self.height,
+                self.palette) + png_chunk(b'IDAT', png_data(frame)) +
+                png_chunk(b'IEND', b''))
+
+
+class ApngWriter(FrameWriter):
+    """
+    An animated PNG. The frame count, unknown until close(), is written
+    into the acTL chunk then.
+    """
+
+    def __init__(self, path, width, height, palette=PALETTE,
+            delay=DEFAULT_DELAY):
+        super().__init__(path, width, height, palette)
+        self.delay = delay
+        self.sequence = 0
+        self.file = open(path, 'wb')
+        self.file.write(PNG_SIGNATURE + png_header(width, height, palette))
+        self.actl = self.file.tell()
+        # Frame count and loops (0, forever).
+        self.file.write(png_chunk(b'acTL', struct.pack('>II', 0, 0)))
+
+    def _write_frame(self, frame):
+        control = struct.pack('>IIIIIHHBB', self.sequence, self.width,
+            self.height, 0, 0, self.delay, 1000, 0, 0)
+        self.file.write(png_chunk(b'fcTL', control))
+        self.sequence += 1
+        data = png_data(frame)
+        if self.frames == 0:
+            # The first frame is also the default image.
+            self.file.write(png_chunk(b'IDAT', data))
+        else:
+            self.file.write(png_chunk(b'fdAT', struct.pack('>I',
+                self.sequence) + data))
+            self.sequence += 1
+
+    def close(self):
+        if self.file.closed:
+            return
+        self.file.write(png_chunk(b'IEND', b''))
+        self.file.seek(self.actl)
+        self.file.write(png_chunk(b'acTL', struct.pack('>II', self.frames,
+            0)))
+        self.file.close()
+
+
+class GifWriter(FrameWriter):
+    """An animated GIF, looping forever."""
+
+    def __init__(self, path, width, height, palette=PALETTE,
+            delay=DEFAULT_DELAY):
+        super().__init__(path, width, height, palette)
+        self.delay = delay
+        table = np.zeros((2 ** GIF_CODE_SIZE, 3), dtype=np.uint8)
+        table[:len(palette)] = palette
+        self.file = open(path, 'wb')
+        # Global colour table of 2**7 entries, then the looping extension.
+        self.file.write(b'GIF89a' + struct.pack('<HHBBB', width, height,
+            0xF0 | (GIF_CODE_SIZE - 1), 0, 0) + table.tobytes() +
+            b'\x21\xFF\x0BNETSCAPE2.0\x03\x01\x00\x00\x00')
+
+    def _write_frame(self, frame):
+        # Delay in hundredths of a second.
+        self.file.write(b'\x21\xF9\x04\x04' + struct.pack('<H',
+            max(self.delay // 10, 1)) + b'\x00\x00')
+        self.file.write(b'\x2C' + struct.pack('<HHHHB', 0, 0, self.width,
+            self.height, 0) + bytes([GIF_CODE_SIZE]))
+        self.file.write(self._sub_blocks(self._codes(frame)))
+        self.file.write(b'\x00')
+
+    @staticmethod
+    def _codes(frame):
+        # A clear code before every GIF_RUN pixels, then the end code.
+        flat = frame.reshape(-1)
+        runs = -(-len(flat) // GIF_RUN)
+        data = np.zeros(runs * GIF_RUN, dtype=np.uint8)
+        data[:len(flat)] = flat
+        codes = np.empty((runs, GIF_RUN + 1), dtype=np.uint8)
+        codes[:, 0] = GIF_CLEAR
+        codes[:, 1:] = data.reshape(runs, GIF_RUN)
+        # The padding of the last run is cut.
+        return np.append(codes.reshape(-1)[:runs + len(flat)],
+            np.uint8(GIF_END))
+
+    @staticmethod
+    def _sub_blocks(data):
+        # Blocks of up to 255 bytes, each after its length.
+        full = len(data) // 255
+        blocks = np.empty((full, 256), dtype=np.uint8)
+        blocks[:, 0] = 255
+        blocks[:, 1:] = data[:full * 255].reshape(full, 255)
+        rest = data[full * 255:]
+        tail = bytes([len(rest)]) + rest.tobytes() if len(rest) else b''
+        return blocks.tobytes() + tail
+
+    def close(self):
+        if not self.file.closed:
+            self.file.write(b'\x3B')
+            self.file.close()
+
+
+class RgbWriter(FrameWriter):
+    """Raw RGB frames, height * width * 3 bytes each."""
+
+    def __init__(self, path, width, height, palette=PALETTE):
+        super().__init__(path, width, height, palette)
+        self.file = open(path, 'wb')
+
+    def write(self, frames):
+        self.file.write(rgb(frames, self.palette).tobytes())
+        self.frames += len(frames)
+
+    def close(self):
+        self.file.close()
+
+
+WRITERS = {'png': PngWriter, 'gif': GifWriter, 'apng': ApngWriter,
+    'rgb': RgbWriter}
+
+
+def writer(format, path, width, height, palette=PALETTE,
+        delay=DEFAULT_DELAY):
+    if format not in WRITERS:
+        raise ValueError(f'Unknown format {format}, expected one of '
+            f'{", ".join(FORMATS)}')
+    if format in ('gif', 'apng'):
+        return WRITERS[format](path, width, height, palette, delay)
+    return WRITERS[format](path, width, height, palette)
+
+
+def render(batches, path, format='gif', games=1, columns=1,
+        scale=DEFAULT_SCALE, delay=DEFAULT_DELAY, palette=PALETTE):
+    """
+    Renders batches of boards to a file (or, for png, a directory).
+
+    Parameters
+    ----------
+
+    batches : iterable of arrays of shape (N, DIM), or (N, games, DIM)
+        Consecutive frames, e.g., from archive_batches() or
+        evolve_batches(). Each batch is rendered and written before the
+        next is taken.
+
+    Returns
+    -------
+
+    int frames written.
+    """
+    width, height = frame_size(games, columns, scale)
+    with writer(format, path, width, height, palette, delay) as out:
+        for boards in batches:
+            out.write(pixels(boards, scale, columns))
+        return out.frames
+
+
+def evolve_batches(board, generations, batch=BATCH):
+    """The board and the generations after it, in batches."""
+    board = np.asarray(board, dtype=np.uint32)
+    frames = [board]
+    for _ in range(generations):
+        board = evolve(board)
+        frames.append(board)
+        if len(frames) == batch:
+            yield np.array(frames)
+            frames = []
+    if frames:
+        yield np.array(frames)
+
+
+def archive_batches(directories, first, stop, batch=BATCH):
+    """
+    Boards first to stop (exclusive) of one or more archives, in batches.
+
+    With several archives each frame is a grid row of games, of shape
+    (N, games, DIM). A game that ends before stop keeps its last board.
+    """
+    histories = [read_boards(directory) for directory in directories]
+    for start in range(first, stop, batch):
+        generations = np.arange(start, min(start + batch, stop))
+        frames = []
+        for genesis, boards in histories:
+            if len(boards) == 0 or start < genesis:
+                raise ValueError(f'No board of generation {start}')
+            index = np.minimum(generations - genesis, len(boards) - 1)
+            frames.append(np.asarray(boards[index]))
+        if len(directories) == 1:
+            yield frames[0]
+        else:
+            yield np.stack(frames, axis=1)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('archives', nargs='+',
+        help='Archive directories, one per board of the grid.')
+    parser.add_argument('--generations', nargs=2, type=int, required=True,
+        metavar=('FIRST', 'STOP'))
+    parser.add_argument('--format', choices=FORMATS, default='gif')
+    parser.add_argument('--out', required=True)
+    parser.add_argument('--scale', type=int, default=DEFAULT_SCALE)
+    parser.add_argument('--columns', type=int, default=1)
+    parser.add_argument('--delay', type=int, default=DEFAULT_DELAY,
+        help='Milliseconds per frame (gif, apng).')
+    args = parser.parse_args(argv)
+
+    first, stop = args.generations
+    frames = render(archive_batches(args.archives, first, stop), args.out,
+        args.format, len(args.archives), args.columns, args.scale,
+        args.delay)
+    print(f'{frames} frames written to {args.out}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,260 @@
+"""Incremental analytics over the indexed history of a game contract.
+
+A Rollup keeps the aggregates the dashboards show in a few arrays:
+
+    heatmap             per game, how many generations each cell was
+                        alive in, (DIM, DIM)
+    population          per game, live cells of every generation
+    generations_owned   generations owned (Infinite owner_of_generation)
+                        or contributed (Creator), per user
+    games_created       Creator games per user (game_index_from_inventory)
+    credits             Creator credits per user (has_credits): one per
+                        contributed generation, CREDIT_REQUIREMENT spent
+                        per game created
+    placements          Infinite give_life cells, (DIM, DIM)
+    token_ages          Infinite give_life count by generations between
+                        the mint of the token and its use
+
+update(store) folds in what an IndexStore (gol2/indexer.py) holds beyond
+what was already rolled up, so its cost follows the new data. Boards are
+summed as packed rows: a popcount of each row gives the population and
+the bit-planes of a batch of boards summed column by column give the
+heatmap, without unpacking to cells one board at a time.
+
+An Infinite generation can still be edited by give_life while it is the
+head, so the head is only rolled up once the game has moved past it.
+
+With a path, save() writes a checkpoint (numpy .npz, replaced atomically)
+that a new Rollup resumes from:
+
+    rollup = Rollup('rollup.npz', INFINITE)
+    rollup.update(store)
+    rollup.save()
+"""
+
+import os
+from collections import Counter
+
+import numpy as np
+
+from gol2.indexer import (CREATOR, CREDIT_REQUIREMENT, GENESIS_GENERATION,
+    INFINITE)
+from gol2.simulator import DIM
+
+CHECKPOINT_VERSION = 1
+# Generations read from the store and summed at once.
+BATCH = 4096
+
+
+def popcount(rows):
+    """Live cells of each row of a uint32 array (SWAR bit count)."""
+    rows = np.asarray(rows, dtype=np.uint32)
+    rows = rows - ((rows >> 1) & np.uint32(0x55555555))
+    rows = (rows & np.uint32(0x33333333)) + (
+        (rows >> 2) & np.uint32(0x33333333))
+    rows = (rows + (rows >> 4)) & np.uint32(0x0F0F0F0F)
+    return (rows * np.uint32(0x01010101)) >> 24
+
+
+def bit_planes(boards):
+    """
+    Sums a batch of boards cell by cell.
+
+    Parameters
+    ----------
+
+    boards : array of uint32, shape (N, DIM)
+
+    Returns
+    -------
+
+    array of int64, shape (DIM, DIM): in how many boards each cell is
+    alive, column 0 first.
+    """
+    boards = np.asarray(boards, dtype=np.uint32).reshape(-1, DIM)
+    # Big-endian bytes put column 0 in the first bit unpacked.
+    planes = np.unpackbits(boards.astype('>u4').view(np.uint8), axis=1)
+    return planes.sum(axis=0, dtype=np.int64).reshape(DIM, DIM)
+
+
+class Rollup():
+    """
+    Aggregates of one contract, updated from an IndexStore.
+
+    Parameters
+    ----------
+
+    path : str, optional
+        Checkpoint file, loaded if it exists.
+
+    mode : str
+        INFINITE or CREATOR, the contract the store indexes.
+    """
+
+    def __init__(self, path=None, mode=INFINITE):
+        if mode not in GENESIS_GENERATION:
+            raise ValueError(f'Unknown mode {mode}')
+        self.path = path
+        self.mode = mode
+        # {game_index: ...}
+        self.heatmaps = {}
+        self.populations = {}
+        self.generations_owned = Counter()
+        self.games_created = Counter()
+        self.placements = np.zeros((DIM, DIM), dtype=np.int64)
+        self.token_ages = np.zeros(0, dtype=np.int64)
+        self.redemption_count = 0
+        self.game_count = 0
+        if path is not None and os.path.exists(path):
+            self._load()
+
+    def next_generation(self, game_index=0):
+        """The first generation of a game not rolled up yet."""
+        return GENESIS_GENERATION[self.mode] + len(
+            self.populations.get(game_index, ()))
+
+    def heatmap(self, game_index=0):
+        return self.heatmaps.get(game_index,
+            np.zeros((DIM, DIM), dtype=np.int64))
+
+    def population(self, game_index=0):
+        """Live cells per generation, the genesis first."""
+        return self.populations.get(game_index, np.zeros(0, dtype=np.int64))
+
+    def credits(self):
+        """Creator credits per user, as has_credits holds them."""
+        credits = Counter(self.generations_owned)
+        for user, games in self.games_created.items():
+            credits[user] -= CREDIT_REQUIREMENT * games
+        return credits
+
+    def update(self, store):
+        """
+        Rolls up everything new in an IndexStore.
+
+        Returns
+        -------
+
+        int generations, games and redemptions added.
+        """
+        added = 0
+        for game_index, head in sorted(store.heads().items()):
+            # The Infinite head may still be edited.
+            last = head - 1 if self.mode == INFINITE else head
+            first = self.next_generation(game_index)
+            for start in range(first, last + 1, BATCH):
+                rows = store.generations(game_index, start,
+                    min(start + BATCH - 1, last))
+                if not rows or rows[-1][0] != start + len(rows) - 1:
+                    raise ValueError(f'Game {game_index} is missing '
+                        f'generations from {start} in the store')
+                self.add_generations(game_index, start,
+                    [r[2] for r in rows], [r[1] for r in rows])
+                added += len(rows)
+        if self.mode == CREATOR:
+            for game_index, owner in store.games(self.game_count):
+                self.add_game(game_index, owner)
+                added += 1
+        else:
+            redemptions = store.redemptions(self.redemption_count)
+            self.add_redemptions(redemptions)
+            added += len(redemptions)
+        return added
+
+    def add_generations(self, game_index, first, boards, owners):
+        """Adds consecutive generations of a game, starting at
+        next_generation(game_index)."""
+        if first != self.next_generation(game_index):
+            raise ValueError(f'Expected generation '
+                f'{self.next_generation(game_index)}, got {first}')
+        boards = np.asarray(boards, dtype=np.uint32).reshape(-1, DIM)
+        self.heatmaps[game_index] = self.heatmap(game_index) + bit_planes(
+            boards)
+        self.populations[game_index] = np.concatenate([
+            self.population(game_index),
+            popcount(boards).sum(axis=1, dtype=np.int64)])
+        genesis = GENESIS_GENERATION[self.mode]
+        for generation, owner in enumerate(owners, first):
+            # The genesis is written by the constructor, not a user.
+            if generation != genesis:
+                self.generations_owned[owner] += 1
+
+    def add_game(self, game_index, owner):
+        """Adds a Creator game, in game index order."""
+        if game_index != self.game_count:
+            raise ValueError(f'Expected game {self.game_count}, '
+                f'got {game_index}')
+        self.game_count += 1
+        # Game 0 is created by the constructor.
+        if game_index != 0:
+            self.games_created[owner] += 1
+
+    def add_redemptions(self, redemptions):
+        """Adds (index, token_id, generation, row, col, owner) tuples, in
+        redemption index order."""
+        if not redemptions:
+            return
+        records = np.array([r[:5] for r in redemptions], dtype=np.int64)
+        if records[0, 0] != self.redemption_count:
+            raise ValueError(f'Expected redemption {self.redemption_count}, '
+                f'got {records[0, 0]}')
+        # give_life wraps the cell onto the board.
+        np.add.at(self.placements, (records[:, 3] % DIM, records[:, 4] % DIM),
+            1)
+        ages = np.bincount(records[:, 2] - records[:, 1])
+        size = max(len(ages), len(self.token_ages))
+        self.token_ages = np.pad(self.token_ages, (0,
+            size - len(self.token_ages))) + np.pad(ages, (0, size - len(ages)))
+        self.redemption_count += len(records)
+
+    def save(self):
+        """Writes the checkpoint to path."""
+        if self.path is None:
+            raise ValueError('The rollup has no checkpoint path')
+        games = sorted(self.populations)
+        arrays = {
+            'version': np.array([CHECKPOINT_VERSION]),
+            'mode': np.array([self.mode]),
+            'games': np.array(games, dtype=np.int64),
+            'lengths': np.array([len(self.populations[g]) for g in games],
+                dtype=np.int64),
+            'heatmaps': np.array([self.heatmaps[g] for g in games],
+                dtype=np.int64).reshape(-1, DIM, DIM),
+            'populations': np.concatenate([self.populations[g]
+                for g in games] + [np.zeros(0, dtype=np.int64)]),
+            'placements': self.placements,
+            'token_ages': self.token_ages,
+            'counts': np.array([self.redemption_count, self.game_count]),
+        }
+        for name in ('generations_owned', 'games_created'):
+            counter = getattr(self, name)
+            # Felts do not fit int64, users are kept as decimal text.
+            arrays[name + '_users'] = np.array([str(u) for u in counter],
+                dtype=str)
+            arrays[name + '_counts'] = np.array(list(counter.values()),
+                dtype=np.int64)
+        temporary = self.path + '.tmp'
+        with open(temporary, 'wb') as f:
+            np.savez(f, **arrays)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, self.path)
+
+    def _load(self):
+        with np.load(self.path) as data:
+            if data['version'][0] != CHECKPOINT_VERSION:
+                raise ValueError(f'{self.path}: unknown checkpoint version')
+            if data['mode'][0] != self.mode:
+                raise ValueError(f'{self.path}: a {data["mode"][0]} rollup')
+            ends = np.cumsum(data['lengths'])
+            for i, game_index in enumerate(data['games']):
+                self.heatmaps[int(game_index)] = data['heatmaps'][i]
+                self.populations[int(game_index)] = data['populations'][
+                    ends[i] - data['lengths'][i]:ends[i]]
+            self.placements = data['placements']
+            self.token_ages = data['token_ages']
+            self.redemption_count, self.game_count = (int(c)
+                for c in data['counts'])
+            for name in ('generations_owned', 'games_created'):
+                setattr(self, name, Counter({int(u): int(c) for u, c in zip(
+                    data[name + '_users'], data[name + '_counts'])}))
@@ -0,0 +1,352 @@
+"""Pattern search over archived generation history.
+
+Finds every place a pattern (a glider, a blinker, a seeded shape) occurs
+in a range of generations of one or more games, at any torus offset and
+in any of its rotations and reflections. Histories are read from archives
+(gol2/archive.py), where the boards of a game are one uint32 array:
+
+    matches = search({0: 'archives/infinite'}, PATTERNS['glider'],
+        margin=1, workers=8)
+    for game, generation, row, col, orientation in matches: ...
+
+A batch of boards is compared with the pattern as a whole. Each row is
+rotated by every column offset at once, giving an array of shape
+(boards, offsets, rows), and each pattern row is compared against it
+rolled by the row offset, so no Python loop runs per board or per cell.
+Games and generation ranges are split into chunks, searched by a pool of
+processes that each map the archive files themselves.
+
+A match is the bounding box of the pattern, live and dead cells alike.
+With margin=1 the cells around the box must be dead too, so that e.g. a
+blinker is not matched inside a larger shape. row and col are the top
+left cell of the box, orientation the index given by orientations().
+
+build_index() stores, per generation, which of the 512 3x3 neighbourhoods
+occur on the board (64 bytes). Every 3x3 window inside the pattern box
+must occur on a board that contains the pattern, so search(use_index=True)
+only compares the boards that have them all. Patterns less than 3 cells
+high or wide (with the margin) have no such window and are not filtered.
+"""
+
+import argparse
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from gol2.archive import read_boards
+from gol2.simulator import DIM, ROW_MASK, to_cells
+
+MATCH_DTYPE = np.dtype([
+    ('game', '<i8'),
+    ('generation', '<i8'),
+    ('row', 'u1'),
+    ('col', 'u1'),
+    ('orientation', 'u1'),
+])
+# Generations per search task.
+DEFAULT_CHUNK = 4096
+# Boards compared at once, (BATCH, DIM, DIM) words.
+BATCH = 512
+INDEX_FILE = 'features.npy'
+WINDOW = 3
+INDEX_BYTES = 2 ** (WINDOW * WINDOW) // 8
+
+PATTERNS = {
+    'block': ['OO', 'OO'],
+    'blinker': ['OOO'],
+    'glider': ['.O.', '..O', 'OOO'],
+    'beehive': ['.OO.', 'O..O', '.OO.'],
+}
+
+
+def parse_pattern(lines):
+    """Returns cells (a 0/1 array) from lines of 'O' (alive) and '.'."""
+    if isinstance(lines, str):
+        lines = lines.strip().split('\n')
+    width = max(len(line) for line in lines)
+    return np.array([[char == 'O' for char in line.ljust(width, '.')]
+        for line in lines], dtype=np.uint8)
+
+
+def orientations(cells):
+    """
+    The distinct rotations and reflections of a pattern.
+
+    Returns
+    -------
+
+    list of (orientation, cells): orientation is the number of quarter
+    turns anticlockwise, plus 4 if the pattern is first mirrored.
+    """
+    if isinstance(cells, (str, list)):
+        cells = parse_pattern(cells)
+    cells = np.asarray(cells, dtype=np.uint8)
+    if cells.ndim != 2 or max(cells.shape) > DIM:
+        raise ValueError(f'A pattern is at most {DIM}x{DIM} cells')
+    found = []
+    for mirrored in (False, True):
+        base = cells[:, ::-1] if mirrored else cells
+        for turns in range(4):
+            shape = np.rot90(base, turns)
+            if not any(np.array_equal(shape, other) for _, other in found):
+                found.append((4 * mirrored + turns, shape))
+    return found
+
+
+class Pattern():
+    """
+    A pattern prepared for matching: the rows of each orientation, with
+    the margin of dead cells added.
+    """
+
+    def __init__(self, cells, margin=0):
+        if margin not in (0, 1):
+            raise ValueError('margin must be 0 or 1')
+        self.margin = margin
+        self.shapes = []
+        for orientation, shape in orientations(cells):
+            shape = np.pad(shape, margin)
+            height, width = shape.shape
+            if height > DIM or width > DIM:
+                raise ValueError(f'The pattern and margin exceed {DIM} cells')
+            # Column 0 in the most significant of width bits.
+            weights = 2 ** np.arange(width - 1, -1, -1, dtype=np.uint64)
+            rows = (shape.astype(np.uint64) * weights).sum(axis=1)
+            self.shapes.append((orientation, width, rows,
+                _windows(shape)))
+
+    def required(self):
+        """Per orientation, the packed 3x3 windows a board must have."""
+        return [windows for _, _, _, windows in self.shapes]
+
+
+def _windows(cells):
+    # The packed set of the 3x3 windows inside a block of cells.
+    present = np.zeros(2 ** (WINDOW * WINDOW), dtype=bool)
+    height, width = cells.shape
+    for row in range(height - WINDOW + 1):
+        for col in range(width - WINDOW + 1):
+            window = cells[row:row + WINDOW, col:col + WINDOW]
+            present[_window_code(window)] = True
+    return np.packbits(present)
+
+
+def _window_code(window):
+    weights = 2 ** np.arange(WINDOW * WINDOW).reshape(WINDOW, WINDOW)
+    return int((window * weights).sum())
+
+
+def features(boards):
+    """
+    The 3x3 windows that occur on each board, edges wrapped.
+
+    Parameters
+    ----------
+
+    boards : array of uint32, shape (N, DIM)
+
+    Returns
+    -------
+
+    array of uint8, shape (N, INDEX_BYTES): bit k (numpy.packbits order)
+    is set if window code k occurs.
+    """
+    cells = to_cells(np.asarray(boards).reshape(-1, DIM))
+    codes = np.zeros(cells.shape, dtype=np.uint16)
+    for dy in range(WINDOW):
+        for dx in range(WINDOW):
+            shifted = np.roll(cells, (-dy, -dx), axis=(1, 2))
+            codes |= shifted.astype(np.uint16) << (WINDOW * dy + dx)
+    present = np.zeros((len(cells), 2 ** (WINDOW * WINDOW)), dtype=bool)
+    present[np.arange(len(cells))[:, None],
+        codes.reshape(len(cells), -1)] = True
+    return np.packbits(present, axis=1)
+
+
+def build_index(directory, chunk=DEFAULT_CHUNK):
+    """
+    Writes (or extends) the feature index of an archive.
+
+    Returns
+    -------
+
+    int generations indexed.
+    """
+    _, boards = read_boards(directory)
+    path = os.path.join(directory, INDEX_FILE)
+    index = np.load(path) if os.path.exists(path) else np.zeros(
+        (0, INDEX_BYTES), dtype=np.uint8)
+    if len(index) > len(boards):
+        raise ValueError(f'{path} indexes more generations than the archive')
+    parts = [index] + [features(boards[start:start + chunk])
+        for start in range(len(index), len(boards), chunk)]
+    index = np.concatenate(parts)
+    np.save(path, index)
+    return len(index)
+
+
+def candidates(index, pattern):
+    """Mask of the indexed boards that have every window of the pattern
+    in at least one orientation."""
+    found = np.zeros(len(index), dtype=bool)
+    for required in pattern.required():
+        found |= ((index & required) == required).all(axis=1)
+    return found
+
+
+def find(boards, pattern, first_generation=0, game=0, margin=0):
+    """
+    Finds a pattern on a batch of boards.
+
+    Parameters
+    ----------
+
+    boards : array of uint32, shape (N, DIM)
+        Consecutive generations, the first being first_generation.
+
+    pattern : Pattern, or cells for Pattern(cells, margin).
+
+    Returns
+    -------
+
+    array of MATCH_DTYPE, by generation then row, col and orientation.
+    """
+    if not isinstance(pattern, Pattern):
+        pattern = Pattern(pattern, margin)
+    boards = np.asarray(boards).reshape(-1, DIM)
+    return _find(boards, np.arange(len(boards)) + first_generation,
+        pattern, game)
+
+
+def _find(boards, generations, pattern, game):
+    matches = []
+    offsets = np.arange(DIM, dtype=np.uint64)
+    for start in range(0, len(boards), BATCH):
+        rows = np.asarray(boards[start:start + BATCH], dtype=np.uint64)
+        # rotated[n, c, r]: row r of board n with column c moved to 0.
+        rotated = ((rows[:, None, :] << offsets[None, :, None]) | (
+            rows[:, None, :] >> (DIM - offsets)[None, :, None])) & ROW_MASK
+        for orientation, width, shape_rows, _ in pattern.shapes:
+            left = rotated >> np.uint64(DIM - width)
+            hit = left == shape_rows[0]
+            for i in range(1, len(shape_rows)):
+                if not hit.any():
+                    break
+                hit &= np.roll(left, -i, axis=2) == shape_rows[i]
+            board, col, row = np.nonzero(hit)
+            found = np.zeros(len(board), dtype=MATCH_DTYPE)
+            found['game'] = game
+            found['generation'] = generations[start + board]
+            found['row'] = (row + pattern.margin) % DIM
+            found['col'] = (col + pattern.margin) % DIM
+            found['orientation'] = orientation
+            matches.append(found)
+    return _sorted(matches)
+
+
+def _sorted(matches):
+    if not matches:
+        return np.zeros(0, dtype=MATCH_DTYPE)
+    matches = np.concatenate(matches)
+    return matches[np.argsort(matches, order=('game', 'generation', 'row',
+        'col', 'orientation'), kind='stable')]
+
+
+def _search_chunk(directory, game, start, stop, pattern, use_index):
+    # Runs in a worker process: maps the archive, compares one chunk.
+    first, boards = read_boards(directory)
+    boards = boards[start - first:stop - first]
+    generations = np.arange(start, stop)
+    if use_index:
+        index = np.load(os.path.join(directory, INDEX_FILE), mmap_mode='r')
+        keep = candidates(index[start - first:stop - first], pattern)
+        boards, generations = boards[keep], generations[keep]
+    return _find(boards, generations, pattern, game)
+
+
+def search(sources, pattern, generations=None, margin=0, workers=None,
+        use_index=False, chunk=DEFAULT_CHUNK):
+    """
+    Finds a pattern in the archived history of several games.
+
+    Parameters
+    ----------
+
+    sources : {game: archive directory}
+
+    pattern : cells, lines (see parse_pattern) or Pattern.
+
+    generations : (first, stop), optional
+        Half-open range of generations searched in every game. All if
+        omitted.
+
+    workers : int, optional
+        Processes in the pool (the number of CPUs if omitted). With 1 the
+        search runs in this process.
+
+    use_index : bool
+        Skip boards by the feature index (see build_index), which must
+        cover the range.
+
+    Returns
+    -------
+
+    array of MATCH_DTYPE, by game, generation, row, col and orientation.
+    """
+    if not isinstance(pattern, Pattern):
+        pattern = Pattern(pattern, margin)
+    tasks = []
+    for game, directory in sorted(sources.items()):
+        first, boards = read_boards(directory)
+        stop = first + len(boards)
+        if use_index:
+            indexed = len(np.load(os.path.join(directory, INDEX_FILE),
+                mmap_mode='r'))
+            if indexed < len(boards):
+                raise ValueError(f'{directory}: index covers {indexed} of '
+                    f'{len(boards)} generations, run build_index')
+        low, high = (first, stop) if generations is None else generations
+        low, high = max(low, first), min(high, stop)
+        for start in range(low, high, chunk):
+            tasks.append((directory, game, start, min(start + chunk, high),
+                pattern, use_index))
+    if workers == 1 or len(tasks) <= 1:
+        return _sorted([_search_chunk(*task) for task in tasks])
+    with ProcessPoolExecutor(workers) as pool:
+        futures = [pool.submit(_search_chunk, *task) for task in tasks]
+        return _sorted([future.result() for future in futures])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('archives', nargs='+',
+        help='GAME=DIRECTORY, e.g. 0=archives/infinite.')
+    parser.add_argument('--pattern', default='glider',
+        help=f'One of {", ".join(PATTERNS)}, or rows such as .O./..O/OOO')
+    parser.add_argument('--generations', nargs=2, type=int,
+        metavar=('FIRST', 'STOP'))
+    parser.add_argument('--margin', type=int, default=1)
+    parser.add_argument('--workers', type=int)
+    parser.add_argument('--index', action='store_true',
+        help='Build or extend the feature indices, then use them.')
+    args = parser.parse_args(argv)
+
+    sources = {}
+    for archive in args.archives:
+        game, directory = archive.split('=', 1)
+        sources[int(game)] = directory
+    cells = PATTERNS.get(args.pattern) or args.pattern.split('/')
+    if args.index:
+        for directory in sources.values():
+            build_index(directory)
+    matches = search(sources, cells, args.generations, args.margin,
+        args.workers, args.index)
+    for match in matches:
+        print(*match)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,184 @@
+"""Pipelined sender of signed transactions through an Account contract.
+
+Each transaction is an Account ``execute`` of one or more calls (a
+multicall) under a single signature, e.g. ``give_life_to_cell`` and
+``evolve_and_claim_next_generation`` together. The nonce of the account
+is read from the contract once and then counted locally, so sending does
+not wait on a ``get_nonce`` read. Transactions are queued and sent in
+nonce order by one worker. If a transaction fails because the local
+nonce is out of step with the account (e.g. another sender used the
+account), the nonce is read again and the transaction is re-signed and
+sent once more.
+
+    sender = Sender(account, private_key)
+    info = await sender.send([Call(game.contract_address,
+        'evolve_and_claim_next_generation', [user])])
+    futures = [sender.submit(calls) for calls in batches]
+    await asyncio.gather(*futures)
+    await sender.close()
+"""
+
+import asyncio
+from dataclasses import dataclass
+from typing import Tuple
+
+from starkware.cairo.common.hash_state import compute_hash_on_elements
+from starkware.crypto.signature.signature import private_to_stark_key, sign
+from starkware.starknet.public.abi import get_selector_from_name
+
+
+@dataclass(frozen=True)
+class Call():
+    """One call of a multicall transaction."""
+    to: int
+    selector_name: str
+    calldata: Tuple[int, ...] = ()
+
+
+def to_call_array(calls):
+    """
+    Encodes calls as the arguments of Account.execute.
+
+    Returns
+    -------
+
+    (call_array, calldata): call_array holds (to, selector, data_offset,
+    data_len) for each call, calldata is the calldata of every call
+    concatenated.
+    """
+    call_array, calldata = [], []
+    for call in calls:
+        call_array.append((call.to, get_selector_from_name(
+            call.selector_name), len(calldata), len(call.calldata)))
+        calldata.extend(call.calldata)
+    return call_array, calldata
+
+
+def hash_multicall(sender, call_array, calldata, nonce):
+    """The message hash Account.execute checks the signature against."""
+    flat_calls = [felt for call in call_array for felt in call]
+    return compute_hash_on_elements([
+        sender,
+        compute_hash_on_elements(flat_calls),
+        compute_hash_on_elements(calldata),
+        nonce])
+
+
+class NonceManager():
+    """Next nonce of each account, read once and then counted locally."""
+
+    def __init__(self):
+        self.next_nonce = {}
+
+    async def reserve(self, account):
+        """Returns the next nonce of an account and counts it as used."""
+        address = account.contract_address
+        if address not in self.next_nonce:
+            await self.resync(account)
+        nonce = self.next_nonce[address]
+        self.next_nonce[address] = nonce + 1
+        return nonce
+
+    def release(self, account, nonce):
+        """Returns a nonce that was not used (its transaction failed
+        without reaching the account), if it was the last reserved."""
+        address = account.contract_address
+        if self.next_nonce.get(address) == nonce + 1:
+            self.next_nonce[address] = nonce
+
+    async def resync(self, account):
+        """Reads the nonce of an account from the contract."""
+        response = await account.get_nonce().call()
+        self.next_nonce[account.contract_address] = response.result.res
+        return response.result.res
+
+
+class Sender():
+    """
+    Signs and sends multicall transactions for one account.
+
+    Parameters
+    ----------
+
+    account : deployed Account contract.
+
+    private_key : int
+        Key of the public key the account was deployed with.
+
+    nonces : NonceManager, optional
+        Shared between senders of the same accounts.
+    """
+
+    def __init__(self, account, private_key, nonces=None):
+        self.account = account
+        self.private_key = private_key
+        self.public_key = private_to_stark_key(private_key)
+        self.nonces = NonceManager() if nonces is None else nonces
+        self.queue = asyncio.Queue()
+        self.worker = None
+        self.sent = 0
+        self.resyncs = 0
+
+    def sign(self, calls, nonce):
+        call_array, calldata = to_call_array(calls)
+        message_hash = hash_multicall(self.account.contract_address,
+            call_array, calldata, nonce)
+        signature = sign(msg_hash=message_hash, priv_key=self.private_key)
+        return call_array, calldata, list(signature)
+
+    def submit(self, calls):
+        """Queues a transaction of one or more calls. Returns a future of
+        its execution info."""
+        if self.worker is None:
+            self.worker = asyncio.ensure_future(self._run())
+        future = asyncio.get_event_loop().create_future()
+        self.queue.put_nowait((list(calls), future))
+        return future
+
+    async def send(self, calls):
+        """Sends a transaction of one or more calls, after the ones
+        already queued."""
+        return await self.submit(calls)
+
+    async def close(self):
+        """Waits for the queued transactions and stops the worker."""
+        if self.worker is None:
+            return
+        await self.queue.join()
+        self.worker.cancel()
+        self.worker = None
+
+    async def _run(self):
+        while True:
+            calls, future = await self.queue.get()
+            try:
+                future.set_result(await self._execute(calls))
+            except Exception as error:
+                future.set_exception(error)
+            finally:
+                self.queue.task_done()
+
+    async def _execute(self, calls):
+        nonce = await self.nonces.reserve(self.account)
+        try:
+            return await self._invoke(calls, nonce)
+        except Exception:
+            current = await self.nonces.resync(self.account)
+            if current == nonce:
+                # The nonce was right, the calls themselves failed.
+                raise
+        # A nonce gap: sign again for the nonce of the account.
+        self.resyncs += 1
+        nonce = await self.nonces.reserve(self.account)
+        try:
+            return await self._invoke(calls, nonce)
+        except Exception:
+            self.nonces.release(self.account, nonce)
+            raise
+
+    async def _invoke(self, calls, nonce):
+        call_array, calldata, signature = self.sign(calls, nonce)
+        info = await self.account.execute(call_array, calldata,
+            nonce).invoke(signature=signature)
+        self.sent += 1
+        return info
@@ -0,0 +1,211 @@
+"""Bit-packed Game of Life engine mirroring contracts/utils/life_rules.cairo.
+
+Boards use the contract representation: DIM rows, each a 32-bit integer
+with column 0 in the most significant bit. Edges wrap in both directions.
+A board is a uint32 array of shape (DIM,), a batch of boards has shape
+(N, DIM). Every function accepts either.
+
+Boards of other sizes (GoL2_sized.cairo) pass width= and height=. A row
+is then one integer of width bits, held as uint64 up to 64 columns and as
+Python integers beyond that, so that one operation still covers a row.
+"""
+
+import numpy as np
+
+from gol2.packing import join_words
+
+DIM = 32
+ROW_MASK = 2 ** DIM - 1
+
+
+def row_dtype(width):
+    """The array type that holds a row of width columns."""
+    if width <= 32:
+        return np.uint32
+    if width <= 64:
+        return np.uint64
+    return object
+
+
+def as_board(rows, width=DIM, height=DIM):
+    """Returns rows (a view_game result, list, or array) in the array type
+    of their width."""
+    dtype = row_dtype(width)
+    if dtype is object:
+        board = np.array(rows, dtype=object)
+        board = np.vectorize(int, otypes=[object])(board)
+        too_wide = (board >= 2 ** width) | (board < 0)
+    else:
+        board = np.asarray(rows, dtype=np.uint64)
+        too_wide = board > 2 ** width - 1
+    if board.shape[-1] != height:
+        raise ValueError(f'Expected {height} rows, got {board.shape[-1]}')
+    if too_wide.any():
+        raise ValueError(f'Rows must fit in {width} bits')
+    return board.astype(dtype)
+
+
+def evolve(board, generations=1, width=DIM, height=DIM):
+    """
+    Advances one or many boards by a number of generations.
+
+    Follows the packed engine in life_rules.cairo: each row is summed
+    horizontally with a full adder into two bit-planes, then the planes of
+    the rows above, at and below are added into a 3x3 block count (mod 8).
+    A block count of 3 gives life, a count of 4 keeps the cell as it was.
+
+    Parameters
+    ----------
+
+    board : array of uint32, shape (DIM,) or (N, DIM)
+
+    generations : int
+
+    width, height : int, optional
+        Size of the board, for boards other than 32x32.
+
+    Returns
+    -------
+
+    array of uint32 with the same shape as board.
+    """
+    board = as_board(board, width, height)
+    for _ in range(generations):
+        board = _step(board, width)
+    return board
+
+
+def _step(rows, width=DIM):
+    dtype = row_dtype(width)
+    mask = 2 ** width - 1 if dtype is object else dtype(2 ** width - 1)
+    one = 1 if dtype is object else dtype(1)
+    top = width - 1 if dtype is object else dtype(width - 1)
+    # Column 0 is the MSB, so its left neighbour (the last column) is bit 0.
+    left = (rows >> one) | ((rows & one) << top)
+    right = ((rows << one) & mask) | (rows >> top)
+    # Horizontal full adder: (left + centre + right) as two bit-planes.
+    partial = left ^ rows
+    low = partial ^ right
+    high_a = left & rows
+    high_b = partial & right
+    # The two carries never overlap, so OR is the sum.
+    high = high_a | high_b
+
+    # Vertical sum of three 2-bit numbers, keeping bits 0-2 of the count.
+    up_low = np.roll(low, 1, axis=-1)
+    down_low = np.roll(low, -1, axis=-1)
+    up_high = np.roll(high, 1, axis=-1)
+    down_high = np.roll(high, -1, axis=-1)
+
+    partial = up_low ^ low
+    s0 = partial ^ down_low
+    carry = (up_low & low) | (partial & down_low)
+    partial = up_high ^ high
+    twos = partial ^ down_high
+    fours = (up_high & high) | (partial & down_high)
+    s1 = twos ^ carry
+    s2 = fours ^ (twos & carry)
+
+    three = s0 & s1 & ~s2
+    four = s2 & ~s0 & ~s1
+    return three | (four & rows)
+
+
+def to_cells(board, width=DIM, height=DIM):
+    """Unpacks rows into a (..., height, width) array of 0/1, column 0
+    first."""
+    board = as_board(board, width, height)
+    if row_dtype(width) is object:
+        shifts = np.arange(width - 1, -1, -1).astype(object)
+        cells = (board[..., None] >> shifts) & 1
+    else:
+        dtype = row_dtype(width)
+        shifts = np.arange(width - 1, -1, -1, dtype=dtype)
+        cells = (board[..., None] >> shifts) & dtype(1)
+    return cells.astype(np.uint8)
+
+
+def from_cells(cells):
+    """Packs a (..., height, width) array of 0/1 cells into rows."""
+    width = np.shape(cells)[-1]
+    dtype = row_dtype(width)
+    if dtype is object:
+        cells = np.asarray(cells).astype(object)
+        weights = np.array([2 ** bit for bit in range(width - 1, -1, -1)],
+            dtype=object)
+        return (cells * weights).sum(axis=-1)
+    cells = np.asarray(cells, dtype=np.uint64)
+    weights = 2 ** np.arange(width - 1, -1, -1, dtype=np.uint64)
+    return (cells * weights).sum(axis=-1).astype(dtype)
+
+
+def population(board, width=DIM, height=DIM):
+    """Returns the number of live cells on each board."""
+    return to_cells(board, width, height).sum(axis=(-2, -1))
+
+
+def render(board, width=DIM, height=DIM, alive='■ ', dead='. '):
+    """Draws one board as text, a line per row."""
+    cells = to_cells(board, width, height)
+    return '\n'.join(''.join(alive if cell else dead for cell in row)
+        for row in cells)
+
+
+async def fetch_board(contract, *view_args):
+    """Reads a board with view_game. Pass (gen_id) for Infinite and
+    (game_index, gen) for Creator."""
+    response = await contract.view_game(*view_args).call()
+    return as_board(response.result)
+
+
+async def fetch_sized_board(contract, gen_id):
+    """Reads a board of GoL2_sized.
+
+    Returns
+    -------
+
+    (board, width, height): the words of each row are joined into one
+    row integer, as expected by evolve(board, width=width, height=height).
+    """
+    dims = (await contract.get_dimensions().call()).result
+    words = (await contract.view_game(gen_id).call()).result.rows
+    rows = [join_words(words[row * dims.words_per_row:
+        (row + 1) * dims.words_per_row], dims.width)
+        for row in range(dims.height)]
+    return as_board(rows, dims.width, dims.height), dims.width, dims.height
+
+
+async def check_conformance(contract, first_gen, last_gen, game_index=None):
+    """
+    Replays stored generations against the simulator.
+
+    Each generation from first_gen to last_gen - 1 is read with view_game,
+    evolved once and compared with the stored next generation.
+
+    Parameters
+    ----------
+
+    contract : deployed GoL2_infinite or GoL2_creator contract.
+
+    first_gen, last_gen : int
+        Inclusive range of generations to read.
+
+    game_index : int, optional
+        Required for Creator, omitted for Infinite.
+
+    Returns
+    -------
+
+    list of generation ids whose stored state differs from the prediction.
+    In Infinite mode a generation where a player gave life differs by the
+    revived cell, these can be matched against get_user_tokens.
+    """
+    prefix = () if game_index is None else (game_index,)
+    mismatches = []
+    previous = await fetch_board(contract, *prefix, first_gen)
+    for gen in range(first_gen + 1, last_gen + 1):
+        stored = await fetch_board(contract, *prefix, gen)
+        if not np.array_equal(evolve(previous), stored):
+            mismatches.append(gen)
+        previous = stored
+    return mismatches
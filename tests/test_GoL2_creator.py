@@ -4,6 +4,7 @@ import pytest
 import asyncio
 from starkware.starknet.testing.starknet import Starknet
 from utils.Signer import Signer
+from gol2.simulator import render
 
 NUM_SIGNING_ACCOUNTS = 2
 DUMMY_PRIVATE = 12345678987654321
@@ -11,6 +12,8 @@ signers = []
 
 # Game constants
 DIM = 32
+# Constructor history_interval: store every generation.
+STORE_ALL = 1
 
 @pytest.fixture(scope='module')
 def event_loop():
@@ -53,7 +56,8 @@ async def account_factory():
 async def game_factory(account_factory):
     starknet, accounts = account_factory
     # Deploy
-    game = await starknet.deploy("contracts/GoL2_creator.cairo")
+    game = await starknet.deploy("contracts/GoL2_creator.cairo",
+        constructor_calldata=[STORE_ALL])
 
     return starknet, game, accounts
 
@@ -68,14 +72,12 @@ async def test_create(game_factory):
     (first_game_index, first_game_id, newest_gen) = response.result
 
     N_CONTRIB = 10
-    for i in range(N_CONTRIB):
-        print(f'Done with {i}')
-
-        await signers[0].send_transaction(
-            account=accounts[0],
-            to=game.contract_address,
-            selector_name='contribute',
-            calldata=[first_game_index])
+    # One transaction contributes all ten generations.
+    await signers[0].send_transaction(
+        account=accounts[0],
+        to=game.contract_address,
+        selector_name='contribute_to_games',
+        calldata=[N_CONTRIB] + [first_game_index] * N_CONTRIB)
 
     # Make sure credits were given.
     response = await game.user_counts(
@@ -91,6 +93,14 @@ async def test_create(game_factory):
     row_states[13] = 8
     row_states[14] = 103
 
+    # Rows are packed several to a storage slot, so must fit the board.
+    with pytest.raises(Exception) as e_info:
+        await signers[0].send_transaction(
+            account=accounts[0],
+            to=game.contract_address,
+            selector_name='create',
+            calldata=row_states[:31] + [2**32])
+
     await signers[0].send_transaction(
         account=accounts[0],
         to=game.contract_address,
@@ -109,6 +119,7 @@ async def test_create(game_factory):
     assert index == first_game_index + 1
     response = await game.view_game(index, 0).call()
     (im) = response.result
+    assert list(im) == row_states
     view([im])
     print('Above is the newly created game')
 
@@ -120,8 +131,10 @@ async def test_create(game_factory):
     print('Above is the first game after being progressed 10 times.')
 
     # Test harvesting functions
-    recent_games = await game.get_recently_created(0).call()
-    recent_generations = await game.get_recent_generations_of_game(0).call()
+    # Every field, five games or generations per page.
+    recent_games = await game.get_recently_created(0, 15, 0, 5).call()
+    recent_generations = await game.get_recent_generations_of_game(0, 15,
+        0, 5).call()
     user_data = await game.get_user_data(accounts[0].contract_address, 0).call()
 
     print(recent_games.result)
@@ -180,13 +193,58 @@ async def test_getter(game_factory):
     await view(states)
 
 
+@pytest.mark.asyncio
+async def test_contribute_generations(game_factory):
+    _, game, accounts = game_factory
+    gens = 3
+    response = await game.generation_of_game(0).call()
+    prev_gen = response.result.generation
+    response = await game.user_counts(accounts[1].contract_address).call()
+    prev_credits = response.result.credit_count
+
+    await signers[1].send_transaction(
+        account=accounts[1],
+        to=game.contract_address,
+        selector_name='contribute_generations',
+        calldata=[0, gens])
+
+    # One credit and one stored generation per generation evolved.
+    response = await game.generation_of_game(0).call()
+    assert response.result.generation == prev_gen + gens
+    response = await game.user_counts(accounts[1].contract_address).call()
+    assert response.result.credit_count == prev_credits + gens
+    for gen in range(prev_gen + 1, prev_gen + gens + 1):
+        response = await game.view_game(0, gen).call()
+        assert any(response.result)
+
+
+@pytest.mark.asyncio
+async def test_contribute_to_games(game_factory):
+    _, game, accounts = game_factory
+    # Game 1 was created in test_create. Repeats evolve a game again.
+    game_indices = [0, 1, 1, 0, 0]
+    prev_gens = {}
+    for game_index in (0, 1):
+        response = await game.generation_of_game(game_index).call()
+        prev_gens[game_index] = response.result.generation
+    response = await game.user_counts(accounts[1].contract_address).call()
+    prev_credits = response.result.credit_count
+
+    await signers[1].send_transaction(
+        account=accounts[1],
+        to=game.contract_address,
+        selector_name='contribute_to_games',
+        calldata=[len(game_indices)] + game_indices)
+
+    response = await game.user_counts(accounts[1].contract_address).call()
+    assert response.result.credit_count == prev_credits + len(game_indices)
+    for game_index in (0, 1):
+        response = await game.generation_of_game(game_index).call()
+        assert response.result.generation == (prev_gens[game_index] +
+            game_indices.count(game_index))
+
+
 async def view(images):
-    # For an even grid appearance:
-    # .replace('1','■ ').replace('0','. ')
     for index, image in enumerate(images):
         print(f"image_{index}:")
-        [
-            print(format(image[row], '#034b').replace('0b','')
-            .replace('1','■ ').replace('0','. '))
-            for row in range(DIM)
-        ]
+        print(render(image))
@@ -4,6 +4,7 @@ import pytest
 import asyncio
 from starkware.starknet.testing.starknet import Starknet
 from utils.Signer import Signer
+from gol2.simulator import render
 
 NUM_SIGNING_ACCOUNTS = 2
 DUMMY_PRIVATE = 12345678987654321
@@ -14,6 +15,8 @@ USER_IDS = [76543, 23456, 12345, 78787, 94321, 36576] * 6
 
 # Game constants
 DIM = 32
+# Constructor history_interval: store every generation.
+STORE_ALL = 1
 
 @pytest.fixture(scope='module')
 def event_loop():
@@ -56,7 +59,8 @@ async def account_factory():
 async def game_factory(account_factory):
     starknet, accounts = account_factory
     # Deploy
-    game = await starknet.deploy("contracts/GoL2_infinite.cairo")
+    game = await starknet.deploy("contracts/GoL2_infinite.cairo",
+        constructor_calldata=[STORE_ALL])
     return starknet, game, accounts
 
 @pytest.mark.asyncio
@@ -79,7 +83,7 @@ async def test_game_flow(game_factory):
     prev_id = first_id
     for turn in range(turns):
         res = await game.evolve_and_claim_next_generation(
-            USER_IDS[turn]).invoke()
+            USER_IDS[turn]).invoke(caller_address=USER_IDS[turn])
         print(f"execution info step count for turn {turn} is: ")
         print(res.call_info.cairo_usage.n_steps)
 
@@ -91,13 +95,17 @@ async def test_game_flow(game_factory):
         assert id == prev_id + gens_per_turn
         prev_id = id
 
+    # Acorn after one generation (rows 13-15, see usage_infinite.md).
+    assert images[1][12:16] == (0, 118, 6, 2)
+
     # For an even grid appearance:
     # .replace('1','■ ').replace('0','. ')
     for index, image in enumerate(images):
         print(f"image_{index}:")
         await display(image)
 
-    (info) = await game.latest_useful_state(0).call()
+    # Boards, owners and redemptions for the three latest generations.
+    (info) = await game.latest_useful_state(0, 7, 0, 3).call()
     # TODO - add some checks on the two elements below (images, info)
     #print('images', images)
     #print('info', info)
@@ -131,12 +139,16 @@ async def test_game_flow(game_factory):
     for i in range(0, len(requested_states), 32):
         game = requested_states[i:i + 32]
         states.append(game)
-    await display(states)
+    for state in states:
+        await display(state)
 
 
 @pytest.mark.asyncio
 async def test_give_life(game_factory):
-    _, game, _  = game_factory
+    starknet, _, _  = game_factory
+    # Use a fresh game so the checks below start from the acorn.
+    game = await starknet.deploy("contracts/GoL2_infinite.cairo",
+        constructor_calldata=[STORE_ALL])
     # Starts at acorn (ID 1), gives life, checks state of modified cell.
     alter_row = 5
     alter_col = 5
@@ -150,12 +162,14 @@ async def test_give_life(game_factory):
 
     with pytest.raises(Exception) as e_info:
         await game.give_life_to_cell(USER_IDS[0], alter_row,
-        alter_col, invalid_token_id).invoke()
+        alter_col, invalid_token_id).invoke(
+            caller_address=USER_IDS[0])
     print(f"Passed: Correctly fails when the claimer is not the owner.")
 
     # First make the player have a turn
     await game.evolve_and_claim_next_generation(
-            USER_IDS[0]).invoke()
+            USER_IDS[0]).invoke(
+            caller_address=USER_IDS[0])
 
     already_alive_row=13
     already_alive_col=30
@@ -168,13 +182,15 @@ async def test_give_life(game_factory):
 
     with pytest.raises(Exception) as e_info:
         await game.give_life_to_cell(USER_IDS[0], already_alive_row,
-        already_alive_col, user_token_id).invoke()
+        already_alive_col, user_token_id).invoke(
+            caller_address=USER_IDS[0])
     print(f"Passed: Correctly fails when cell is already alive.")
 
 
 
     await game.give_life_to_cell(USER_IDS[0], alter_row,
-        alter_col, user_token_id).invoke()
+        alter_col, user_token_id).invoke(
+            caller_address=USER_IDS[0])
 
 
     response = await game.current_generation_id().call()
@@ -190,7 +206,8 @@ async def test_give_life(game_factory):
 
     with pytest.raises(Exception) as e_info:
         await game.give_life_to_cell(USER_IDS[0], 4,
-            4, user_token_id).invoke()
+            4, user_token_id).invoke(
+            caller_address=USER_IDS[0])
     print('Passed: Token cannot be redeemed twice')
 
     response = await game.get_user_tokens(USER_IDS[0]).call()
@@ -203,13 +220,48 @@ async def test_give_life(game_factory):
     ]
 
 
+@pytest.mark.asyncio
+async def test_multi_generation_turn(game_factory):
+    starknet, _, _ = game_factory
+    # One game evolves three generations in one turn, the other in three.
+    batched = await starknet.deploy("contracts/GoL2_infinite.cairo",
+        constructor_calldata=[STORE_ALL])
+    single = await starknet.deploy("contracts/GoL2_infinite.cairo",
+        constructor_calldata=[STORE_ALL])
+    user = USER_IDS[1]
+    gens = 3
+
+    await batched.evolve_and_claim_generations(user, gens).invoke(
+        caller_address=user)
+    for _ in range(gens):
+        await single.evolve_and_claim_next_generation(user).invoke(
+            caller_address=user)
+
+    response = await batched.current_generation_id().call()
+    assert response.result.gen_id == 1 + gens
+    for gen_id in range(2, 2 + gens):
+        batched_image = (await batched.view_game(gen_id).call()).result
+        single_image = (await single.view_game(gen_id).call()).result
+        assert batched_image == single_image
+        # Each generation is a token owned by the user.
+        response = await batched.get_token_data(gen_id).call()
+        assert response.result.owner == user
+
+    response = await batched.get_user_tokens(user).call()
+    assert response.result.token_ids == list(range(2, 2 + gens))
+
+    with pytest.raises(Exception) as e_info:
+        await batched.evolve_and_claim_generations(user, 0).invoke(
+            caller_address=user)
+    with pytest.raises(Exception) as e_info:
+        await batched.evolve_and_claim_generations(user, 11).invoke(
+            caller_address=user)
+    print('Passed: Generations per turn are bounded')
+
+
 async def display(image):
     print('')
-    [
-        print(format(image[row], '#034b').replace('0b','')
-        .replace('1','■ ').replace('0','. '))
-        for row in range(DIM)
-    ]
+    print(render(image))
     return
 
 '''
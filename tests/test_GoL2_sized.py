@@ -0,0 +1,96 @@
+import pytest
+import asyncio
+import numpy as np
+from starkware.starknet.testing.starknet import Starknet
+from gol2.packing import board_layout, split_row
+from gol2.simulator import evolve, fetch_sized_board, from_cells
+
+# Temporary user_ids to bypass account verification
+USER_IDS = [76543, 23456]
+
+# A glider heading down-right (columns grow to the right).
+GLIDER = [[0, 1, 0], [0, 0, 1], [1, 1, 1]]
+
+
+def genesis_board(width, height, top, left):
+    """A glider at (top, left) on an empty board, as row integers. It
+    wraps the edges if it does not fit."""
+    cells = np.zeros((height, width), dtype=np.uint8)
+    cells[:3, :3] = GLIDER
+    return list(from_cells(np.roll(cells, (top, left), axis=(0, 1))))
+
+
+def genesis_words(rows, width):
+    return [word for row in rows for word in split_row(row, width)]
+
+
+@pytest.fixture(scope='module')
+def event_loop():
+    return asyncio.new_event_loop()
+
+@pytest.fixture(scope='module')
+async def starknet_factory():
+    starknet = await Starknet.empty()
+    return starknet
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('width, height, top, left', [
+    # Two words per row: the glider crosses the word edge at column 250.
+    (300, 6, 1, 247),
+    # Narrow rows, several to a slot. The glider wraps the corner.
+    (40, 12, 10, 38),
+])
+async def test_sized_evolution(starknet_factory, width, height, top, left):
+    starknet = starknet_factory
+    rows = genesis_board(width, height, top, left)
+    words = genesis_words(rows, width)
+    game = await starknet.deploy("contracts/GoL2_sized.cairo",
+        constructor_calldata=[width, height, len(words)] + words)
+    layout = board_layout(width, height)
+    response = await game.get_dimensions().call()
+    assert response.result == (width, height, layout.words_per_row)
+
+    user = USER_IDS[0]
+    await game.evolve_and_claim_generations(user, 4).invoke(
+        caller_address=user)
+    # The event holds the packed slots of the generation.
+    event = starknet.state.events[-1]
+    assert event.data[2] == layout.slots_per_gen
+    response = await game.current_generation_id().call()
+    assert response.result.gen_id == 5
+    response = await game.generation_owner(5).call()
+    assert response.result.user_id == user
+
+    for gen in range(1, 6):
+        board, _, _ = await fetch_sized_board(game, gen)
+        expected = evolve(rows, gen - 1, width=width, height=height)
+        assert list(board) == list(expected)
+
+
+@pytest.mark.asyncio
+async def test_sized_rejections(starknet_factory):
+    starknet = starknet_factory
+    width, height = 300, 4
+    words = genesis_words(genesis_board(width, height, 0, 0), width)
+    # The last word of a row holds 50 columns.
+    too_wide = list(words)
+    too_wide[1] = 2 ** 50
+    with pytest.raises(Exception):
+        await starknet.deploy("contracts/GoL2_sized.cairo",
+            constructor_calldata=[width, height, len(words)] + too_wide)
+    with pytest.raises(Exception):
+        await starknet.deploy("contracts/GoL2_sized.cairo",
+            constructor_calldata=[width, height, len(words) - 1] + words[1:])
+    with pytest.raises(Exception):
+        await starknet.deploy("contracts/GoL2_sized.cairo",
+            constructor_calldata=[2, height, height] + [0] * height)
+
+    game = await starknet.deploy("contracts/GoL2_sized.cairo",
+        constructor_calldata=[width, height, len(words)] + words)
+    user = USER_IDS[1]
+    with pytest.raises(Exception):
+        await game.evolve_and_claim_generations(user, 11).invoke(
+            caller_address=user)
+    with pytest.raises(Exception):
+        await game.view_game(2).call()
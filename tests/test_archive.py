@@ -0,0 +1,102 @@
+import os
+import pytest
+import asyncio
+import numpy as np
+from starkware.starknet.testing.starknet import Starknet
+from gol2.archive import Archive, archive_from_store, BOARDS_FILE
+from gol2.indexer import Indexer, IndexStore, StarknetEventSource, INFINITE
+from gol2.simulator import evolve, population, DIM
+
+# Temporary user_ids to bypass account verification
+USER_IDS = [76543, 23456, 12345]
+# Constructor history_interval: store every generation.
+STORE_ALL = 1
+
+ACORN = [0] * DIM
+ACORN[12:15] = [32, 8, 103]
+
+@pytest.fixture(scope='module')
+def event_loop():
+    return asyncio.new_event_loop()
+
+@pytest.fixture(scope='module')
+async def starknet_factory():
+    starknet = await Starknet.empty()
+    return starknet
+
+
+def test_append_and_reopen(tmp_path):
+    path = str(tmp_path / 'game')
+    boards = np.array([evolve(ACORN, gen) for gen in range(6)])
+    with Archive(path) as archive:
+        archive.extend(1, boards[:4], USER_IDS + [2 ** 250])
+        archive.commit()
+        archive.append(5, boards[4], USER_IDS[0])
+        # Not readable until committed.
+        assert len(archive) == 4
+        with pytest.raises(ValueError):
+            archive.append(7, boards[5])
+        with pytest.raises(ValueError):
+            archive.extend(5, boards[:1, :8], [0])
+        archive.add_redemption(0, 5, 4, 2, 3, USER_IDS[1])
+
+    archive = Archive(path)
+    assert len(archive) == 5
+    assert archive.next_generation == 6
+    # The whole history is one array.
+    assert np.array_equal(archive.boards(), boards[:5])
+    assert list(archive.board(3)) == list(evolve(ACORN, 2))
+    assert archive.owner(4) == 2 ** 250
+    redemption = archive.redemptions()[0]
+    assert (redemption['generation'], redemption['row'],
+        redemption['col']) == (4, 2, 3)
+    alive = np.unpackbits(archive.boards().view(np.uint8), axis=1).sum(
+        axis=1)
+    assert list(alive) == [population(board) for board in boards[:5]]
+    archive.close()
+
+
+def test_crash_recovery(tmp_path):
+    path = str(tmp_path / 'game')
+    boards = np.array([evolve(ACORN, gen) for gen in range(3)])
+    archive = Archive(path, first_generation=0)
+    archive.extend(0, boards[:2], [1, 2])
+    archive.commit()
+    # A write cut short: part of a record past the last commit.
+    archive.append(2, boards[2], 3)
+    archive._boards.file.flush()
+    boards_path = os.path.join(path, BOARDS_FILE)
+    with open(boards_path, 'ab') as partial:
+        partial.write(b'\xff' * 7)
+
+    recovered = Archive(path)
+    assert recovered.first_generation == 0
+    assert len(recovered) == 2
+    assert np.array_equal(recovered.boards(), boards[:2])
+    recovered.append(2, boards[2], 3)
+    recovered.close()
+    assert len(Archive(path)) == 3
+
+
+@pytest.mark.asyncio
+async def test_archive_from_store(starknet_factory, tmp_path):
+    starknet = starknet_factory
+    game = await starknet.deploy("contracts/GoL2_infinite.cairo",
+        constructor_calldata=[STORE_ALL])
+    user = USER_IDS[0]
+    await game.evolve_and_claim_generations(user, 3).invoke(
+        caller_address=user)
+    await game.give_life_to_cell(user, 2, 2, 2).invoke(caller_address=user)
+    store = IndexStore()
+    indexer = Indexer(StarknetEventSource(starknet, game.contract_address),
+        store, INFINITE)
+    await indexer.sync()
+
+    archive = Archive(str(tmp_path / 'infinite'))
+    assert archive_from_store(store, archive) == 4
+    assert archive_from_store(store, archive) == 0
+    for gen in range(1, 5):
+        assert list(archive.board(gen)) == store.board(gen)
+    assert archive.owner(4) == user
+    assert len(archive.redemptions()) == 1
+    archive.close()
@@ -0,0 +1,34 @@
+
+from gol2.bench import compare, random_board, DIM
+from gol2.simulator import population
+
+BASELINE = {
+    'infinite/evolve/history=1': {'steps': 1000, 'range_check': 100,
+        'pedersen': 10, 'bitwise': 50, 'storage_writes': 8},
+}
+
+
+def test_compare():
+    same = {'infinite/evolve/history=1':
+        dict(BASELINE['infinite/evolve/history=1'])}
+    assert compare(same, BASELINE) == []
+
+    # Within the tolerance, or cheaper, is not a regression.
+    same['infinite/evolve/history=1']['steps'] = 1010
+    same['infinite/evolve/history=1']['bitwise'] = 10
+    assert compare(same, BASELINE, tolerance=0.02) == []
+
+    same['infinite/evolve/history=1']['storage_writes'] = 9
+    assert compare(same, BASELINE, tolerance=0.02) == [
+        ('infinite/evolve/history=1', 'storage_writes', 8, 9)]
+
+    # New scenarios have nothing to compare with.
+    assert compare({'creator/new/history=1': {'steps': 1}}, BASELINE) == []
+
+
+def test_random_board():
+    board = random_board(0.25, seed=1)
+    assert len(board) == DIM
+    assert board == random_board(0.25, seed=1)
+    assert 150 < population(board) < 360
+    assert population(random_board(0.0)) == 0
@@ -0,0 +1,102 @@
+
+import pytest
+import asyncio
+from starkware.starknet.testing.starknet import Starknet
+from gol2.client import (InfiniteClient, CreatorClient, BoardCache,
+    decode_useful_state)
+
+# Temporary user_ids to bypass account verification
+USER_IDS = [76543, 23456, 12345]
+# Constructor history_interval: store every generation.
+STORE_ALL = 1
+
+@pytest.fixture(scope='module')
+def event_loop():
+    return asyncio.new_event_loop()
+
+@pytest.fixture(scope='module')
+async def starknet_factory():
+    starknet = await Starknet.empty()
+    return starknet
+
+
+class CountingContract():
+    # Passes calls through to a contract, counting them by name.
+    def __init__(self, contract):
+        self.contract = contract
+        self.calls = {}
+
+    def __getattr__(self, name):
+        method = getattr(self.contract, name)
+        def count(*args):
+            self.calls[name] = self.calls.get(name, 0) + 1
+            return method(*args)
+        return count
+
+
+@pytest.mark.asyncio
+async def test_infinite_client(starknet_factory, tmp_path):
+    starknet = starknet_factory
+    game = await starknet.deploy("contracts/GoL2_infinite.cairo",
+        constructor_calldata=[STORE_ALL])
+    await game.evolve_and_claim_generations(USER_IDS[0], 5).invoke(
+        caller_address=USER_IDS[0])
+    counted = CountingContract(game)
+    client = InfiniteClient(counted,
+        BoardCache(path=str(tmp_path / 'boards.db')))
+
+    head = await client.head()
+    assert head == 6
+    # Concurrent requests go out as one call.
+    boards = await client.boards(range(1, head + 1))
+    assert counted.calls['get_arbitrary_state_arrays'] == 1
+    for board in boards:
+        response = await game.view_game(board.generation).call()
+        assert board.rows == tuple(response.result)
+    assert boards[0].population() == 7
+
+    # Past generations now come from the cache, the head does not.
+    await client.boards(range(1, head))
+    assert counted.calls['get_arbitrary_state_arrays'] == 1
+    await game.give_life_to_cell(USER_IDS[0], 5, 5, 2).invoke(
+        caller_address=USER_IDS[0])
+    board = await client.board(head)
+    assert counted.calls['get_arbitrary_state_arrays'] == 2
+    response = await game.view_game(head).call()
+    assert board.rows == tuple(response.result)
+
+    # The disk cache outlives the client.
+    client = InfiniteClient(counted,
+        BoardCache(path=str(tmp_path / 'boards.db')))
+    client.known_head = head
+    assert (await client.board(3)).rows == boards[2].rows
+    assert counted.calls['get_arbitrary_state_arrays'] == 2
+
+    response = await game.latest_useful_state(0, 7, 0, 20).call()
+    state = await client.latest_useful_state()
+    assert state == decode_useful_state(response.result)
+    assert state.generation == head
+
+
+@pytest.mark.asyncio
+async def test_creator_client(starknet_factory):
+    starknet = starknet_factory
+    game = await starknet.deploy("contracts/GoL2_creator.cairo",
+        constructor_calldata=[STORE_ALL])
+    await game.contribute_generations(0, 4).invoke(
+        caller_address=USER_IDS[0])
+    counted = CountingContract(game)
+    client = CreatorClient(counted)
+
+    assert await client.head(0) == 4
+    boards = await asyncio.gather(client.board(0, 2), client.board(0, 2))
+    assert counted.calls['view_game'] == 1
+    assert boards[0] == boards[1]
+    await client.board(0, 2)
+    await client.board(0, 4)
+    await client.board(0, 4)
+    assert counted.calls['view_game'] == 2 + 1
+
+    ((newest, owner), *_), _ = await client.recently_created()
+    assert (newest.game_index, newest.generation, owner) == (0, 4, 0)
+    assert newest == await client.board(0, 4)
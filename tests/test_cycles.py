@@ -0,0 +1,74 @@
+
+import pytest
+import asyncio
+from starkware.starknet.testing.starknet import Starknet
+from gol2.packing import state_hash
+from gol2.simulator import evolve, DIM
+
+# Temporary user_ids to bypass account verification
+USER_IDS = [76543, 23456, 12345]
+# Constructor history_interval: store every generation.
+STORE_ALL = 1
+CREDIT_REQUIREMENT = 10
+
+# A blinker: an oscillator with period 2.
+BLINKER = [0] * DIM
+BLINKER[10] = 7 * 2**12
+
+ACORN = [0] * DIM
+ACORN[12:15] = [32, 8, 103]
+
+@pytest.fixture(scope='module')
+def event_loop():
+    return asyncio.new_event_loop()
+
+@pytest.fixture(scope='module')
+async def starknet_factory():
+    starknet = await Starknet.empty()
+    return starknet
+
+
+@pytest.mark.asyncio
+async def test_creator_cycle(starknet_factory):
+    starknet = starknet_factory
+    game = await starknet.deploy("contracts/GoL2_creator.cairo",
+        constructor_calldata=[STORE_ALL])
+    user = USER_IDS[0]
+    await game.contribute_generations(0, CREDIT_REQUIREMENT).invoke(
+        caller_address=user)
+    await game.create(*BLINKER).invoke(caller_address=user)
+    response = await game.generation_of_state_hash(1,
+        state_hash(BLINKER)).call()
+    assert response.result == (1, 0)
+
+    # Generation 2 is the genesis again.
+    await game.contribute_generations(1, 2).invoke(caller_address=user)
+    response = await game.get_cycle(1).call()
+    assert response.result == (0, 2)
+
+    # Later generations are read back from the cycle, not evolved.
+    res = await game.contribute_generations(1, 5).invoke(
+        caller_address=user)
+    assert res.call_info.cairo_usage.builtin_instance_counter.get(
+        'bitwise_builtin', 0) == 0
+    for gen in range(8):
+        response = await game.view_game(1, gen).call()
+        assert list(response.result) == list(evolve(BLINKER, gen))
+
+
+@pytest.mark.asyncio
+async def test_infinite_index(starknet_factory):
+    starknet = starknet_factory
+    game = await starknet.deploy("contracts/GoL2_infinite.cairo",
+        constructor_calldata=[STORE_ALL])
+    user = USER_IDS[0]
+    await game.evolve_and_claim_generations(user, 3).invoke(
+        caller_address=user)
+    response = await game.generation_of_state_hash(state_hash(ACORN)).call()
+    assert response.result.gen_id == 1
+    response = await game.generation_of_state_hash(
+        state_hash(evolve(ACORN, 3))).call()
+    assert response.result.gen_id == 4
+    # The acorn does not repeat for a long time.
+    response = await game.get_cycle().call()
+    assert response.result == (0, 0)
@@ -0,0 +1,79 @@
+
+import pytest
+import asyncio
+from starkware.starknet.testing.starknet import Starknet
+from gol2.bench import random_board
+from gol2.packing import changed_mask
+from gol2.simulator import evolve, DIM
+
+# Temporary user_ids to bypass account verification
+USER_IDS = [76543, 23456, 12345]
+# Constructor history_interval: store every generation.
+STORE_ALL = 1
+CREDIT_REQUIREMENT = 10
+
+# Two blocks: a still life, every generation is the same.
+BLOCKS = [0] * DIM
+BLOCKS[5:7] = [3 * 2**25] * 2
+BLOCKS[20:22] = [3 * 2**10] * 2
+
+@pytest.fixture(scope='module')
+def event_loop():
+    return asyncio.new_event_loop()
+
+@pytest.fixture(scope='module')
+async def starknet_factory():
+    starknet = await Starknet.empty()
+    return starknet
+
+
+def mask_of(before, after):
+    return sum(1 << i for i in range(DIM) if before[i] != after[i])
+
+
+@pytest.mark.asyncio
+async def test_stable_boards(starknet_factory):
+    starknet = starknet_factory
+    game = await starknet.deploy("contracts/GoL2_creator.cairo",
+        constructor_calldata=[STORE_ALL])
+    user = USER_IDS[0]
+    steps = {}
+    for game_index, genesis in ((1, BLOCKS), (2, random_board(0.3))):
+        await game.contribute_generations(0, CREDIT_REQUIREMENT).invoke(
+            caller_address=user)
+        await game.create(*genesis).invoke(caller_address=user)
+        # The first generation evolves every row of the new board.
+        await game.contribute(game_index).invoke(caller_address=user)
+        res = await game.contribute(game_index).invoke(caller_address=user)
+        steps[game_index] = res.call_info.cairo_usage.n_steps
+
+        expected = evolve(genesis, 2)
+        response = await game.view_game(game_index, 2).call()
+        assert list(response.result) == list(expected)
+        # The stored mask holds the rows changed in the last generation.
+        event = starknet.state.events[-1]
+        assert changed_mask(event.data[4:]) == mask_of(
+            evolve(genesis, 1), expected)
+
+    assert changed_mask(event.data[4:]) != 0
+    # A still life is copied forward without evaluating any row.
+    assert steps[1] < steps[2] / 2
+
+
+@pytest.mark.asyncio
+async def test_give_life_marks_row(starknet_factory):
+    starknet = starknet_factory
+    game = await starknet.deploy("contracts/GoL2_infinite.cairo",
+        constructor_calldata=[STORE_ALL])
+    user = USER_IDS[0]
+    await game.evolve_and_claim_generations(user, 3).invoke(
+        caller_address=user)
+    # Gen 4. A cell far from the acorn, its row has not changed so far.
+    await game.give_life_to_cell(user, 2, 2, 2).invoke(caller_address=user)
+    response = await game.view_game(4).call()
+    edited = list(response.result)
+    await game.evolve_and_claim_generations(user, 2).invoke(
+        caller_address=user)
+    for gen in (5, 6):
+        response = await game.view_game(gen).call()
+        assert list(response.result) == list(evolve(edited, gen - 4))
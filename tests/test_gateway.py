@@ -0,0 +1,124 @@
+import pytest
+import asyncio
+import struct
+from aiohttp.test_utils import TestClient, TestServer
+from starkware.starknet.testing.starknet import Starknet
+from gol2.client import InfiniteClient, CreatorClient
+from gol2.gateway import Gateway, make_app
+from gol2.indexer import ROWS_FORMAT
+
+# Temporary user_ids to bypass account verification
+USER_IDS = [76543, 23456, 12345]
+# Constructor history_interval: store every generation.
+STORE_ALL = 1
+VIEWERS = 20
+
+@pytest.fixture(scope='module')
+def event_loop():
+    return asyncio.new_event_loop()
+
+@pytest.fixture(scope='module')
+async def starknet_factory():
+    starknet = await Starknet.empty()
+    return starknet
+
+
+class CountingContract():
+    # Passes calls through to a contract, counting them by name.
+    def __init__(self, contract):
+        self.contract = contract
+        self.calls = {}
+
+    def __getattr__(self, name):
+        method = getattr(self.contract, name)
+        def count(*args):
+            self.calls[name] = self.calls.get(name, 0) + 1
+            return method(*args)
+        return count
+
+
+async def receive(socket):
+    return (await socket.receive_json(timeout=60))
+
+
+@pytest.mark.asyncio
+async def test_gateway(starknet_factory):
+    starknet = starknet_factory
+    infinite = await starknet.deploy("contracts/GoL2_infinite.cairo",
+        constructor_calldata=[STORE_ALL])
+    creator = await starknet.deploy("contracts/GoL2_creator.cairo",
+        constructor_calldata=[STORE_ALL])
+    user = USER_IDS[0]
+    await infinite.evolve_and_claim_generations(user, 3).invoke(
+        caller_address=user)
+    counted_infinite = CountingContract(infinite)
+    counted_creator = CountingContract(creator)
+    # Polls read the two newest boards (and cache them).
+    gateway = Gateway(InfiniteClient(counted_infinite),
+        CreatorClient(counted_creator), recent=2)
+    await gateway.poll()
+    assert gateway.head.generation == 4
+
+    # No pings: each invoke below holds the event loop for a while.
+    client = TestClient(TestServer(make_app(gateway, heartbeat=None)))
+    await client.start_server()
+    sockets = [await client.ws_connect('/ws') for _ in range(VIEWERS)]
+    for socket in sockets:
+        snapshot = await receive(socket)
+        assert snapshot['type'] == 'snapshot'
+        assert snapshot['head']['generation'] == 4
+        assert snapshot['games'][0]['game_index'] == 0
+
+    # Two new generations, a revived cell and an evolved Creator game.
+    await infinite.evolve_and_claim_generations(user, 2).invoke(
+        caller_address=user)
+    await infinite.give_life_to_cell(user, 5, 5, 2).invoke(
+        caller_address=user)
+    await creator.contribute_generations(0, 2).invoke(caller_address=user)
+    messages = await gateway.poll()
+    assert [m['type'] for m in messages] == [
+        'generation', 'generation', 'redemption', 'game']
+    assert [m['generation'] for m in messages[:2]] == [5, 6]
+    assert messages[3]['generation'] == 2
+    for socket in sockets:
+        for message in messages:
+            assert await receive(socket) == message
+    # One read per contract per poll, whatever the number of viewers.
+    assert counted_infinite.calls == {'latest_useful_state': 2}
+    assert counted_creator.calls == {'get_recently_created': 2}
+    assert await gateway.poll() == []
+
+    head = (await client.get('/infinite/head'))
+    head = await head.json()
+    response = await infinite.view_game(6).call()
+    assert head['rows'] == list(response.result)
+    assert head['redemption_count'] == 1
+    # Concurrent viewers of an old board share one read.
+    replies = await asyncio.gather(*(client.get('/infinite/boards/2',
+        params={'format': 'binary'}) for _ in range(VIEWERS)))
+    response = await infinite.view_game(2).call()
+    for reply in replies:
+        assert struct.unpack(ROWS_FORMAT, await reply.read()) == tuple(
+            response.result)
+    assert counted_infinite.calls['get_arbitrary_state_arrays'] == 1
+    redemptions = await (await client.get('/infinite/redemptions')).json()
+    assert (redemptions[0]['row'], redemptions[0]['col']) == (5, 5)
+
+    users = await asyncio.gather(*(client.get(f'/infinite/users/{user}')
+        for _ in range(VIEWERS)))
+    tokens = (await users[0].json())['tokens']
+    assert counted_infinite.calls['get_user_tokens'] == 1
+    assert [t['gave_life_at'] for t in tokens if t['gave_life_at']] == [6]
+    games = await (await client.get('/creator/games')).json()
+    assert games[0]['generation'] == 2
+    board = await (await client.get('/creator/games/0/1')).json()
+    response = await creator.view_game(0, 1).call()
+    assert board['rows'] == list(response.result)
+    assert (await client.get('/infinite/boards/x')).status == 400
+
+    await gateway.close()
+    for socket in sockets:
+        await socket.receive(timeout=60)
+        assert socket.closed
+    assert not gateway.subscribers
+    await client.close()
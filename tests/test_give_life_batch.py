@@ -0,0 +1,95 @@
+
+import pytest
+import asyncio
+from starkware.starknet.testing.starknet import Starknet
+from gol2.simulator import DIM
+
+# Temporary user_ids to bypass account verification
+USER_IDS = [76543, 23456, 12345]
+# Constructor history_interval: store every generation.
+STORE_ALL = 1
+# Far from the acorn, sorted by row then column.
+CELLS = [(1, 1), (1, 5), (20, 3), (20, 4)]
+
+@pytest.fixture(scope='module')
+def event_loop():
+    return asyncio.new_event_loop()
+
+@pytest.fixture(scope='module')
+async def starknet_factory():
+    starknet = await Starknet.empty()
+    return starknet
+
+
+async def new_game(starknet, user):
+    game = await starknet.deploy("contracts/GoL2_infinite.cairo",
+        constructor_calldata=[STORE_ALL])
+    # Tokens 2 to 6.
+    await game.evolve_and_claim_generations(user, 5).invoke(
+        caller_address=user)
+    return game
+
+
+@pytest.mark.asyncio
+async def test_give_life_to_cells(starknet_factory):
+    starknet = starknet_factory
+    user = USER_IDS[0]
+    tokens = [2, 3, 4, 5]
+    rows = [row for row, _ in CELLS]
+    cols = [col for _, col in CELLS]
+
+    single = await new_game(starknet, user)
+    single_steps = 0
+    for token, (row, col) in zip(tokens, CELLS):
+        res = await single.give_life_to_cell(user, row, col, token).invoke(
+            caller_address=user)
+        single_steps += res.call_info.cairo_usage.n_steps
+
+    batch = await new_game(starknet, user)
+    res = await batch.give_life_to_cells(user, tokens, rows, cols).invoke(
+        caller_address=user)
+    assert res.call_info.cairo_usage.n_steps < single_steps / 2
+
+    # The same board and redemption records as one call per token.
+    expected = await single.view_game(6).call()
+    response = await batch.view_game(6).call()
+    assert response.result == expected.result
+    for token in tokens:
+        expected = await single.get_token_data(token).call()
+        response = await batch.get_token_data(token).call()
+        assert response.result == expected.result
+    expected = await single.latest_give_life_index().call()
+    response = await batch.latest_give_life_index().call()
+    assert response.result == expected.result
+
+    # The next generation evolves the new cells.
+    await batch.evolve_and_claim_next_generation(user).invoke(
+        caller_address=user)
+    await single.evolve_and_claim_next_generation(user).invoke(
+        caller_address=user)
+    expected = await single.view_game(7).call()
+    response = await batch.view_game(7).call()
+    assert response.result == expected.result
+
+
+@pytest.mark.asyncio
+async def test_give_life_to_cells_rejects(starknet_factory):
+    starknet = starknet_factory
+    user = USER_IDS[0]
+    game = await new_game(starknet, user)
+    # Unsorted cells.
+    with pytest.raises(Exception):
+        await game.give_life_to_cells(user, [2, 3], [5, 1], [1, 1]).invoke(
+            caller_address=user)
+    # The same cell twice.
+    with pytest.raises(Exception):
+        await game.give_life_to_cells(user, [2, 3], [1, 1], [1, 1]).invoke(
+            caller_address=user)
+    # The same token twice.
+    with pytest.raises(Exception):
+        await game.give_life_to_cells(user, [2, 2], [1, 1], [1, 2]).invoke(
+            caller_address=user)
+    # A token of another user.
+    with pytest.raises(Exception):
+        await game.give_life_to_cells(USER_IDS[1], [2], [1], [1]).invoke(
+            caller_address=USER_IDS[1])
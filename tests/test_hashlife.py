@@ -0,0 +1,43 @@
+import pytest
+import numpy as np
+from gol2.bench import random_board
+from gol2.hashlife import HashLife
+from gol2.simulator import evolve, DIM
+
+ACORN = [0] * DIM
+ACORN[12:15] = [32, 8, 103]
+
+# A glider heading down-right, it circles the board every 128 generations.
+GLIDER = [0] * DIM
+GLIDER[0:3] = [2 ** 30, 2 ** 29, 7 * 2 ** 29]
+
+
+@pytest.mark.parametrize('board', [ACORN, GLIDER, random_board(0.3)])
+@pytest.mark.parametrize('generations', [0, 1, 2, 5, 33, 130, 1000])
+def test_matches_simulator(board, generations):
+    engine = HashLife()
+    expected = evolve(board, generations)
+    assert list(engine.advance(board, generations)) == list(expected)
+
+
+def test_far_future():
+    engine = HashLife()
+    # The glider is back where it started every 128 generations.
+    assert list(engine.advance(GLIDER, 128 * 10 ** 9)) == GLIDER
+    board = engine.advance(ACORN, 10 ** 6)
+    # Once in its cycle, the board repeats from the memo.
+    misses = engine.misses
+    assert list(engine.advance(board, 10 ** 6)) == list(
+        engine.advance(ACORN, 2 * 10 ** 6))
+    assert engine.misses - misses < 1000
+
+
+def test_bounded_cache():
+    engine = HashLife(max_nodes=500)
+    expected = evolve(ACORN, 300)
+    assert list(engine.advance(ACORN, 300)) == list(expected)
+    stats = engine.stats()
+    assert stats['nodes'] <= 500 and stats['results'] <= 500
+    assert stats['evictions'] > 0
+    with pytest.raises(ValueError):
+        engine.advance(ACORN, -1)
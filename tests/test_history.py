@@ -0,0 +1,99 @@
+
+import pytest
+import asyncio
+from starkware.starknet.testing.starknet import Starknet
+
+# Temporary user_ids to bypass account verification
+USER_IDS = [76543, 23456, 12345]
+
+# Game constants
+DIM = 32
+# Constructor history_interval values.
+STORE_ALL = 1
+INFINITE_INTERVAL = 3
+CREATOR_INTERVAL = 4
+
+@pytest.fixture(scope='module')
+def event_loop():
+    return asyncio.new_event_loop()
+
+@pytest.fixture(scope='module')
+async def starknet_factory():
+    starknet = await Starknet.empty()
+    return starknet
+
+
+async def deploy_pair(starknet, contract, interval):
+    # The same actions go to a full history and a checkpointed game.
+    full = await starknet.deploy(contract,
+        constructor_calldata=[STORE_ALL])
+    checkpointed = await starknet.deploy(contract,
+        constructor_calldata=[interval])
+    return full, checkpointed
+
+
+@pytest.mark.asyncio
+async def test_infinite_checkpoints(starknet_factory):
+    starknet = starknet_factory
+    full, checkpointed = await deploy_pair(starknet,
+        "contracts/GoL2_infinite.cairo", INFINITE_INTERVAL)
+    for game in (full, checkpointed):
+        # Gens 2-5 are owned by the first user.
+        await game.evolve_and_claim_generations(USER_IDS[0], 4).invoke(
+            caller_address=USER_IDS[0])
+        # Life given between regular checkpoints (gen 5).
+        await game.give_life_to_cell(USER_IDS[0], 5, 5, 2).invoke(
+            caller_address=USER_IDS[0])
+        await game.evolve_and_claim_generations(USER_IDS[1], 2).invoke(
+            caller_address=USER_IDS[1])
+        # Two edits in one bucket (gens 7 and 8), one on a checkpoint.
+        await game.give_life_to_cell(USER_IDS[0], 20, 20, 3).invoke(
+            caller_address=USER_IDS[0])
+        await game.evolve_and_claim_next_generation(USER_IDS[1]).invoke(
+            caller_address=USER_IDS[1])
+        await game.give_life_to_cell(USER_IDS[0], 28, 3, 4).invoke(
+            caller_address=USER_IDS[0])
+        await game.evolve_and_claim_generations(USER_IDS[2], 3).invoke(
+            caller_address=USER_IDS[2])
+
+    response = await checkpointed.current_generation_id().call()
+    head = response.result.gen_id
+    assert head == 11
+    # Every generation, including those never stored, reads the same.
+    for gen_id in range(1, head + 2):
+        expected = await full.view_game(gen_id).call()
+        response = await checkpointed.view_game(gen_id).call()
+        assert response.result == expected.result
+
+    ids = [4, 6, 7, 8, 10]
+    expected = await full.get_arbitrary_state_arrays(
+        ids, 3, [], 2).call()
+    response = await checkpointed.get_arbitrary_state_arrays(
+        ids, 3, [], 2).call()
+    assert response.result == expected.result
+
+
+@pytest.mark.asyncio
+async def test_creator_checkpoints(starknet_factory):
+    starknet = starknet_factory
+    full, checkpointed = await deploy_pair(starknet,
+        "contracts/GoL2_creator.cairo", CREATOR_INTERVAL)
+    row_states = [0] * DIM
+    row_states[2:5] = [32, 8, 103]
+    for game in (full, checkpointed):
+        await game.contribute_generations(0, 10).invoke(
+            caller_address=USER_IDS[0])
+        await game.create(*row_states).invoke(caller_address=USER_IDS[0])
+        await game.contribute_generations(1, 6).invoke(
+            caller_address=USER_IDS[1])
+
+    for game_index, last_gen in ((0, 10), (1, 6)):
+        for gen in range(last_gen + 2):
+            expected = await full.view_game(game_index, gen).call()
+            response = await checkpointed.view_game(game_index, gen).call()
+            assert response.result == expected.result
+
+    expected = await full.get_recent_generations_of_game(0, 15, 0, 5).call()
+    response = await checkpointed.get_recent_generations_of_game(0, 15,
+        0, 5).call()
+    assert response.result == expected.result
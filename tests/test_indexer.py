@@ -0,0 +1,101 @@
+
+import pytest
+import asyncio
+from starkware.starknet.testing.starknet import Starknet
+from gol2.indexer import (Indexer, IndexStore, StarknetEventSource,
+    INFINITE, CREATOR)
+
+# Temporary user_ids to bypass account verification
+USER_IDS = [76543, 23456, 12345]
+
+# Game constants
+DIM = 32
+# Constructor history_interval values.
+STORE_ALL = 1
+EVENTS_ONLY = 0
+
+@pytest.fixture(scope='module')
+def event_loop():
+    return asyncio.new_event_loop()
+
+@pytest.fixture(scope='module')
+async def starknet_factory():
+    starknet = await Starknet.empty()
+    return starknet
+
+
+async def deploy_pair(starknet, contract):
+    # The same actions go to a full history and an event-only game.
+    full = await starknet.deploy(contract,
+        constructor_calldata=[STORE_ALL])
+    events_only = await starknet.deploy(contract,
+        constructor_calldata=[EVENTS_ONLY])
+    return full, events_only
+
+
+@pytest.mark.asyncio
+async def test_infinite_indexer(starknet_factory):
+    starknet = starknet_factory
+    full, events_only = await deploy_pair(starknet,
+        "contracts/GoL2_infinite.cairo")
+    for game in (full, events_only):
+        await game.evolve_and_claim_generations(USER_IDS[0], 3).invoke(
+            caller_address=USER_IDS[0])
+        await game.give_life_to_cell(USER_IDS[0], 5, 5, 2).invoke(
+            caller_address=USER_IDS[0])
+        await game.evolve_and_claim_next_generation(USER_IDS[1]).invoke(
+            caller_address=USER_IDS[1])
+
+    store = IndexStore()
+    indexer = Indexer(StarknetEventSource(starknet,
+        events_only.contract_address), store, INFINITE)
+    assert await indexer.sync() == 5
+    assert await indexer.sync() == 0
+
+    response = await events_only.current_generation_id().call()
+    head = response.result.gen_id
+    assert head == 5
+    # The indexer holds the history the contract did not store.
+    for gen_id in range(1, head + 1):
+        response = await full.view_game(gen_id).call()
+        assert store.board(gen_id) == list(response.result)
+    response = await events_only.view_game(3).call()
+    assert not any(response.result)
+    # The current board is still in storage.
+    response = await events_only.view_game(head).call()
+    assert store.head() == (head, list(response.result))
+
+    assert store.tokens_of(USER_IDS[0]) == [2, 3, 4]
+    assert store.owner(5) == USER_IDS[1]
+    assert store.redemptions() == [(0, 2, 4, 5, 5, USER_IDS[0])]
+
+
+@pytest.mark.asyncio
+async def test_creator_indexer(starknet_factory):
+    starknet = starknet_factory
+    full, events_only = await deploy_pair(starknet,
+        "contracts/GoL2_creator.cairo")
+    row_states = [0] * DIM
+    row_states[2:5] = [32, 8, 103]
+    for game in (full, events_only):
+        await game.contribute_generations(0, 10).invoke(
+            caller_address=USER_IDS[0])
+        await game.create(*row_states).invoke(caller_address=USER_IDS[0])
+        await game.contribute(1).invoke(caller_address=USER_IDS[1])
+
+    store = IndexStore()
+    indexer = Indexer(StarknetEventSource(starknet,
+        events_only.contract_address), store, CREATOR)
+    await indexer.sync()
+
+    for game_index, last_gen in ((0, 10), (1, 1)):
+        for gen in range(last_gen + 1):
+            response = await full.view_game(game_index, gen).call()
+            assert store.board(gen, game_index) == list(response.result)
+        response = await events_only.view_game(game_index, last_gen).call()
+        assert store.head(game_index) == (last_gen, list(response.result))
+
+    assert store.games_of(USER_IDS[0]) == [1]
+    for user in USER_IDS[:2]:
+        response = await events_only.user_counts(user).call()
+        assert store.credits(user) == response.result.credit_count
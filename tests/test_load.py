@@ -0,0 +1,37 @@
+
+import pytest
+from gol2.load import (classify, parse_mix, percentile, run_load,
+    DEFAULT_MIX)
+
+
+def test_percentile():
+    values = [5, 1, 4, 2, 3]
+    assert percentile(values, 50) == 3
+    assert percentile(values, 99) == 5
+    assert percentile(list(range(1, 101)), 90) == 90
+    assert percentile([], 50) == 0
+
+
+def test_parse_mix():
+    assert parse_mix('evolve=2,views') == {'evolve': 2.0, 'views': 1.0}
+    with pytest.raises(ValueError):
+        parse_mix('evolve=1,teleport=2')
+
+
+def test_classify():
+    error = Exception('Error at pc=0:12:\nassert redeemed = 0\n^***^')
+    assert classify(error) == 'double_redemption'
+    assert classify(KeyError('x')) == 'KeyError'
+
+
+@pytest.mark.asyncio
+async def test_run_load():
+    report = await run_load(n_players=4, n_actions=3,
+        mix={'evolve': 1, 'give_life': 2, 'views': 1}, seed=1)
+    assert report['actions'] >= 12
+    assert set(report['by_action']) <= set(DEFAULT_MIX)
+    evolve = report['by_action']['evolve']
+    # Evolving never conflicts.
+    assert evolve['failed'] == 0
+    assert evolve['steps'] > 0
+    assert evolve['p50_ms'] <= evolve['p99_ms']
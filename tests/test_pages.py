@@ -0,0 +1,107 @@
+
+import pytest
+import asyncio
+from starkware.starknet.testing.starknet import Starknet
+from gol2.client import (FIELD_BOARDS, FIELD_OWNERS, FIELD_REDEMPTIONS,
+    FIELD_GENERATIONS, FIELD_GENESIS)
+from gol2.simulator import DIM
+
+# Temporary user_ids to bypass account verification
+USER_IDS = [76543, 23456, 12345]
+# Constructor history_interval: store every generation.
+STORE_ALL = 1
+CREDIT_REQUIREMENT = 10
+
+@pytest.fixture(scope='module')
+def event_loop():
+    return asyncio.new_event_loop()
+
+@pytest.fixture(scope='module')
+async def starknet_factory():
+    starknet = await Starknet.empty()
+    return starknet
+
+
+@pytest.mark.asyncio
+async def test_useful_state_pages(starknet_factory):
+    starknet = starknet_factory
+    game = await starknet.deploy("contracts/GoL2_infinite.cairo",
+        constructor_calldata=[STORE_ALL])
+    user = USER_IDS[0]
+    await game.evolve_and_claim_generations(user, 5).invoke(
+        caller_address=user)
+    await game.give_life_to_cell(user, 2, 2, 2).invoke(caller_address=user)
+
+    every = FIELD_BOARDS | FIELD_OWNERS | FIELD_REDEMPTIONS
+    cursor, pages, steps = 0, [], []
+    while True:
+        response = await game.latest_useful_state(0, every, cursor,
+            2).call()
+        pages.append(response.result)
+        steps.append(response.call_info.cairo_usage.n_steps)
+        cursor = response.result.next_cursor
+        if cursor == 0:
+            break
+    assert [list(page.gen_ids) for page in pages] == [[6, 5], [4, 3],
+        [2, 1]]
+    for page in pages:
+        for i, gen in enumerate(page.gen_ids):
+            expected = await game.view_game(gen).call()
+            assert page.boards[DIM * i:DIM * (i + 1)] == list(
+                expected.result)
+        assert list(page.owners) == [0 if gen == 1 else user
+            for gen in page.gen_ids]
+    # One redemption: [redemption_index, id_minted, id_used, row, col,
+    # owner].
+    assert pages[0].redemption_count == 1
+    assert len(pages[0].redemptions) == 6
+    assert pages[0].redemptions[0] == 0
+    assert pages[1].redemptions == []
+
+    # Only the requested fields are read.
+    owners_only = await game.latest_useful_state(0, FIELD_OWNERS, 0,
+        2).call()
+    assert owners_only.result.boards == []
+    assert owners_only.result.redemptions == []
+    assert list(owners_only.result.owners) == [user, user]
+    assert owners_only.call_info.cairo_usage.n_steps < steps[0] / 4
+
+
+@pytest.mark.asyncio
+async def test_creator_pages(starknet_factory):
+    starknet = starknet_factory
+    game = await starknet.deploy("contracts/GoL2_creator.cairo",
+        constructor_calldata=[STORE_ALL])
+    user = USER_IDS[0]
+    genesis = [0] * DIM
+    genesis[3:6] = [7, 7, 7]
+    for index in (1, 2):
+        await game.contribute_generations(0, CREDIT_REQUIREMENT).invoke(
+            caller_address=user)
+        genesis[10] = index
+        await game.create(*genesis).invoke(caller_address=user)
+    await game.contribute_generations(2, 3).invoke(caller_address=user)
+
+    fields = FIELD_BOARDS | FIELD_OWNERS | FIELD_GENERATIONS
+    response = await game.get_recently_created(0, fields, 0, 2).call()
+    first = response.result
+    assert list(first.game_indices) == [2, 1]
+    assert list(first.generations) == [3, 0]
+    assert list(first.owners) == [user, user]
+    expected = await game.view_game(2, 3).call()
+    assert first.boards[:DIM] == list(expected.result)
+    assert first.next_cursor == 2
+    response = await game.get_recently_created(0, fields, 2, 2).call()
+    assert list(response.result.game_indices) == [0]
+    assert response.result.next_cursor == 0
+
+    response = await game.get_recent_generations_of_game(2, FIELD_GENESIS,
+        0, 5).call()
+    assert response.result.owner == 0
+    assert response.result.boards == []
+    assert response.result.genesis == genesis
+    response = await game.get_recent_generations_of_game(2,
+        FIELD_BOARDS | FIELD_OWNERS, 0, 5).call()
+    assert response.result.owner == user
+    assert list(response.result.generations) == [3, 2, 1, 0]
+    assert response.result.next_cursor == 0
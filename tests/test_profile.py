@@ -0,0 +1,62 @@
+import pytest
+import asyncio
+from starkware.starknet.testing.starknet import Starknet
+from gol2.profile import CallProfile, diff, profile_call, METRICS
+
+# Temporary user_ids to bypass account verification
+USER_IDS = [76543, 23456, 12345]
+# Constructor history_interval: store every generation.
+STORE_ALL = 1
+
+@pytest.fixture(scope='module')
+def event_loop():
+    return asyncio.new_event_loop()
+
+@pytest.fixture(scope='module')
+async def starknet_factory():
+    starknet = await Starknet.empty()
+    return starknet
+
+
+def cairo_usage(result):
+    usage = result.call_info.cairo_usage
+    counter = usage.builtin_instance_counter
+    return {'steps': usage.n_steps,
+        'range_check': counter['range_check_builtin'],
+        'pedersen': counter['pedersen_builtin'],
+        'bitwise': counter['bitwise_builtin']}
+
+
+@pytest.mark.asyncio
+async def test_profile_matches_usage(starknet_factory, tmp_path):
+    starknet = starknet_factory
+    game = await starknet.deploy("contracts/GoL2_infinite.cairo",
+        constructor_calldata=[STORE_ALL])
+    user = USER_IDS[0]
+    evolve, result = await profile_call(
+        game.evolve_and_claim_next_generation(user), invoke=True,
+        caller=user)
+    # Every step and builtin instance is attributed once.
+    assert dict(evolve.total()) == cairo_usage(result)
+    for usage in evolve.exclusive.values():
+        assert min(usage.values()) >= 0
+    entry = '__wrappers__.evolve_and_claim_next_generation'
+    assert {m: evolve.inclusive[entry][m] for m in METRICS} == cairo_usage(
+        result)
+    assert sum(evolve.stacks.values()) == cairo_usage(result)['steps']
+    folded = evolve.folded()
+    assert folded.startswith(entry)
+    assert all(line.rsplit(' ', 1)[1].isdigit()
+        for line in folded.splitlines())
+
+    view, result = await profile_call(game.view_game(2))
+    assert dict(view.total()) == cairo_usage(result)
+
+    path = str(tmp_path / 'evolve.json')
+    evolve.save(path)
+    loaded = CallProfile.load(path)
+    assert diff(evolve, loaded) == []
+    assert loaded.folded() == folded
+    changes = dict(diff(view, evolve))
+    steps = changes['__main__.evolve_and_claim_next_generation']['steps']
+    assert steps[0] == 0 and steps[1] > 0
@@ -0,0 +1,180 @@
+import os
+import struct
+import zlib
+import pytest
+import numpy as np
+from gol2.archive import Archive
+from gol2.render import (PALETTE, ALIVE, DEAD, GAP, archive_batches,
+    evolve_batches, frame_size, pixels, render)
+from gol2.simulator import evolve, to_cells, DIM
+
+ACORN = [0] * DIM
+ACORN[12:15] = [32, 8, 103]
+SCALE = 2
+
+
+def read_chunks(path):
+    with open(path, 'rb') as f:
+        data = f.read()
+    assert data[:8] == b'\x89PNG\r\n\x1a\n'
+    chunks, i = [], 8
+    while i < len(data):
+        length, kind = struct.unpack('>I4s', data[i:i + 8])
+        body = data[i + 8:i + 8 + length]
+        crc, = struct.unpack('>I', data[i + 8 + length:i + 12 + length])
+        assert crc == zlib.crc32(kind + body)
+        chunks.append((kind, body))
+        i += 12 + length
+    return chunks
+
+
+def png_frame(data, width, height):
+    lines = np.frombuffer(zlib.decompress(data), dtype=np.uint8).reshape(
+        height, width + 1)
+    assert not lines[:, 0].any()
+    return lines[:, 1:]
+
+
+def lzw_decode(data, code_size):
+    # A plain GIF LZW decoder.
+    bits = np.unpackbits(np.frombuffer(data, dtype=np.uint8),
+        bitorder='little')
+    clear, end = 2 ** code_size, 2 ** code_size + 1
+    width, position, out, table, previous = code_size + 1, 0, [], None, None
+    while True:
+        code = int(bits[position:position + width][::-1].dot(
+            1 << np.arange(width)[::-1]))
+        position += width
+        if code == clear:
+            table = [[i] for i in range(clear)] + [None, None]
+            width, previous = code_size + 1, None
+            continue
+        if code == end:
+            return out
+        if code < len(table):
+            entry = table[code]
+            if previous is not None:
+                table.append(previous + entry[:1])
+        else:
+            entry = previous + previous[:1]
+            table.append(entry)
+        out.extend(entry)
+        previous = entry
+        if len(table) == 2 ** width and width < 12:
+            width += 1
+
+
+def read_gif(path):
+    with open(path, 'rb') as f:
+        data = f.read()
+    assert data[:6] == b'GIF89a'
+    width, height, flags = struct.unpack('<HHB', data[6:11])
+    i = 13 + 3 * 2 ** ((flags & 7) + 1)
+    frames = []
+    while data[i] != 0x3B:
+        if data[i] == 0x21:
+            i += 2
+            while data[i]:
+                i += data[i] + 1
+            i += 1
+            continue
+        assert data[i] == 0x2C
+        code_size = data[i + 10]
+        i += 11
+        blocks = b''
+        while data[i]:
+            blocks += data[i + 1:i + 1 + data[i]]
+            i += data[i] + 1
+        i += 1
+        frames.append(np.array(lzw_decode(blocks, code_size),
+            dtype=np.uint8).reshape(height, width))
+    return frames
+
+
+def test_pixels():
+    boards = np.array([evolve(ACORN, gen) for gen in range(3)])
+    frames = pixels(boards, scale=SCALE)
+    assert frames.shape == (3, DIM * SCALE, DIM * SCALE)
+    cells = to_cells(boards)
+    assert np.array_equal(frames[:, ::SCALE, ::SCALE], cells)
+    assert np.array_equal(frames[:, 1::SCALE, 1::SCALE], cells)
+
+    # Three games, two per row, with a line between them.
+    grid = pixels(np.stack([boards, boards[::-1], boards], axis=1),
+        scale=1, columns=2)
+    assert grid.shape[1:] == (2 * DIM + 1, 2 * DIM + 1)
+    assert (grid.shape[2], grid.shape[1]) == frame_size(3, 2, 1)
+    assert np.array_equal(grid[:, DIM + 1:, :DIM], cells)
+    assert np.array_equal(grid[:, :DIM, DIM + 1:], cells[::-1])
+    assert (grid[:, DIM, :] == GAP).all()
+    assert (grid[:, DIM + 1:, DIM + 1:] == GAP).all()
+    assert set(np.unique(grid[:, :DIM, :DIM])) <= {ALIVE, DEAD}
+
+
+@pytest.mark.parametrize('format', ['png', 'apng', 'gif', 'rgb'])
+def test_formats(format, tmp_path):
+    generations = 300
+    expected = pixels(np.concatenate(list(evolve_batches(ACORN,
+        generations))), scale=SCALE)
+    path = str(tmp_path / f'acorn.{format}')
+    # Small batches: the frames are written as they are rendered.
+    assert render(evolve_batches(ACORN, generations, batch=64), path,
+        format, scale=SCALE) == generations + 1
+    height, width = expected.shape[1:]
+
+    if format == 'png':
+        names = sorted(os.listdir(path))
+        assert len(names) == generations + 1
+        for n in (0, generations):
+            chunks = dict(read_chunks(os.path.join(path, names[n])))
+            assert struct.unpack('>II', chunks[b'IHDR'][:8]) == (width,
+                height)
+            assert np.array_equal(png_frame(chunks[b'IDAT'], width, height),
+                expected[n])
+    elif format == 'apng':
+        chunks = read_chunks(path)
+        kinds = [kind for kind, _ in chunks]
+        assert kinds.index(b'acTL') < kinds.index(b'IDAT')
+        actl = dict(chunks)[b'acTL']
+        assert struct.unpack('>II', actl) == (generations + 1, 0)
+        assert kinds.count(b'fcTL') == generations + 1
+        data = [body for kind, body in chunks if kind == b'IDAT'] + [
+            body[4:] for kind, body in chunks if kind == b'fdAT']
+        sequence = [struct.unpack('>I', body[:4])[0]
+            for kind, body in chunks if kind in (b'fcTL', b'fdAT')]
+        assert sequence == list(range(2 * generations + 1))
+        for n in (0, 1, generations):
+            assert np.array_equal(png_frame(data[n], width, height),
+                expected[n])
+    elif format == 'gif':
+        frames = read_gif(path)
+        assert len(frames) == generations + 1
+        assert np.array_equal(np.array(frames), expected)
+    else:
+        data = np.fromfile(path, dtype=np.uint8)
+        assert np.array_equal(data.reshape(-1, height, width, 3),
+            PALETTE[expected])
+
+
+def test_archive_grid(tmp_path):
+    directories = []
+    for game, length in enumerate([40, 25]):
+        directory = str(tmp_path / str(game))
+        with Archive(directory, first_generation=0) as archive:
+            boards = np.array([evolve(ACORN, gen + game)
+                for gen in range(length)])
+            archive.extend(0, boards, [0] * length)
+        directories.append(directory)
+    batches = list(archive_batches(directories, 10, 40, batch=16))
+    assert [len(batch) for batch in batches] == [16, 14]
+    frames = np.concatenate(batches)
+    assert frames.shape == (30, 2, DIM)
+    assert list(frames[0, 1]) == list(evolve(ACORN, 11))
+    # The shorter game keeps its last board.
+    assert list(frames[-1, 1]) == list(evolve(ACORN, 25))
+    path = str(tmp_path / 'grid.gif')
+    render(archive_batches(directories, 10, 40), path, 'gif', games=2,
+        columns=2, scale=1)
+    assert np.array_equal(np.array(read_gif(path)), pixels(frames, 1, 2))
+    with pytest.raises(ValueError):
+        next(archive_batches(directories, -1, 5))
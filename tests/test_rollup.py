@@ -0,0 +1,118 @@
+import pytest
+import asyncio
+import numpy as np
+from starkware.starknet.testing.starknet import Starknet
+from gol2.bench import random_board
+from gol2.indexer import (Indexer, IndexStore, StarknetEventSource,
+    INFINITE, CREATOR, CREDIT_REQUIREMENT)
+from gol2.rollup import Rollup, bit_planes, popcount
+from gol2.simulator import population, to_cells, DIM
+
+# Temporary user_ids to bypass account verification
+USER_IDS = [76543, 23456, 12345]
+# Constructor history_interval: store every generation.
+STORE_ALL = 1
+
+@pytest.fixture(scope='module')
+def event_loop():
+    return asyncio.new_event_loop()
+
+@pytest.fixture(scope='module')
+async def starknet_factory():
+    starknet = await Starknet.empty()
+    return starknet
+
+
+def test_packed_sums():
+    boards = np.array([random_board(d, seed) for seed, d in enumerate(
+        [0.0, 0.1, 0.5, 0.9, 1.0])])
+    assert list(popcount(boards).sum(axis=1)) == list(population(boards))
+    assert np.array_equal(bit_planes(boards), to_cells(boards).sum(axis=0))
+
+
+def expected_rollup(store, last):
+    boards = np.array([store.board(gen) for gen in range(1, last + 1)])
+    return to_cells(boards).sum(axis=0), population(boards)
+
+
+@pytest.mark.asyncio
+async def test_infinite_rollup(starknet_factory, tmp_path):
+    starknet = starknet_factory
+    game = await starknet.deploy("contracts/GoL2_infinite.cairo",
+        constructor_calldata=[STORE_ALL])
+    store = IndexStore()
+    indexer = Indexer(StarknetEventSource(starknet, game.contract_address),
+        store, INFINITE)
+    path = str(tmp_path / 'rollup.npz')
+    await game.evolve_and_claim_generations(USER_IDS[0], 4).invoke(
+        caller_address=USER_IDS[0])
+    await game.evolve_and_claim_generations(USER_IDS[1], 2).invoke(
+        caller_address=USER_IDS[1])
+    await game.give_life_to_cell(USER_IDS[0], 2, 3, 2).invoke(
+        caller_address=USER_IDS[0])
+    await indexer.sync()
+
+    rollup = Rollup(path)
+    # Generations 1-6: the head (7) may still be edited.
+    assert rollup.update(store) == 6 + 1
+    heatmap, populations = expected_rollup(store, 6)
+    assert np.array_equal(rollup.heatmap(), heatmap)
+    assert list(rollup.population()) == list(populations)
+    assert rollup.generations_owned == {USER_IDS[0]: 4, USER_IDS[1]: 1}
+    assert rollup.placements[2, 3] == 1 and rollup.placements.sum() == 1
+    # Token 2 used in generation 7.
+    assert list(rollup.token_ages) == [0] * 5 + [1]
+    rollup.save()
+
+    await game.give_life_to_cell(USER_IDS[1], 40, 3, 6).invoke(
+        caller_address=USER_IDS[1])
+    await game.evolve_and_claim_generations(USER_IDS[1], 3).invoke(
+        caller_address=USER_IDS[1])
+    await indexer.sync()
+    resumed = Rollup(path)
+    assert resumed.next_generation() == 7
+    # Only the new generations and redemption are read.
+    assert resumed.update(store) == 3 + 1
+    heatmap, populations = expected_rollup(store, 9)
+    assert np.array_equal(resumed.heatmap(), heatmap)
+    assert list(resumed.population()) == list(populations)
+    assert resumed.generations_owned == {USER_IDS[0]: 4, USER_IDS[1]: 4}
+    # The row is wrapped onto the board.
+    assert resumed.placements[40 % DIM, 3] == 1
+    # Token 6 used in generation 7.
+    assert list(resumed.token_ages) == [0, 1, 0, 0, 0, 1]
+    assert resumed.update(store) == 0
+
+
+@pytest.mark.asyncio
+async def test_creator_rollup(starknet_factory, tmp_path):
+    starknet = starknet_factory
+    game = await starknet.deploy("contracts/GoL2_creator.cairo",
+        constructor_calldata=[STORE_ALL])
+    store = IndexStore()
+    indexer = Indexer(StarknetEventSource(starknet, game.contract_address),
+        store, CREATOR)
+    user = USER_IDS[0]
+    await game.contribute_generations(0, CREDIT_REQUIREMENT).invoke(
+        caller_address=user)
+    await game.contribute_generations(0, 2).invoke(caller_address=user)
+    await game.create(*random_board(0.3)).invoke(caller_address=user)
+    await game.contribute_generations(1, 3).invoke(
+        caller_address=USER_IDS[1])
+    await indexer.sync()
+
+    path = str(tmp_path / 'creator.npz')
+    rollup = Rollup(path, CREATOR)
+    assert rollup.update(store) == 13 + 4 + 2
+    rollup.save()
+    rollup = Rollup(path, CREATOR)
+    assert rollup.games_created == {user: 1}
+    credits = rollup.credits()
+    for u in USER_IDS[:2]:
+        counts = (await game.user_counts(u).call()).result
+        assert credits[u] == counts.credit_count == store.credits(u)
+    boards = np.array([store.board(gen, 1) for gen in range(4)])
+    assert np.array_equal(rollup.heatmap(1), to_cells(boards).sum(axis=0))
+    assert list(rollup.population(1)) == list(population(boards))
+    with pytest.raises(ValueError):
+        Rollup(path, INFINITE)
@@ -0,0 +1,85 @@
+import pytest
+import numpy as np
+from gol2.archive import Archive
+from gol2.bench import random_board
+from gol2.search import (PATTERNS, Pattern, build_index, candidates, find,
+    orientations, parse_pattern, search)
+from gol2.simulator import evolve, to_cells, DIM
+
+ACORN = [0] * DIM
+ACORN[12:15] = [32, 8, 103]
+
+# A glider heading down-right, it circles the board every 128 generations.
+GLIDER = [0] * DIM
+GLIDER[0:3] = [2 ** 30, 2 ** 29, 7 * 2 ** 29]
+
+
+def brute_force(boards, cells, margin):
+    # Every offset and orientation, cell by cell.
+    found = []
+    for n, board in enumerate(boards):
+        grid = to_cells(board)
+        for orientation, shape in orientations(cells):
+            shape = np.pad(shape, margin)
+            height, width = shape.shape
+            for row in range(DIM):
+                for col in range(DIM):
+                    window = np.roll(grid, (-row, -col), axis=(0, 1))
+                    if np.array_equal(window[:height, :width], shape):
+                        found.append((n, (row + margin) % DIM,
+                            (col + margin) % DIM, orientation))
+    return sorted(found)
+
+
+def history(board, generations):
+    return np.array([evolve(board, gen) for gen in range(generations)])
+
+
+@pytest.mark.parametrize('name', ['glider', 'blinker', 'block'])
+@pytest.mark.parametrize('margin', [0, 1])
+def test_find_matches_brute_force(name, margin):
+    boards = np.concatenate([history(ACORN, 40)[::13], history(GLIDER, 5),
+        [random_board(0.2), random_board(0.5, seed=1)]])
+    matches = find(boards, PATTERNS[name], margin=margin)
+    assert [(m['generation'], m['row'], m['col'], m['orientation'])
+        for m in matches] == brute_force(boards, PATTERNS[name], margin)
+
+
+def test_orientations():
+    assert len(orientations(PATTERNS['glider'])) == 8
+    assert len(orientations(PATTERNS['blinker'])) == 2
+    assert len(orientations(PATTERNS['block'])) == 1
+    with pytest.raises(ValueError):
+        Pattern(np.ones((DIM, 4)), margin=1)
+
+
+def test_search_archives(tmp_path):
+    sources = {}
+    for game, board in enumerate([GLIDER, ACORN, random_board(0.3)]):
+        directory = str(tmp_path / str(game))
+        with Archive(directory, first_generation=0) as archive:
+            boards = history(board, 300)
+            archive.extend(0, boards, [0] * len(boards))
+        sources[game] = directory
+    glider = parse_pattern('.O.\n..O\nOOO')
+
+    expected = np.concatenate([find(history(board, 300)[50:250], glider,
+        50, game, margin=1) for game, board in enumerate(
+        [GLIDER, ACORN, random_board(0.3)])])
+    # Two of the four phases of the glider have its shape.
+    assert (expected['game'] == 0).sum() == 100
+    matches = search(sources, glider, (50, 250), margin=1, workers=2,
+        chunk=64)
+    assert np.array_equal(matches, expected)
+
+    for directory in sources.values():
+        assert build_index(directory) == 300
+    indexed = search(sources, glider, (50, 250), margin=1, workers=1,
+        use_index=True)
+    assert np.array_equal(indexed, expected)
+    # The index rules out most boards without the glider.
+    index = np.load(f'{sources[1]}/features.npy')
+    kept = candidates(index, Pattern(glider, margin=1))
+    assert kept.sum() < len(index) // 2
+    assert set(expected[expected['game'] == 1]['generation']) <= set(
+        np.nonzero(kept)[0])
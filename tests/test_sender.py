@@ -0,0 +1,78 @@
+
+import pytest
+import asyncio
+from starkware.starknet.testing.starknet import Starknet
+from utils.Signer import Signer
+from gol2.sender import Call, Sender
+
+DUMMY_PRIVATE = 12345678987654321
+# Constructor history_interval: store every generation.
+STORE_ALL = 1
+
+@pytest.fixture(scope='module')
+def event_loop():
+    return asyncio.new_event_loop()
+
+@pytest.fixture(scope='module')
+async def game_factory():
+    starknet = await Starknet.empty()
+    signer = Signer(DUMMY_PRIVATE)
+    account = await starknet.deploy("contracts/Account.cairo",
+        constructor_calldata=[signer.public_key])
+    await account.initialize(account.contract_address).invoke()
+    game = await starknet.deploy("contracts/GoL2_infinite.cairo",
+        constructor_calldata=[STORE_ALL])
+    return signer, account, game
+
+
+@pytest.mark.asyncio
+async def test_pipelined_sends(game_factory):
+    signer, account, game = game_factory
+    user = account.contract_address
+    sender = Sender(account, DUMMY_PRIVATE)
+    evolve = Call(game.contract_address,
+        'evolve_and_claim_next_generation', (user,))
+
+    # Queued without waiting, sent in nonce order.
+    futures = [sender.submit([evolve]) for _ in range(4)]
+    await asyncio.gather(*futures)
+    response = await account.get_nonce().call()
+    assert response.result.res == 4
+    response = await game.current_generation_id().call()
+    assert response.result.gen_id == 5
+
+    # One signature for a give life and an evolution.
+    await sender.send([
+        Call(game.contract_address, 'give_life_to_cell', (user, 3, 3, 2)),
+        evolve])
+    response = await game.current_generation_id().call()
+    assert response.result.gen_id == 6
+    response = await game.get_token_data(2).call()
+    assert response.result.has_used_give_life == 1
+    await sender.close()
+
+
+@pytest.mark.asyncio
+async def test_nonce_recovery(game_factory):
+    signer, account, game = game_factory
+    user = account.contract_address
+    sender = Sender(account, DUMMY_PRIVATE)
+    evolve = Call(game.contract_address,
+        'evolve_and_claim_next_generation', (user,))
+    await sender.send([evolve])
+
+    # The account is used outside the sender, leaving a nonce gap.
+    await signer.send_transaction(account, game.contract_address,
+        'evolve_and_claim_next_generation', [user])
+    await sender.send([evolve])
+    assert sender.resyncs == 1
+
+    # A failing call does not use up the nonce.
+    with pytest.raises(Exception):
+        await sender.send([Call(game.contract_address,
+            'give_life_to_cell', (user, 3, 3, 2))])
+    await sender.send([evolve])
+    response = await account.get_nonce().call()
+    assert response.result.res == sender.nonces.next_nonce[user]
+    assert sender.resyncs == 1
+    await sender.close()
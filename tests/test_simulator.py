@@ -0,0 +1,118 @@
+
+import pytest
+import asyncio
+import numpy as np
+from starkware.starknet.testing.starknet import Starknet
+from gol2.simulator import (evolve, to_cells, from_cells, population,
+    render, check_conformance, DIM)
+
+# Temporary user_ids to bypass account verification
+USER_IDS = [76543, 23456, 12345]
+# Constructor history_interval: store every generation.
+STORE_ALL = 1
+
+ACORN = [0] * DIM
+ACORN[12:15] = [32, 8, 103]
+
+@pytest.fixture(scope='module')
+def event_loop():
+    return asyncio.new_event_loop()
+
+@pytest.fixture(scope='module')
+async def game_factory():
+    starknet = await Starknet.empty()
+    game = await starknet.deploy("contracts/GoL2_infinite.cairo",
+        constructor_calldata=[STORE_ALL])
+    return starknet, game
+
+
+def naive_evolve(board, width=DIM, height=DIM):
+    # Cell by cell reference, counting the eight wrapped neighbours.
+    cells = to_cells(board, width, height)
+    neighbours = sum(
+        np.roll(np.roll(cells, i, axis=0), j, axis=1)
+        for i in (-1, 0, 1) for j in (-1, 0, 1)
+        if (i, j) != (0, 0))
+    alive = (neighbours == 3) | ((cells == 1) & (neighbours == 2))
+    return from_cells(alive)
+
+
+def test_acorn():
+    # Acorn after one generation (rows 13-15, see usage_infinite.md).
+    assert list(evolve(ACORN)[12:16]) == [0, 118, 6, 2]
+    assert population(ACORN) == 7
+
+
+def test_matches_cellwise_rules():
+    rng = np.random.default_rng(0)
+    boards = rng.integers(0, 2**32, (64, DIM), dtype=np.uint64)
+    batch = evolve(boards, 3)
+    for board, result in zip(boards, batch):
+        expected = board
+        for _ in range(3):
+            expected = naive_evolve(expected)
+        assert np.array_equal(result, expected)
+        # A batch gives the same result as the boards one at a time.
+        assert np.array_equal(result, evolve(board, 3))
+
+
+def test_edges_wrap():
+    # A glider returns to its start after 4 * DIM generations.
+    glider = [0] * DIM
+    glider[0:3] = [2**30, 2**29, 2**31 + 2**30 + 2**29]
+    assert list(evolve(glider, 4 * DIM)) == glider
+    assert list(evolve(glider, 4)) != glider
+
+
+def test_rejects_wide_rows():
+    with pytest.raises(ValueError):
+        evolve([2**32] + [0] * (DIM - 1))
+    with pytest.raises(ValueError):
+        evolve([0] * (DIM - 1))
+
+
+@pytest.mark.parametrize('width, height', [(40, 12), (64, 9), (300, 7)])
+def test_sized_boards(width, height):
+    rng = np.random.default_rng(width)
+    board = from_cells(rng.integers(0, 2, (height, width)))
+    expected = board
+    for _ in range(3):
+        expected = naive_evolve(expected, width, height)
+    result = evolve(board, 3, width=width, height=height)
+    assert list(result) == list(expected)
+    assert population(result, width, height) == to_cells(expected,
+        width, height).sum()
+
+
+def test_tiled_board():
+    # A board tiled 2x3 times evolves as the tiles do.
+    rng = np.random.default_rng(1)
+    board = rng.integers(0, 2**32, DIM, dtype=np.uint64)
+    tiled = from_cells(np.tile(to_cells(board), (2, 3)))
+    result = evolve(tiled, 10, width=3 * DIM, height=2 * DIM)
+    assert np.array_equal(to_cells(result, 3 * DIM, 2 * DIM),
+        np.tile(to_cells(evolve(board, 10)), (2, 3)))
+
+
+def test_render():
+    lines = render(ACORN).split('\n')
+    assert len(lines) == DIM
+    assert lines[12] == '. ' * 26 + '■ ' + '. ' * 5
+    assert render([1, 0, 0], width=3, height=3, alive='#',
+        dead='.') == '..#\n...\n...'
+
+
+@pytest.mark.asyncio
+async def test_conformance(game_factory):
+    _, game = game_factory
+    for user in USER_IDS:
+        await game.evolve_and_claim_next_generation(user).invoke(
+            caller_address=user)
+    response = await game.current_generation_id().call()
+    last_gen = response.result.gen_id
+    assert await check_conformance(game, 1, last_gen) == []
+
+    # A revived cell shows up as a mismatch for that generation.
+    await game.give_life_to_cell(USER_IDS[0], 5, 5, 2).invoke(
+        caller_address=USER_IDS[0])
+    assert await check_conformance(game, 1, last_gen) == [last_gen]
@@ -0,0 +1,103 @@
+import pytest
+import asyncio
+from starkware.starknet.testing.starknet import Starknet
+from gol2.bench import random_board
+from gol2.packing import (changed_mask, population as stored_population,
+    ALL_ROWS_CHANGED)
+from gol2.simulator import evolve, population, DIM
+
+# Temporary user_ids to bypass account verification
+USER_IDS = [76543, 23456, 12345]
+# Constructor history_interval: store every generation, or checkpoints.
+STORE_ALL = 1
+CHECKPOINTS = 3
+CREDIT_REQUIREMENT = 10
+
+ACORN = [0] * DIM
+ACORN[12:15] = [32, 8, 103]
+
+@pytest.fixture(scope='module')
+def event_loop():
+    return asyncio.new_event_loop()
+
+@pytest.fixture(scope='module')
+async def starknet_factory():
+    starknet = await Starknet.empty()
+    return starknet
+
+
+def mask_of(before, after):
+    return sum(1 << i for i in range(DIM) if before[i] != after[i])
+
+
+def summaries_of(boards):
+    """The (population, mask) of each board after the first, newest
+    first. The first board of a game has every row changed."""
+    summaries = [(population(boards[0]), ALL_ROWS_CHANGED)]
+    for before, after in zip(boards, boards[1:]):
+        summaries.append((population(after), mask_of(before, after)))
+    return summaries[::-1]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('history', [STORE_ALL, CHECKPOINTS])
+async def test_infinite_summaries(starknet_factory, history):
+    starknet = starknet_factory
+    game = await starknet.deploy("contracts/GoL2_infinite.cairo",
+        constructor_calldata=[history])
+    user = USER_IDS[0]
+    await game.evolve_and_claim_generations(user, 6).invoke(
+        caller_address=user)
+    # The summary is packed above the rows of the emitted slots.
+    event = starknet.state.events[-1]
+    boards = [evolve(ACORN, gen) for gen in range(7)]
+    assert stored_population(event.data[3:]) == population(boards[6])
+    assert changed_mask(event.data[3:]) == mask_of(boards[5], boards[6])
+
+    # Gen 7. A cell far from the acorn is counted and its row marked.
+    await game.give_life_to_cell(user, 2, 2, 2).invoke(caller_address=user)
+    response = await game.get_generation_summaries(0, 0, 5).call()
+    result = response.result
+    assert result.gen_id == 7
+    assert result.next_cursor == 5
+    assert result.gen_ids == [7, 6, 5, 4, 3]
+    expected = summaries_of(boards)
+    edited_population, edited_mask = expected[0]
+    expected[0] = (edited_population + 1, edited_mask | 1 << 2)
+    assert list(zip(result.populations, result.masks)) == expected[:5]
+
+    response = await game.get_generation_summaries(0, 5, 5).call()
+    assert response.result.next_cursor == 0
+    assert list(zip(response.result.populations,
+        response.result.masks)) == expected[5:]
+
+
+@pytest.mark.asyncio
+async def test_creator_summaries(starknet_factory):
+    starknet = starknet_factory
+    game = await starknet.deploy("contracts/GoL2_creator.cairo",
+        constructor_calldata=[CHECKPOINTS])
+    user = USER_IDS[1]
+    await game.contribute_generations(0, CREDIT_REQUIREMENT).invoke(
+        caller_address=user)
+    genesis = random_board(0.3)
+    await game.create(*genesis).invoke(caller_address=user)
+    await game.contribute_generations(1, 4).invoke(caller_address=user)
+
+    response = await game.get_game_summaries(0, 0, 5).call()
+    result = response.result
+    assert result.game_indices == [1, 0]
+    assert result.generations == [4, CREDIT_REQUIREMENT]
+    assert result.populations[0] == population(evolve(genesis, 4))
+    acorn = [evolve(ACORN, gen) for gen in range(CREDIT_REQUIREMENT + 1)]
+    assert (result.populations[1], result.masks[1]) == summaries_of(
+        acorn)[0]
+
+    # Generations 1, 2 and 4 are replayed from checkpoints 0 and 3.
+    response = await game.get_generation_summaries(1, 0, 5).call()
+    result = response.result
+    assert result.generation == 4
+    assert result.generations == [4, 3, 2, 1, 0]
+    boards = [evolve(genesis, gen) for gen in range(5)]
+    assert list(zip(result.populations, result.masks)) == summaries_of(
+        boards)
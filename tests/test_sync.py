@@ -0,0 +1,69 @@
+import pytest
+import asyncio
+from starkware.starknet.testing.starknet import Starknet
+from gol2.client import InfiniteClient, Redemption
+from gol2.sync import ReplaySync
+
+# Temporary user_ids to bypass account verification
+USER_IDS = [76543, 23456, 12345]
+# Constructor history_interval: a checkpoint every 5 generations.
+CHECKPOINTS = 5
+
+@pytest.fixture(scope='module')
+def event_loop():
+    return asyncio.new_event_loop()
+
+@pytest.fixture(scope='module')
+async def starknet_factory():
+    starknet = await Starknet.empty()
+    return starknet
+
+
+async def contract_boards(game, head):
+    client = InfiniteClient(game)
+    boards = await client.boards(range(1, head + 1))
+    return [list(board.rows) for board in boards]
+
+
+@pytest.mark.asyncio
+async def test_replay_sync(starknet_factory):
+    starknet = starknet_factory
+    game = await starknet.deploy("contracts/GoL2_infinite.cairo",
+        constructor_calldata=[CHECKPOINTS])
+    user = USER_IDS[0]
+    await game.evolve_and_claim_generations(user, 6).invoke(
+        caller_address=user)
+    # Gen 7: a block (a still life), gen 10: one more cell.
+    await game.give_life_to_cells(user, [2, 3, 4, 5], [1, 1, 2, 2],
+        [4, 5, 4, 5]).invoke(caller_address=user)
+    await game.evolve_and_claim_generations(user, 3).invoke(
+        caller_address=user)
+    await game.give_life_to_cell(user, 20, 20, 6).invoke(
+        caller_address=user)
+
+    sync = ReplaySync(InfiniteClient(game), anchor_interval=4)
+    assert await sync.sync() == 10
+    # The acorn, 4, 8 and the head.
+    assert sync.anchors_read == 4
+    assert sync.anchors_checked == 3
+    assert len(sync.redemptions) == 5
+    assert [list(board) for board in sync.boards] == await contract_boards(
+        game, 10)
+
+    # The head is edited again before the game moves on. The column is
+    # wrapped onto the board.
+    await game.give_life_to_cell(user, 25, 34, 7).invoke(
+        caller_address=user)
+    await game.evolve_and_claim_generations(user, 5).invoke(
+        caller_address=user)
+    assert await sync.sync() == 15
+    assert sync.anchors_read == 6
+    assert [list(board) for board in sync.boards] == await contract_boards(
+        game, 15)
+
+    # A wrong redemption log is caught at the next anchor.
+    wrong = ReplaySync(InfiniteClient(game), anchor_interval=4)
+    wrong.redemptions = [Redemption(token_id=2, generation=7, row=1,
+        col=6, owner=user, redemption_index=0)]
+    with pytest.raises(ValueError):
+        await wrong.sync()
@@ -2,8 +2,8 @@
 
 
 from starkware.crypto.signature.signature import private_to_stark_key, sign
-from starkware.starknet.public.abi import get_selector_from_name
-from starkware.cairo.common.hash_state import compute_hash_on_elements
+
+from gol2.sender import Call, hash_multicall, to_call_array
 
 
 class Signer():
@@ -39,24 +39,18 @@ class Signer():
         return sign(msg_hash=message_hash, priv_key=self.private_key)
 
     async def send_transaction(self, account, to, selector_name, calldata, nonce=None):
+        return await self.send_transactions(
+            account, [Call(to, selector_name, tuple(calldata))], nonce)
+
+    async def send_transactions(self, account, calls, nonce=None):
+        """Sends several calls (gol2.sender.Call) under one signature."""
         if nonce is None:
             execution_info = await account.get_nonce().call()
             nonce, = execution_info.result
 
-        selector = get_selector_from_name(selector_name)
-        message_hash = hash_message(
-            account.contract_address, to, selector, calldata, nonce)
+        call_array, calldata = to_call_array(calls)
+        message_hash = hash_multicall(
+            account.contract_address, call_array, calldata, nonce)
         sig_r, sig_s = self.sign(message_hash)
 
-        return await account.execute(to, selector, calldata, nonce).invoke(signature=[sig_r, sig_s])
-
-
-def hash_message(sender, to, selector, calldata, nonce):
-    message = [
-        sender,
-        to,
-        selector,
-        compute_hash_on_elements(calldata),
-        nonce
-    ]
-    return compute_hash_on_elements(message)
\ No newline at end of file
+        return await account.execute(call_array, calldata, nonce).invoke(signature=[sig_r, sig_s])
\ No newline at end of file